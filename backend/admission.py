@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from tracing import span
+
+# --- Configuration ---
+# (max concurrent generations, max requests allowed to wait for a slot)
+DEFAULT_LIMITS: Tuple[int, int] = (2, 8)  # local Ollama models
+ADMISSION_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gemini": (8, 32),
+    "custom_mistral": (8, 32),
+}
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "20"))
+RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+# "degrade" answers from retrieved documents when a backend is saturated, "reject" returns 429.
+OVERLOAD_MODE = os.getenv("ADMISSION_OVERLOAD_MODE", "degrade")
+
+# --- Global Variables ---
+admission_controllers = {}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a backend has no free slot and its wait queue is full (or the wait timed out)."""
+    def __init__(self, model_name: str, retry_after: int, reason: str):
+        super().__init__(f"Backend '{model_name}' is overloaded ({reason}).")
+        self.model_name = model_name
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class BackendAdmission:
+    """Concurrency limit for a single LLM backend with a bounded wait queue."""
+    def __init__(self, model_name: str, max_concurrency: int, max_queue: int):
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_queue_time = 0.0
+        self.max_queue_time = 0.0
+
+    async def acquire(self, timeout: float = QUEUE_TIMEOUT_SECONDS) -> float:
+        """Waits for a free slot and returns the time spent queueing, in seconds."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.model_name, RETRY_AFTER_SECONDS, "queue full")
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise AdmissionRejected(self.model_name, RETRY_AFTER_SECONDS, "queue wait timed out")
+        finally:
+            self.waiting -= 1
+
+        queue_time = time.perf_counter() - started
+        self.in_flight += 1
+        self.admitted += 1
+        self.total_queue_time += queue_time
+        self.max_queue_time = max(self.max_queue_time, queue_time)
+        return queue_time
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_queue_time_ms": round(1000 * self.total_queue_time / self.admitted, 2) if self.admitted else 0.0,
+            "max_queue_time_ms": round(1000 * self.max_queue_time, 2),
+        }
+
+
+def get_admission(model_name: str) -> BackendAdmission:
+    """Returns the admission controller for a backend, creating it on first use."""
+    if model_name not in admission_controllers:
+        max_concurrency, max_queue = ADMISSION_LIMITS.get(model_name, DEFAULT_LIMITS)
+        admission_controllers[model_name] = BackendAdmission(model_name, max_concurrency, max_queue)
+    return admission_controllers[model_name]
+
+
+@asynccontextmanager
+async def admission_slot(model_name: str, timeout: Optional[float] = None):
+    """Holds one generation slot of `model_name` for the duration of the block."""
+    controller = get_admission(model_name)
+    with span("admission_wait", backend=model_name):
+        await controller.acquire(QUEUE_TIMEOUT_SECONDS if timeout is None else timeout)
+    try:
+        yield controller
+    finally:
+        controller.release()
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: controller.stats() for name, controller in admission_controllers.items()}
@@ -0,0 +1,62 @@
+"""
+Import time, first-prediction latency and peak RSS of the career classifier,
+for the legacy pickles vs. the memory-mapped bundle. Each case runs in a fresh
+interpreter so module caches do not leak between measurements.
+
+Usage (from backend/):
+    python -m classification.artifacts --version v1   # once, to create a bundle
+    python -m benchmarks.classifier_import
+"""
+import json
+import subprocess
+import sys
+
+SNIPPET = '''
+import json, resource, time
+started = time.perf_counter()
+from classification import run
+from classification import artifacts
+import_seconds = time.perf_counter() - started
+import_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+started = time.perf_counter()
+if {legacy!r}:
+    run._artifacts = artifacts.load_artifacts(None, root="/nonexistent")
+else:
+    run.install_artifacts()
+run.predict_career({{
+    "GPA": 3.5, "Major": "Computer Science", "Python": "Strong", "SQL": "Strong", "Java": "Weak",
+    "Interested Domain_1": "Web Development", "Interested Domain_2": "Machine Learning",
+    "Projects_1": "Chatbot", "Projects_2": "E-commerce Website", "Projects_3": "Image Recognition",
+}})
+first_prediction_seconds = time.perf_counter() - started
+print(json.dumps({{
+    "version": run.get_artifacts().version,
+    "import_ms": round(import_seconds * 1000, 1),
+    "import_rss_mb": round(import_rss / 1024, 1),
+    "first_prediction_ms": round(first_prediction_seconds * 1000, 1),
+    "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+}}))
+'''
+
+
+def measure(legacy):
+    output = subprocess.run([sys.executable, "-c", SNIPPET.format(legacy=legacy)], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'source':<16} | {'import ms':>9} | {'import RSS MB':>13} | {'1st predict ms':>14} | {'peak RSS MB':>11}")
+    print("-" * 76)
+    for legacy in (True, False):
+        try:
+            result = measure(legacy)
+        except subprocess.CalledProcessError as e:
+            print(f"{'legacy-pickle' if legacy else 'bundle':<16} | failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{result['version']:<16} | {result['import_ms']:>9} | {result['import_rss_mb']:>13} | "
+              f"{result['first_prediction_ms']:>14} | {result['peak_rss_mb']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Throughput of the career classifier: the original per-row pandas path vs. the
+vectorized batch path.
+
+Usage (from backend/):
+    python -m benchmarks.classifier_throughput --sizes 1 10 100 1000
+"""
+import argparse
+import random
+import time
+
+from classification import run
+
+DOMAINS = ["Web Development", "Machine Learning", "Data Science", "Cybersecurity", "Cloud Computing", "Mobile Development"]
+PROJECTS = ["Image Recognition", "E-commerce Website", "Deep Learning Models", "Chatbot", "Network Security", "Data Analytics Dashboard"]
+
+
+def make_submissions(n, seed=0):
+    rng = random.Random(seed)
+    artifacts = run.get_artifacts()
+    skills = list(artifacts.skill_mapping.keys())
+    majors = [col[len("Major_"):] for col in artifacts.major_columns] or ["Computer Science"]
+    return [{
+        'GPA': round(rng.uniform(2.0, 4.0), 2),
+        'Major': rng.choice(majors),
+        'Python': rng.choice(skills),
+        'SQL': rng.choice(skills),
+        'Java': rng.choice(skills),
+        'Interested Domain_1': rng.choice(DOMAINS),
+        'Interested Domain_2': rng.choice(DOMAINS),
+        'Projects_1': rng.choice(PROJECTS),
+        'Projects_2': rng.choice(PROJECTS),
+        'Projects_3': rng.choice(PROJECTS),
+    } for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'batch':>7} | {'per-row rows/s':>15} | {'batch rows/s':>13} | {'speedup':>8}")
+    print("-" * 53)
+    for size in args.sizes:
+        submissions = make_submissions(size)
+
+        per_row = batch = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for answers in submissions:
+                run.predict_career_per_row(answers)
+            per_row = min(per_row, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            run.predict_careers(submissions)
+            batch = min(batch, time.perf_counter() - started)
+
+        print(f"{size:>7} | {size / per_row:>15.1f} | {size / batch:>13.1f} | {per_row / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
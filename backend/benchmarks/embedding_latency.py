@@ -0,0 +1,167 @@
+"""
+Query-embedding latency of the Ollama HTTP path vs. the in-process
+sentence-transformers backend (local_embeddings.py), and whether the local
+vectors can stand in for Ollama's against the existing all_min_chromadb index.
+
+For each backend:
+  * sequential - one `embed_query` at a time (the latency a single chat request pays)
+  * concurrent - `--concurrency` `embed_query` calls in flight from executor
+    threads, which is how Chroma's async search calls the embeddings (the
+    local backend coalesces them into shared encode batches)
+Compatibility compares each local runtime with Ollama on the same queries:
+cosine similarity of the vectors and, when the persisted index exists, overlap
+of the top-k chunks it returns.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_latency
+    python -m benchmarks.embedding_latency --runtimes torch onnx onnx-quantized --threads 4 --concurrency 1 8 32
+    python -m benchmarks.embedding_latency --no-ollama   # local runtimes only, no compatibility check
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import RESULTS_DIR, git_commit, percentile
+from benchmarks.retrieval_quality import DATA_PATH, SAMPLE_DATA_PATH, EMBEDDING_MODEL, build_queries
+
+PERSIST_DIRECTORY = "./all_min_chromadb"
+QUESTION_TEMPLATES = ("What does a {} do?", "Which skills do I need to become a {}?", "How do I start a career as a {}?")
+
+
+def make_queries(path: str, n: int, seed: int) -> List[str]:
+    """Title/skill queries from the postings plus chat-style questions about the titles."""
+    df = pd.read_json(path)
+    queries = [q["text"] for q in build_queries(df, n, seed)]
+    titles = [t for t in df["job_title"].dropna().unique()]
+    queries += [template.format(title) for title in titles for template in QUESTION_TEMPLATES]
+    return list(dict.fromkeys(queries))[:n]
+
+
+def _summary(latencies_ms: List[float]) -> Dict[str, Optional[float]]:
+    return {"mean_ms": round(statistics.mean(latencies_ms), 2),
+            "p50_ms": round(percentile(latencies_ms, 50), 2),
+            "p95_ms": round(percentile(latencies_ms, 95), 2)}
+
+
+def sequential(embeddings, queries: List[str]) -> Dict[str, Any]:
+    latencies = []
+    for text in queries:
+        started = time.perf_counter()
+        embeddings.embed_query(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return _summary(latencies)
+
+
+async def concurrent(embeddings, queries: List[str], concurrency: int) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            # What the retriever's asimilarity_search does: the sync search, embed_query included, in a thread
+            await loop.run_in_executor(executor, embeddings.embed_query, text)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(text) for text in queries))
+    finally:
+        executor.shutdown(wait=False)
+    elapsed = time.perf_counter() - started
+    return {**_summary(latencies), "queries_per_second": round(len(queries) / elapsed, 1)}
+
+
+def top_k_overlap(reference: List[List[float]], candidate: List[List[float]], k: int) -> Optional[float]:
+    """Mean share of the top-k chunk IDs from the persisted index that both sets of query vectors agree on."""
+    if not (os.path.isdir(PERSIST_DIRECTORY) and os.listdir(PERSIST_DIRECTORY)):
+        return None
+    import chromadb
+    collection = chromadb.PersistentClient(path=PERSIST_DIRECTORY).get_collection("langchain")
+    ref_ids = collection.query(query_embeddings=reference, n_results=k, include=[])["ids"]
+    cand_ids = collection.query(query_embeddings=candidate, n_results=k, include=[])["ids"]
+    return round(statistics.mean(len(set(a) & set(b)) / k for a, b in zip(ref_ids, cand_ids)), 4)
+
+
+def compatibility(reference: List[List[float]], candidate: List[List[float]], k: int) -> Dict[str, Any]:
+    ref, cand = np.asarray(reference), np.asarray(candidate)
+    cosines = (ref * cand).sum(axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1))
+    return {"dimensions": int(cand.shape[1]), "cosine_mean": round(float(cosines.mean()), 5),
+            "cosine_min": round(float(cosines.min()), 5), f"top{k}_overlap": top_k_overlap(reference, candidate, k)}
+
+
+def run_backend(name: str, embeddings, queries: List[str], concurrency_levels: List[int]) -> Dict[str, Any]:
+    embeddings.embed_query("warm up")
+    result = {"backend": name, "sequential": sequential(embeddings, queries)}
+    for level in concurrency_levels:
+        result[f"concurrent_{level}"] = asyncio.run(concurrent(embeddings, queries, level))
+    print(f"  {name}: sequential p50={result['sequential']['p50_ms']} ms p95={result['sequential']['p95_ms']} ms; "
+          + ", ".join(f"c={level} {result[f'concurrent_{level}']['queries_per_second']} q/s" for level in concurrency_levels))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=None, help=f"Job postings JSON (default: {DATA_PATH}, else {SAMPLE_DATA_PATH})")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--runtimes", nargs="+", default=["torch", "onnx"], choices=["torch", "onnx", "onnx-quantized"])
+    parser.add_argument("--threads", type=int, default=int(os.getenv("LOCAL_EMBEDDING_THREADS", "0")), help="CPU threads for the local model (0 = default)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--k", type=int, default=int(os.getenv("RAG_RETRIEVAL_K", "2")), help="Top-k for the index overlap check")
+    parser.add_argument("--no-ollama", action="store_true")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    from local_embeddings import LocalEmbeddings, load_sentence_transformer
+
+    path = args.data or (DATA_PATH if os.path.exists(DATA_PATH) else SAMPLE_DATA_PATH)
+    queries = make_queries(path, args.queries, args.seed)
+    print(f"{len(queries)} queries from {path}\n")
+
+    results, reference = [], None
+    if not args.no_ollama:
+        from langchain_ollama import OllamaEmbeddings
+        ollama = OllamaEmbeddings(model=EMBEDDING_MODEL)
+        results.append(run_backend("ollama", ollama, queries, args.concurrency))
+        reference = ollama.embed_documents(queries)
+
+    for runtime in args.runtimes:
+        started = time.perf_counter()
+        local = LocalEmbeddings(load_sentence_transformer(runtime=runtime, threads=args.threads))
+        load_s = time.perf_counter() - started
+        result = {**run_backend(f"local-{runtime}", local, queries, args.concurrency),
+                  "load_seconds": round(load_s, 2), "batching": local.stats()}
+        if reference is not None:
+            result["compatibility"] = compatibility(reference, local.embed_documents(queries), args.k)
+            print(f"    vs ollama: {result['compatibility']}")
+        results.append(result)
+
+    print(f"\n{'backend':<22} | {'seq p50 ms':>10} | {'seq p95 ms':>10} | " + " | ".join(f"{'c=' + str(c) + ' q/s':>10}" for c in args.concurrency))
+    for r in results:
+        print(f"{r['backend']:<22} | {r['sequential']['p50_ms']:>10} | {r['sequential']['p95_ms']:>10} | "
+              + " | ".join(f"{r[f'concurrent_{c}']['queries_per_second']:>10}" for c in args.concurrency))
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"embedding_latency-{timestamp}.json")
+        config = {k: v for k, v in vars(args).items() if k != "no_save"}
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": timestamp, "git_commit": git_commit(), "data": path, "queries": len(queries),
+                       "config": config, "results": results}, f, indent=2)
+        print(f"\nSaved results to {out}")
+
+
+if __name__ == "__main__":
+    main()
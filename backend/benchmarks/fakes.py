@@ -0,0 +1,109 @@
+"""
+Deterministic local stand-ins for the external backends (LLMs, Ollama
+embeddings, Google Translate, Whisper) with configurable latency, so the app
+can be benchmarked without network access or GPUs.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+from typing import Any, Iterator, AsyncIterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+WORDS = ("career", "skills", "python", "data", "analysis", "role", "experience", "team", "projects", "cloud",
+         "learning", "develop", "design", "systems", "communication", "growth")
+
+
+class FakeLLM(LLM):
+    """Replies with deterministic text after `latency` seconds, streaming at `tokens_per_second`."""
+    latency: float = 0.3
+    tokens_per_second: float = 40.0
+    reply_tokens: int = 80
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _tokens(self, prompt: str) -> List[str]:
+        rng = random.Random(hashlib.md5(prompt.encode()).hexdigest())
+        return [rng.choice(WORDS) + " " for _ in range(self.reply_tokens)]
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        time.sleep(self.latency + self.reply_tokens / self.tokens_per_second)
+        return "".join(self._tokens(prompt))
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        await asyncio.sleep(self.latency + self.reply_tokens / self.tokens_per_second)
+        return "".join(self._tokens(prompt))
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens(prompt):
+            time.sleep(1.0 / self.tokens_per_second)
+            yield GenerationChunk(text=token)
+
+    async def _astream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(prompt):
+            await asyncio.sleep(1.0 / self.tokens_per_second)
+            yield GenerationChunk(text=token)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors (so similar texts still land close together)
+    with a fixed per-call plus per-text latency. Accepts and ignores the
+    OllamaEmbeddings constructor arguments so it can be patched in for it.
+    """
+    def __init__(self, dimensions: int = 384, call_latency: float = 0.005, text_latency: float = 0.001, **_: Any):
+        self.dimensions = dimensions
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _delay(self, count: int) -> float:
+        return self.call_latency + self.text_latency * count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._delay(len(texts)))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self._delay(1))
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._delay(len(texts)))
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self._delay(1))
+        return self._vector(text)
+
+
+def make_fake_translate(latency: float = 0.15):
+    def translate_to_burmese(text: str) -> str:
+        time.sleep(latency)
+        return f"[my] {text}"
+    return translate_to_burmese
+
+
+class FakeWhisper:
+    def __init__(self, latency: float = 0.8):
+        self.latency = latency
+
+    def transcribe(self, path: str, **_: Any):
+        time.sleep(self.latency)
+        return {"text": "I would like to become a data scientist", "language": "en"}
@@ -0,0 +1,337 @@
+"""
+Offline load test of the FastAPI app. The LLMs, Ollama embeddings, Google
+Translate and Whisper are replaced by deterministic fakes with configurable
+latency (see benchmarks/fakes.py), and every endpoint is driven in-process at
+fixed concurrency levels. Reports RPS, p50/p95/p99 latency and, for streams,
+time to first token; results are saved as JSON and compared with the previous
+run (or --baseline) to flag regressions.
+
+Requests are sent straight to the ASGI app (no sockets), so the numbers measure
+the app itself; the load generator shares its event loop.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 40
+    python -m benchmarks.load_test --endpoints chat chat_stream --llm-latency 1.0 --tokens-per-second 20
+"""
+import argparse
+import asyncio
+import glob
+import io
+import json
+import os
+import sys
+import time
+import wave
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+
+from benchmarks.common import RESULTS_DIR, git_commit, percentile
+from benchmarks.fakes import FakeEmbeddings, FakeLLM, FakeWhisper, make_fake_translate
+
+SAMPLE_DATA_PATH = "./ground_truth/small.json"
+
+QUESTIONS = ["What skills does a data analyst need?", "How do I become a cloud engineer?",
+             "Which roles fit someone who likes web development?", "What does an HR generalist do?"]
+MAJORS = ["Computer Science", "Information Technology", "Software Engineering"]
+DOMAINS = ["Web Development", "Machine Learning", "Data Science", "Cybersecurity", "Cloud Computing"]
+PROJECTS = ["Chatbot", "E-commerce Website", "Image Recognition", "Network Security", "Data Analytics Dashboard"]
+
+
+# --- App setup ---
+
+def load_app(args) -> Any:
+    """Imports the app with every external backend swapped for a fake."""
+    import langchain_ollama
+    embeddings = FakeEmbeddings(call_latency=args.embed_latency, text_latency=args.embed_latency / 5)
+    # llm_services binds OllamaEmbeddings at import, so patch before importing it
+    langchain_ollama.OllamaEmbeddings = lambda **_: embeddings
+
+    import llm_services
+    import main
+
+    def fake_get_llm(model_name: str = llm_services.DEFAULT_OLLAMA_MODEL):
+        if model_name not in llm_services.llm_instances:
+            llm_services.llm_instances[model_name] = FakeLLM(
+                latency=args.llm_latency, tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens)
+        return llm_services.llm_instances[model_name]
+
+    llm_services.llm_instances.clear()
+    llm_services.rag_chain_instances.clear()
+    llm_services.get_llm = main.get_llm = fake_get_llm
+    llm_services.translate_to_burmese = main.translate_to_burmese = make_fake_translate(args.translate_latency)
+    main.whisper_model = FakeWhisper(args.whisper_latency)
+
+    if args.rebuild_store or llm_services.vectordb is None or llm_services.vectordb._collection.count() == 0:
+        llm_services.vectordb = _build_sample_store(llm_services)
+    return main.app
+
+
+def _build_sample_store(llm_services):
+    import pandas as pd
+    from langchain_chroma import Chroma
+    from langchain.docstore.document import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    path = llm_services.DATA_PATH if os.path.exists(llm_services.DATA_PATH) else SAMPLE_DATA_PATH
+    df = pd.read_json(path)
+    documents = [Document(page_content=row.get('unified_document', ''), metadata={"job_title": row.get('job_title'), "original_index": index})
+                 for index, row in df.iterrows()]
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(documents)
+    print(f"Built an in-memory vector store from {path} ({len(chunks)} chunks).")
+    return Chroma.from_documents(documents=chunks, embedding=llm_services.get_embedding_function(), collection_name="load_test")
+
+
+# --- Request payloads ---
+
+def make_pdf(text: str) -> bytes:
+    """Single-page PDF with selectable text, enough for pypdf extraction."""
+    escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in text.splitlines()]
+    content = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def make_wav(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def _cv_text(i: int) -> str:
+    return (f"Jane Doe {i}\nSoftware engineer with {i % 9 + 1} years of experience in Python, SQL and cloud services.\n"
+            f"Built data pipelines, REST APIs and dashboards. Interested in {DOMAINS[i % len(DOMAINS)]}.")
+
+
+def _cs_quiz(i: int) -> Dict[str, Any]:
+    return {
+        "GPA": round(2.5 + (i % 15) / 10, 2), "Major": MAJORS[i % len(MAJORS)],
+        "Python": ["Weak", "Average", "Strong"][i % 3], "SQL": ["Strong", "Average", "Weak"][i % 3], "Java": "Average",
+        "Interested_Domain_1": DOMAINS[i % len(DOMAINS)], "Interested_Domain_2": DOMAINS[(i + 2) % len(DOMAINS)],
+        "Projects_1": PROJECTS[i % len(PROJECTS)], "Projects_2": PROJECTS[(i + 1) % len(PROJECTS)], "Projects_3": PROJECTS[(i + 3) % len(PROJECTS)],
+    }
+
+
+Request = Tuple[str, str, bytes, List[Tuple[bytes, bytes]]]  # method, path (with query), body, headers
+
+
+def _json(method: str, path: str, payload: Any) -> Request:
+    return method, path, json.dumps(payload).encode(), [(b"content-type", b"application/json")]
+
+
+def _multipart(path: str, field: str, filename: str, data: bytes, content_type: str) -> Request:
+    request = httpx.Request("POST", f"http://loadtest{path}", files={field: (filename, data, content_type)})
+    body = request.read()
+    return "POST", path, body, [(k, v) for k, v in request.headers.raw if k.lower() not in (b"content-length", b"host")]
+
+
+def build_scenarios(model: str, unique_inputs: int) -> Dict[str, Tuple[Callable[[int], Request], bool]]:
+    """endpoint name -> (request factory for the i-th request, is a stream)."""
+    wav = make_wav()
+    variant = (lambda i: i % unique_inputs) if unique_inputs else (lambda i: i)
+    return {
+        "chat": (lambda i: _json("POST", "/api/chat", {"message": f"{QUESTIONS[i % len(QUESTIONS)]} ({variant(i)})", "model": model}), False),
+        "chat_stream": (lambda i: _json("POST", "/api/chat/stream", {"message": f"{QUESTIONS[i % len(QUESTIONS)]} ({variant(i)})", "model": model}), True),
+        "career_quiz": (lambda i: _json("POST", "/api/career-quiz", {"answers": ["I enjoy coding", DOMAINS[i % len(DOMAINS)], f"variant {variant(i)}"], "model": model}), False),
+        "career_quiz_cs": (lambda i: _json("POST", "/api/career-quiz/cs", {**_cs_quiz(variant(i)), "model": model, "language": "en"}), False),
+        "career_quiz_cs_batch": (lambda i: _json("POST", "/api/career-quiz/cs/batch", {"submissions": [_cs_quiz(variant(i) + n) for n in range(32)]}), False),
+        "analyze_cv_rag": (lambda i: _json("POST", "/api/analyze-cv-rag", {"cv_text": _cv_text(variant(i)), "model": model}), False),
+        "upload_cv": (lambda i: _multipart("/api/upload-cv", "file", "cv.pdf", make_pdf(_cv_text(variant(i))), "application/pdf"), False),
+        "search": (lambda i: ("GET", "/api/search?" + urlencode({"q": f"{QUESTIONS[i % len(QUESTIONS)]} {variant(i)}"}), b"", []), False),
+        "speech_to_text": (lambda i: _multipart("/api/speech-to-text", "audio_file", "question.wav", wav, "audio/wav"), False),
+    }
+
+
+# --- Driver ---
+
+async def asgi_request(app, request: Request, stream: bool) -> Dict[str, Any]:
+    """Sends one request straight to the ASGI app and times the first token and the full response."""
+    method, target, body, headers = request
+    path, _, query = target.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"loadtest"), (b"content-length", str(len(body)).encode())] + headers,
+        "client": ("127.0.0.1", 50000), "server": ("loadtest", 80),
+    }
+    response_done = asyncio.Event()
+    body_sent = False
+    result = {"status": None, "first_token": None, "chunks": []}
+    started = time.perf_counter()
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"")
+            if chunk:
+                result["chunks"].append(chunk)
+                if result["first_token"] is None and (not stream or b'"token"' in chunk):
+                    result["first_token"] = time.perf_counter() - started
+            if not message.get("more_body"):
+                response_done.set()
+
+    await app(scope, receive, send)
+    result["latency"] = time.perf_counter() - started
+    content = b"".join(result.pop("chunks"))
+    result["error"] = result["status"] is None or result["status"] >= 400 or (stream and b'"error"' in content)
+    result["degraded"] = b'"degraded": true' in content or b'"degraded":true' in content
+    return result
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 1) if value is not None else None
+
+
+async def run_level(app, name: str, factory, stream: bool, concurrency: int, requests: int) -> Dict[str, Any]:
+    next_index = 0
+    results: List[Dict[str, Any]] = []
+
+    async def worker():
+        nonlocal next_index
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            results.append(await asgi_request(app, factory(i), stream))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if not r["error"]]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["first_token"] for r in ok if r["first_token"] is not None] if stream else []
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    return {
+        "endpoint": name, "concurrency": concurrency, "requests": len(results),
+        "errors": len(results) - len(ok), "degraded": sum(r["degraded"] for r in results), "statuses": statuses,
+        "rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": _ms(percentile(latencies, 50)), "p95_ms": _ms(percentile(latencies, 95)), "p99_ms": _ms(percentile(latencies, 99)),
+        "ttft_p50_ms": _ms(percentile(ttfts, 50)), "ttft_p95_ms": _ms(percentile(ttfts, 95)),
+    }
+
+
+# --- Reporting ---
+
+def _fmt(value: Any) -> str:
+    return "-" if value is None else str(value)
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'endpoint':<22} | {'conc':>4} | {'reqs':>4} | {'err':>3} | {'degr':>4} | {'rps':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'ttft p50':>8} | {'ttft p95':>8}")
+    print("-" * 118)
+    for r in results:
+        print(f"{r['endpoint']:<22} | {r['concurrency']:>4} | {r['requests']:>4} | {r['errors']:>3} | {r['degraded']:>4} | {r['rps']:>7} | "
+              f"{_fmt(r['p50_ms']):>8} | {_fmt(r['p95_ms']):>8} | {_fmt(r['p99_ms']):>8} | {_fmt(r['ttft_p50_ms']):>8} | {_fmt(r['ttft_p95_ms']):>8}")
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regressions against a previous run: p95 (or TTFT p95) up, or RPS down, by more than `threshold`."""
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('timestamp')} ({baseline.get('git_commit', '?')}):")
+    for r in results:
+        old = previous.get((r["endpoint"], r["concurrency"]))
+        if old is None:
+            continue
+        notes = []
+        for key, worse_when_higher in (("p95_ms", True), ("ttft_p95_ms", True), ("rps", False)):
+            if not old.get(key) or r.get(key) is None:
+                continue
+            change = (r[key] - old[key]) / old[key]
+            notes.append(f"{key} {old[key]} -> {r[key]} ({change:+.0%})")
+            if (change > threshold) if worse_when_higher else (change < -threshold):
+                regressions.append(f"{r['endpoint']} @ {r['concurrency']}: {key} {change:+.0%}")
+        print(f"  {r['endpoint']:<22} @ {r['concurrency']:>3}: " + "; ".join(notes))
+    return regressions
+
+
+def _latest_result() -> Optional[str]:
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, "load_test-*.json")))
+    return paths[-1] if paths else None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=None, help="Subset of endpoints (default: all)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--model", default="gemini")
+    parser.add_argument("--unique-inputs", type=int, default=0, help="Cycle through N distinct inputs (exercises caches); 0 = every request distinct")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--reply-tokens", type=int, default=80)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--translate-latency", type=float, default=0.15)
+    parser.add_argument("--whisper-latency", type=float, default=0.8)
+    parser.add_argument("--rebuild-store", action="store_true", help="Always index the sample data in memory instead of the persisted store")
+    parser.add_argument("--baseline", help="Result file to compare with (default: the latest in benchmarks/results)")
+    parser.add_argument("--regression-threshold", type=float, default=0.10)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    app = load_app(args)
+    scenarios = build_scenarios(args.model, args.unique_inputs)
+    names = args.endpoints or list(scenarios)
+    unknown = set(names) - set(scenarios)
+    if unknown:
+        parser.error(f"unknown endpoints: {sorted(unknown)} (choose from {list(scenarios)})")
+
+    results = []
+    for name in names:
+        factory, stream = scenarios[name]
+        for concurrency in args.concurrency:
+            results.append(await run_level(app, name, factory, stream, concurrency, args.requests))
+            print(f"  {name} @ {concurrency}: done")
+    print()
+    print_table(results)
+
+    baseline_path = args.baseline or _latest_result()
+    regressions = compare(results, json.load(open(baseline_path)), args.regression_threshold) if baseline_path else []
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        config = {k: v for k, v in vars(args).items() if k not in ("baseline", "fail_on_regression", "no_save")}
+        path = os.path.join(RESULTS_DIR, f"load_test-{timestamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": timestamp, "git_commit": git_commit(), "config": config, "results": results}, f, indent=2)
+        print(f"\nSaved results to {path}")
+
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
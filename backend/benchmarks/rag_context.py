@@ -0,0 +1,61 @@
+"""
+Prompt tokens and end-to-end latency of a RAG answer for three ways of building
+the context: the retrieved chunks as they are ("unpacked"), cleaned and packed
+chunks ("raw") and the per-job retrieval summaries ("summary", run
+summarize_chunks.py first).
+
+Usage (from backend/):
+    python -m benchmarks.rag_context --model llama3.2 --repeat 2
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from context_packer import pack_context
+from llm_services import get_rag_chain_for_model
+from token_utils import count_tokens
+
+QUESTIONS = [
+    "What skills do I need to become a data scientist?",
+    "Which roles suit someone who enjoys web development and databases?",
+    "What does a human resources generalist do day to day?",
+    "How can I move from software testing into DevOps?",
+    "What are the responsibilities of a machine learning engineer?",
+]
+MODES = ["unpacked", "raw", "summary"]
+
+
+async def run_question(rag_chain, model_name, question, mode):
+    started = time.perf_counter()
+    documents = await rag_chain.retriever.ainvoke(question)
+    if mode != "unpacked":
+        documents, _ = pack_context(documents, model_name, mode=mode)
+    context = "\n\n".join(doc.page_content for doc in documents)
+    prompt_tokens = count_tokens(rag_chain.combine_docs_chain.llm_chain.prompt.format(context=context, question=question))
+    await rag_chain.combine_docs_chain.ainvoke({"input_documents": documents, "question": question})
+    return prompt_tokens, time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="llama3.2")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    args = parser.parse_args()
+
+    rag_chain = get_rag_chain_for_model(args.model)
+    print(f"{'context':<10} | {'prompt tokens':>13} | {'p50 s':>7} | {'mean s':>7}")
+    print("-" * 46)
+    for mode in args.modes:
+        tokens, latencies = [], []
+        for _ in range(args.repeat):
+            for question in QUESTIONS:
+                prompt_tokens, seconds = await run_question(rag_chain, args.model, question, mode)
+                tokens.append(prompt_tokens)
+                latencies.append(seconds)
+        print(f"{mode:<10} | {statistics.mean(tokens):>13.0f} | {statistics.median(latencies):>7.2f} | {statistics.mean(latencies):>7.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
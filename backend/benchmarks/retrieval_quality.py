@@ -0,0 +1,254 @@
+"""
+Retrieval quality vs. latency for the knowledge-base index settings: builds a
+Chroma index from the job postings for every combination of chunk size, chunk
+overlap and HNSW M / construction_ef / search_ef, then runs labelled queries
+against each one.
+
+Queries are derived from the postings themselves:
+  * title queries - a job title; relevant = every posting with that title
+  * skill queries - a handful of the posting's listed skills; relevant = that posting
+Retrieved chunks are mapped back to their posting (`original_index`), so
+recall@k counts distinct postings within the top k chunks, the same k chunks
+the RAG chain would put in the prompt.
+
+Chunk embeddings are computed once per chunking and shared by every HNSW
+variant built on it; query embeddings are computed once and reused, so query
+latency is the index search alone.
+
+Usage (from backend/):
+    python -m benchmarks.retrieval_quality
+    python -m benchmarks.retrieval_quality --chunk-sizes 500 1000 --overlaps 100 200 --m 16 32 --search-ef 10 100
+    python -m benchmarks.retrieval_quality --data ./ground_truth/small.json --fake-embeddings   # offline smoke run
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+import pandas as pd
+
+from benchmarks.common import RESULTS_DIR, git_commit
+from summarize_chunks import _parse_skill_set, canonical_skills
+
+DATA_PATH = "./ground_truth/processed_job.json"
+SAMPLE_DATA_PATH = "./ground_truth/small.json"
+EMBEDDING_MODEL = "all-minilm:l6-v2"  # the model llm_services indexes with
+# What ships today: llm_services' splitter on Chroma's HNSW defaults
+SHIPPED = {"chunk_size": 1000, "chunk_overlap": 200, "M": 16, "construction_ef": 100, "search_ef": 10}
+EMBED_BATCH_SIZE = 64
+SKILLS_PER_QUERY = 5
+
+
+# --- Labelled queries ---
+
+def _normalize_title(title: Any) -> str:
+    return re.sub(r"\s+", " ", str(title or "")).strip().lower()
+
+
+def build_queries(df: pd.DataFrame, max_queries: int, seed: int) -> List[Dict[str, Any]]:
+    """Title and skill-list queries with the set of postings that count as relevant for each."""
+    rng = random.Random(seed)
+    by_title: Dict[str, Tuple[str, Set[int]]] = {}
+    for index, row in df.iterrows():
+        title = str(row.get("job_title") or "").strip()
+        if title:
+            by_title.setdefault(_normalize_title(title), (title, set()))[1].add(index)
+
+    queries = [{"kind": "title", "text": title, "relevant": indices} for title, indices in by_title.values()]
+    for index, row in df.iterrows():
+        skills = canonical_skills(_parse_skill_set(row.get("job_skill_set")))
+        if len(skills) >= 2:
+            picked = rng.sample(skills, min(SKILLS_PER_QUERY, len(skills)))
+            queries.append({"kind": "skills", "text": ", ".join(picked), "relevant": {index}})
+
+    rng.shuffle(queries)
+    return queries[:max_queries] if max_queries else queries
+
+
+# --- Index variants ---
+
+def split_postings(df: pd.DataFrame, chunk_size: int, chunk_overlap: int) -> List[Tuple[str, int]]:
+    """(chunk text, original_index) pairs using the same splitter as llm_services."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return [(chunk, index) for index, row in df.iterrows() for chunk in splitter.split_text(row.get("unified_document") or "")]
+
+
+def embed_texts(embeddings, texts: List[str], cache: Dict[str, List[float]]) -> float:
+    """Embeds the texts missing from `cache` in batches; returns the seconds spent."""
+    missing = list(dict.fromkeys(t for t in texts if t not in cache))
+    started = time.perf_counter()
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = missing[start:start + EMBED_BATCH_SIZE]
+        cache.update(zip(batch, embeddings.embed_documents(batch)))
+    return time.perf_counter() - started
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(dirpath, name)) for dirpath, _, names in os.walk(path) for name in names)
+
+
+def build_index(path: str, chunks: List[Tuple[str, int]], vectors: Dict[str, List[float]], hnsw: Dict[str, int]):
+    """Persistent Chroma collection with the given HNSW settings; returns (collection, insert seconds)."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    collection = client.create_collection("jobs", metadata={
+        "hnsw:M": hnsw["M"], "hnsw:construction_ef": hnsw["construction_ef"], "hnsw:search_ef": hnsw["search_ef"],
+    })
+    batch_size = client.get_max_batch_size()
+    started = time.perf_counter()
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        collection.add(
+            ids=[str(start + i) for i in range(len(batch))],
+            embeddings=[vectors[text] for text, _ in batch],
+            documents=[text for text, _ in batch],
+            metadatas=[{"original_index": int(index)} for _, index in batch],
+        )
+    return collection, time.perf_counter() - started
+
+
+def evaluate(collection, queries: List[Dict[str, Any]], query_vectors: Dict[str, List[float]], ks: List[int]) -> Dict[str, Any]:
+    """recall@k and MRR over distinct postings in the top chunks, plus per-query search latency."""
+    k_max = max(ks)
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query_vectors[query["text"]]], n_results=k_max, include=["metadatas"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        indices = [m["original_index"] for m in result["metadatas"][0]]
+
+        relevant = query["relevant"]
+        for k in ks:
+            found = relevant.intersection(indices[:k])
+            recalls[k].append(len(found) / min(len(relevant), k))
+        rank = next((i for i, index in enumerate(indices, start=1) if index in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    latencies.sort()
+    return {
+        **{f"recall@{k}": round(statistics.mean(values), 4) for k, values in recalls.items()},
+        "mrr": round(statistics.mean(reciprocal_ranks), 4),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+    }
+
+
+# --- Reporting ---
+
+def recommend(results: List[Dict[str, Any]], ship_k: int, tolerance: float) -> Dict[str, Any]:
+    """Fastest configuration whose recall@ship_k is within `tolerance` of the best; ties go to MRR, then index size."""
+    key = f"recall@{ship_k}"
+    best = max(r[key] for r in results)
+    contenders = [r for r in results if r[key] >= best - tolerance]
+    return min(contenders, key=lambda r: (r["p95_ms"], -r["mrr"], r["index_mb"]))
+
+
+def print_table(results: List[Dict[str, Any]], ks: List[int], pick: Dict[str, Any]) -> None:
+    recall_cols = [f"recall@{k}" for k in ks]
+    header = (f"  {'chunk':>5} {'ovlp':>4} {'M':>3} {'ef_c':>4} {'ef_s':>4} {'chunks':>6} | "
+              + " ".join(f"{c:>9}" for c in recall_cols)
+              + f" {'MRR':>6} | {'p50 ms':>7} {'p95 ms':>7} | {'index MB':>8} {'embed s':>7} {'build s':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        marks = ("*" if r is pick else " ") + ("=" if all(r[k] == v for k, v in SHIPPED.items()) else " ")
+        print(f"{marks}{r['chunk_size']:>5} {r['chunk_overlap']:>4} {r['M']:>3} {r['construction_ef']:>4} {r['search_ef']:>4} {r['chunks']:>6} | "
+              + " ".join(f"{r[c]:>9.3f}" for c in recall_cols)
+              + f" {r['mrr']:>6.3f} | {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} | {r['index_mb']:>8.1f} {r['embed_s']:>7.1f} {r['build_s']:>7.1f}")
+    print("\n  * recommended   = currently shipped (chunk 1000/200, Chroma HNSW defaults)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=None, help=f"Job postings JSON (default: {DATA_PATH}, else {SAMPLE_DATA_PATH})")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 1000, 2000])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 100, 200])
+    parser.add_argument("--m", type=int, nargs="+", default=[16, 32], help="HNSW M (graph degree)")
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--k", type=int, nargs="+", default=[2, 5, 10], help="Cut-offs for recall@k (chunks retrieved)")
+    parser.add_argument("--ship-k", type=int, default=int(os.getenv("RAG_RETRIEVAL_K", "2")), help="k the recommendation optimises (RAG_RETRIEVAL_K)")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Recall a faster configuration may give up")
+    parser.add_argument("--max-queries", type=int, default=300, help="0 = all labelled queries")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--fake-embeddings", action="store_true", help="Hashed bag-of-words vectors instead of Ollama (no quality signal, for smoke runs)")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    ks = sorted(set(args.k) | {args.ship_k})
+
+    path = args.data or (DATA_PATH if os.path.exists(DATA_PATH) else SAMPLE_DATA_PATH)
+    df = pd.read_json(path)
+    queries = build_queries(df, args.max_queries, args.seed)
+    print(f"{len(df)} postings from {path}, {len(queries)} labelled queries "
+          f"({sum(q['kind'] == 'title' for q in queries)} title, {sum(q['kind'] == 'skills' for q in queries)} skills)")
+
+    if args.fake_embeddings:
+        from benchmarks.fakes import FakeEmbeddings
+        embeddings = FakeEmbeddings(call_latency=0.0, text_latency=0.0)
+    else:
+        from langchain_ollama import OllamaEmbeddings
+        embeddings = OllamaEmbeddings(model=args.embedding_model)
+
+    query_vectors: Dict[str, List[float]] = {}
+    query_embed_s = embed_texts(embeddings, [q["text"] for q in queries], query_vectors)
+    print(f"Query embedding: {query_embed_s / max(1, len(query_vectors)) * 1000:.1f} ms/query (not included in latencies below)\n")
+
+    hnsw_grid = [dict(zip(("M", "construction_ef", "search_ef"), values))
+                 for values in itertools.product(args.m, args.construction_ef, args.search_ef)]
+    workdir = tempfile.mkdtemp(prefix="retrieval_quality-")
+    results = []
+    try:
+        for chunk_size, chunk_overlap in itertools.product(args.chunk_sizes, args.overlaps):
+            if chunk_overlap >= chunk_size:
+                continue
+            chunks = split_postings(df, chunk_size, chunk_overlap)
+            vectors: Dict[str, List[float]] = {}
+            embed_s = embed_texts(embeddings, [text for text, _ in chunks], vectors)
+            for hnsw in hnsw_grid:
+                variant_dir = os.path.join(workdir, f"{chunk_size}-{chunk_overlap}-{hnsw['M']}-{hnsw['construction_ef']}-{hnsw['search_ef']}")
+                collection, build_s = build_index(variant_dir, chunks, vectors, hnsw)
+                result = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, **hnsw, "chunks": len(chunks),
+                          **evaluate(collection, queries, query_vectors, ks),
+                          "index_mb": round(_dir_size(variant_dir) / 1e6, 2), "embed_s": round(embed_s, 2), "build_s": round(build_s, 2)}
+                results.append(result)
+                print(f"  chunk {chunk_size}/{chunk_overlap} M={hnsw['M']} ef_c={hnsw['construction_ef']} ef_s={hnsw['search_ef']}: "
+                      f"recall@{args.ship_k}={result[f'recall@{args.ship_k}']:.3f} p95={result['p95_ms']:.2f} ms")
+                del collection
+                shutil.rmtree(variant_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if not results:
+        parser.error("no valid configurations (every overlap is >= its chunk size)")
+    pick = recommend(results, args.ship_k, args.tolerance)
+    print()
+    print_table(results, ks, pick)
+    print(f"\nShip: chunk_size={pick['chunk_size']} chunk_overlap={pick['chunk_overlap']} "
+          f"hnsw:M={pick['M']} hnsw:construction_ef={pick['construction_ef']} hnsw:search_ef={pick['search_ef']} "
+          f"(recall@{args.ship_k}={pick[f'recall@{args.ship_k}']:.3f}, MRR={pick['mrr']:.3f}, p95={pick['p95_ms']:.2f} ms)")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"retrieval_quality-{timestamp}.json")
+        config = {k: v for k, v in vars(args).items() if k != "no_save"}
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": timestamp, "git_commit": git_commit(), "data": path, "queries": len(queries),
+                       "config": config, "recommended": pick, "results": results}, f, indent=2)
+        print(f"\nSaved results to {out}")
+
+
+if __name__ == "__main__":
+    main()
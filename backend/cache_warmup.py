@@ -0,0 +1,141 @@
+import asyncio
+import fcntl
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+# --- Configuration ---
+FREQUENCY_PATH = os.getenv("QUIZ_FREQUENCY_PATH", "./recommendations/quiz_frequencies.json")
+WARMUP_TOP_N = int(os.getenv("CACHE_WARMUP_TOP_N", "50"))
+WARMUP_RATE_PER_SECOND = float(os.getenv("CACHE_WARMUP_RATE", "0.5"))  # generations started per second; 0 = no throttle
+WARMUP_INTERVAL_SECONDS = float(os.getenv("CACHE_WARMUP_INTERVAL", "0"))  # 0 = only once at startup
+SAVE_EVERY = 25
+
+
+def canonical_answers(answers: List[str]) -> List[str]:
+    """Order- and formatting-insensitive form of a quiz submission."""
+    return sorted(re.sub(r"\s+", " ", a).strip().lower() for a in answers)
+
+
+def quiz_fingerprint(model_name: str, answers: List[str]) -> str:
+    return f"{model_name}::" + "|".join(canonical_answers(answers))
+
+
+class QuizFrequencyTracker:
+    """
+    Counts quiz-answer fingerprints and persists them so warm-up survives restarts.
+    Saves merge this process's new counts into the file under an exclusive lock on
+    `<path>.lock`, so several workers can share it. `save` does blocking file I/O;
+    call it from a thread when on the event loop.
+    """
+    def __init__(self, path: str = FREQUENCY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one save at a time in this process; flock covers other workers
+        self.counts: Counter = Counter()
+        self.pending: Counter = Counter()
+        self.samples: Dict[str, Dict[str, Any]] = {}
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def load(self) -> None:
+        with self._lock:
+            for fingerprint, entry in self._read().items():
+                self.counts[fingerprint] = entry["count"]
+                self.samples[fingerprint] = {"model": entry["model"], "answers": entry["answers"]}
+        print(f"Loaded {len(self.counts)} quiz answer fingerprints for cache warm-up.")
+
+    def record(self, model_name: str, answers: List[str]) -> str:
+        fingerprint = quiz_fingerprint(model_name, answers)
+        with self._lock:
+            self.counts[fingerprint] += 1
+            self.pending[fingerprint] += 1
+            self.samples.setdefault(fingerprint, {"model": model_name, "answers": list(answers)})
+        return fingerprint
+
+    def save_due(self) -> bool:
+        with self._lock:
+            return sum(self.pending.values()) >= SAVE_EVERY
+
+    def save(self) -> None:
+        with self._save_lock:
+            with self._lock:
+                pending, self.pending = self.pending, Counter()
+                samples = {fingerprint: self.samples[fingerprint] for fingerprint in pending}
+            if not pending:
+                return
+            try:
+                totals = self._merge(pending, samples)
+            except OSError as e:
+                print(f"Saving quiz frequencies to {self.path} failed, keeping the counts for the next save: {e}")
+                with self._lock:
+                    self.pending.update(pending)
+                return
+            with self._lock:
+                for fingerprint, count in totals.items():
+                    # Other workers' counts plus anything recorded here since the snapshot
+                    self.counts[fingerprint] = count + self.pending[fingerprint]
+
+    def _merge(self, pending: Counter, samples: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        """Adds `pending` to the file's counts under the cross-process lock; returns the merged counts."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = self._read()
+                for fingerprint, delta in pending.items():
+                    entry = data.setdefault(fingerprint, {"count": 0, **samples[fingerprint]})
+                    entry["count"] += delta
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return {fingerprint: data[fingerprint]["count"] for fingerprint in pending}
+
+    def top(self, n: int) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            return [(fingerprint, self.samples[fingerprint]) for fingerprint, _ in self.counts.most_common(n)]
+
+
+async def warm_up(tracker: QuizFrequencyTracker, cache: Dict[str, Any],
+                  generate: Callable[[str, List[str]], Awaitable[Any]],
+                  top_n: int = WARMUP_TOP_N, rate_per_second: float = WARMUP_RATE_PER_SECOND) -> int:
+    """
+    Pre-generates answers for the most frequent quiz submissions missing from `cache`,
+    starting at most `rate_per_second` generations per second (no limit when it is 0).
+    Returns how many were warmed.
+    """
+    warmed = 0
+    for fingerprint, sample in tracker.top(top_n):
+        if fingerprint in cache:
+            continue
+        try:
+            await generate(sample["model"], sample["answers"])
+            warmed += 1
+        except Exception as e:
+            print(f"Cache warm-up failed for {fingerprint}: {e}")
+        if rate_per_second > 0:
+            await asyncio.sleep(1.0 / rate_per_second)
+    print(f"Cache warm-up finished: {warmed} quiz recommendations pre-generated.")
+    return warmed
+
+
+async def run_warmup_schedule(tracker: QuizFrequencyTracker, cache: Dict[str, Any],
+                              generate: Callable[[str, List[str]], Awaitable[Any]],
+                              interval: float = WARMUP_INTERVAL_SECONDS) -> None:
+    """Warms up once, then again every `interval` seconds if set."""
+    while True:
+        await warm_up(tracker, cache, generate)
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+# --- Bundle Layout ---
+# bundles/
+#   CURRENT                  <- name of the active version
+#   <version>/manifest.json  <- small metadata (skill mapping, columns, estimator params)
+#   <version>/*.npy          <- arrays, memory-mapped on load
+current_dir = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_ROOT = os.path.join(current_dir, 'bundles')
+LEGACY_TOOLS_PATH = os.path.join(current_dir, 'preprocessing_tools.pkl')
+LEGACY_MODEL_PATH = os.path.join(current_dir, 'career_model.pkl')
+BUNDLE_FORMAT = 1
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9._-]+$')
+
+
+class UnknownBundle(FileNotFoundError):
+    """Raised when a version does not name an existing bundle under the bundle root."""
+
+
+class CareerArtifacts:
+    """Everything `predict_careers` needs, loaded from one bundle version (or the legacy pickles)."""
+    def __init__(self, version, skill_mapping, vectorizer_domain, vectorizer_projects, major_columns, label_encoder, model):
+        self.version = version
+        self.skill_mapping = skill_mapping
+        self.vectorizer_domain = vectorizer_domain
+        self.vectorizer_projects = vectorizer_projects
+        self.major_columns = list(major_columns)
+        self.major_column_index = {col: i for i, col in enumerate(self.major_columns)}
+        self.label_encoder = label_encoder
+        self.model = model
+        # Class names in the model's output column order, resolved once
+        self.class_names = label_encoder.inverse_transform(model.classes_)
+
+
+def _json_params(estimator):
+    """Estimator constructor params that survive a JSON round trip (callables are dropped)."""
+    params = {}
+    for key, value in estimator.get_params().items():
+        if key == 'dtype':
+            params[key] = np.dtype(value).name
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            params[key] = value
+        elif isinstance(value, (tuple, list)) and all(isinstance(v, (str, int, float)) for v in value):
+            params[key] = list(value)
+    return params
+
+
+def _restore_vectorizer(params, terms, idf):
+    params = dict(params)
+    if 'dtype' in params:
+        params['dtype'] = np.dtype(params['dtype']).type
+    if 'ngram_range' in params:
+        params['ngram_range'] = tuple(params['ngram_range'])
+    params.pop('vocabulary', None)
+    vectorizer = TfidfVectorizer(vocabulary={term: i for i, term in enumerate(terms.tolist())}, **params)
+    vectorizer.idf_ = idf
+    return vectorizer
+
+
+def export_bundle(tools, model, version=None, root=BUNDLE_ROOT, activate=True):
+    """
+    Writes a versioned bundle from the training outputs.
+
+    Args:
+        tools (dict): The preprocessing tools dictionary saved by the training script.
+        model (LogisticRegression): The fitted classifier.
+        version (str): Bundle name; defaults to a timestamp.
+        activate (bool): Point `CURRENT` at the new bundle.
+
+    Returns:
+        str: The bundle directory.
+    """
+    version = version or time.strftime('%Y%m%d-%H%M%S')
+    bundle_dir = os.path.join(root, version)
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    # Career labels are an object array in the encoder; store them as fixed-width unicode
+    arrays = {'coef': model.coef_, 'intercept': model.intercept_, 'model_classes': model.classes_,
+              'label_classes': np.asarray(tools['label_encoder'].classes_, dtype=str)}
+    for name in ('vectorizer_domain', 'vectorizer_projects'):
+        vectorizer = tools[name]
+        terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        arrays[f'{name}_terms'] = np.array(terms, dtype=str)
+        arrays[f'{name}_idf'] = vectorizer.idf_
+    for name, array in arrays.items():
+        np.save(os.path.join(bundle_dir, f'{name}.npy'), np.asarray(array), allow_pickle=False)
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'skill_mapping': tools['skill_mapping'],
+        'major_columns': list(tools['major_columns']),
+        'model_params': _json_params(model),
+        'vectorizer_domain_params': _json_params(tools['vectorizer_domain']),
+        'vectorizer_projects_params': _json_params(tools['vectorizer_projects']),
+    }
+    with open(os.path.join(bundle_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    if activate:
+        set_current_version(version, root)
+    return bundle_dir
+
+
+def list_bundles(root=BUNDLE_ROOT):
+    """Names of the bundle versions under `root` (directories with a manifest)."""
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if os.path.isfile(os.path.join(root, name, 'manifest.json')))
+
+
+def bundle_path(version, root=BUNDLE_ROOT):
+    """
+    Resolves a version name to its bundle directory.
+
+    Raises:
+        ValueError: If the name is not a plain bundle name.
+        UnknownBundle: If no such bundle exists directly under `root`.
+    """
+    if not VERSION_PATTERN.fullmatch(version or '') or version in ('.', '..'):
+        raise ValueError(f"Invalid bundle version '{version}'.")
+    bundle_dir = os.path.realpath(os.path.join(root, version))
+    if os.path.dirname(bundle_dir) != os.path.realpath(root) or version not in list_bundles(root):
+        raise UnknownBundle(f"Unknown bundle version '{version}'.")
+    return bundle_dir
+
+
+def load_bundle(version, root=BUNDLE_ROOT, mmap=True):
+    """Loads a bundle; large arrays are memory-mapped so start-up cost is independent of model size."""
+    bundle_dir = bundle_path(version, root)
+    with open(os.path.join(bundle_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {manifest.get('format')} in '{bundle_dir}'.")
+
+    def array(name):
+        return np.load(os.path.join(bundle_dir, f'{name}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+
+    model = LogisticRegression(**manifest['model_params'])
+    model.coef_ = array('coef')
+    model.intercept_ = array('intercept')
+    model.classes_ = np.asarray(array('model_classes'))
+
+    label_encoder = LabelEncoder()
+    # Back to an object array, as the pickled encoder has it
+    label_encoder.classes_ = np.asarray(array('label_classes')).astype(object)
+
+    return CareerArtifacts(
+        version=manifest['version'],
+        skill_mapping=manifest['skill_mapping'],
+        vectorizer_domain=_restore_vectorizer(manifest['vectorizer_domain_params'], array('vectorizer_domain_terms'), np.asarray(array('vectorizer_domain_idf'))),
+        vectorizer_projects=_restore_vectorizer(manifest['vectorizer_projects_params'], array('vectorizer_projects_terms'), np.asarray(array('vectorizer_projects_idf'))),
+        major_columns=manifest['major_columns'],
+        label_encoder=label_encoder,
+        model=model,
+    )
+
+
+def load_legacy_pickles(tools_path=LEGACY_TOOLS_PATH, model_path=LEGACY_MODEL_PATH):
+    with open(tools_path, 'rb') as f:
+        tools = pickle.load(f)
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    return tools, model
+
+
+def get_current_version(root=BUNDLE_ROOT):
+    try:
+        with open(os.path.join(root, 'CURRENT'), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current_version(version, root=BUNDLE_ROOT):
+    # Write-then-rename so readers never see a half-written pointer
+    tmp_path = os.path.join(root, 'CURRENT.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, 'CURRENT'))
+
+
+def load_artifacts(version=None, root=BUNDLE_ROOT):
+    """
+    Loads the requested (or active) bundle, falling back to the legacy pickles.
+
+    Raises:
+        FileNotFoundError: If neither a bundle nor the pickles exist.
+    """
+    version = version or get_current_version(root)
+    if version:
+        return load_bundle(version, root)
+    tools, model = load_legacy_pickles()
+    return CareerArtifacts(
+        version='legacy-pickle',
+        skill_mapping=tools['skill_mapping'],
+        vectorizer_domain=tools['vectorizer_domain'],
+        vectorizer_projects=tools['vectorizer_projects'],
+        major_columns=tools['major_columns'],
+        label_encoder=tools['label_encoder'],
+        model=model,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert the training pickles into a versioned, memory-mappable bundle.")
+    parser.add_argument('--version', default=None, help="Bundle name (default: timestamp)")
+    parser.add_argument('--no-activate', action='store_true', help="Do not point CURRENT at the new bundle")
+    args = parser.parse_args()
+
+    tools, model = load_legacy_pickles()
+    bundle_dir = export_bundle(tools, model, version=args.version, activate=not args.no_activate)
+    print(f"Bundle written to {bundle_dir}")
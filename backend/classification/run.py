@@ -1,41 +1,125 @@
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from scipy.sparse import hstack
+from scipy.sparse import hstack, csr_matrix
 import numpy as np
-import pickle
-import os
+import threading
 
 # --- Loading the Preprocessing Tools and Model ---
-print("--- Loading Preprocessing Tools and Model ---")
+# Artifacts are loaded on first use (not at import) and can be hot-swapped
+# with `install_artifacts` after a retrain. See classification/artifacts.py.
+_artifacts = None
+_artifacts_lock = threading.Lock()
 
-# Get the absolute path to the directory of the current script
-current_dir = os.path.dirname(os.path.abspath(__file__))
-tools_path = os.path.join(current_dir, 'preprocessing_tools.pkl')
-model_path = os.path.join(current_dir, 'career_model.pkl')
 
+class ClassifierUnavailable(RuntimeError):
+    """Raised when no model bundle or legacy pickle can be loaded."""
 
-# This assumes you have already saved these files from your training script.
-try:
-    with open(tools_path, 'rb') as f:
-        tools = pickle.load(f)
 
-    with open(model_path, 'rb') as f:
-        loaded_model = pickle.load(f)
+def get_artifacts():
+    """Returns the active model artifacts, loading them on the first call."""
+    global _artifacts
+    if _artifacts is None:
+        with _artifacts_lock:
+            if _artifacts is None:
+                _artifacts = _load(None)
+    return _artifacts
 
-    # Extract the necessary tools
-    skill_mapping = tools['skill_mapping']
-    vectorizer_domain = tools['vectorizer_domain']
-    vectorizer_projects = tools['vectorizer_projects']
-    major_columns = tools['major_columns']
-    label_encoder = tools['label_encoder']
 
-    print("Tools and model loaded successfully.")
-except FileNotFoundError:
-    print("Error: Required files not found. Please run the training script first to create them.")
-    exit()
+def install_artifacts(version=None):
+    """
+    Loads a bundle (default: the one `CURRENT` points at) and swaps it in atomically.
+    In-flight predictions keep using the artifacts they started with.
+
+    Returns:
+        str: The installed version.
+    """
+    global _artifacts
+    artifacts = _load(version)
+    with _artifacts_lock:
+        _artifacts = artifacts
+    return artifacts.version
+
+
+def _load(version):
+    try:
+        from classification.artifacts import load_artifacts
+    except ImportError:  # run as a script from inside classification/
+        from artifacts import load_artifacts
+    try:
+        return load_artifacts(version)
+    except FileNotFoundError as e:
+        raise ClassifierUnavailable(f"Career model artifacts not found ({e}). Please run the training script first to create them.")
+
+def build_feature_matrix(list_of_answers, artifacts=None):
+    """
+    Builds the model's feature matrix for many quiz submissions at once.
+
+    Columns match the training layout: [GPA, Python, SQL, Java] + Major one-hot
+    + Interested Domain TF-IDF + Projects TF-IDF.
+
+    Args:
+        list_of_answers (list[dict]): Quiz answers in the same format as `predict_career`.
+        artifacts (CareerArtifacts): Model artifacts to use; defaults to the active ones.
+
+    Returns:
+        scipy.sparse.csr_matrix: One row per submission.
+    """
+    artifacts = artifacts or get_artifacts()
+    skill_mapping = artifacts.skill_mapping
+    n_rows = len(list_of_answers)
+
+    numeric = np.array([
+        [a['GPA'], skill_mapping[a['Python']], skill_mapping[a['SQL']], skill_mapping[a['Java']]]
+        for a in list_of_answers
+    ], dtype=float)
+
+    # Major one-hot straight into CSR; the dropped (first) major and unknown majors stay all-zero
+    major_rows, major_cols = [], []
+    for row, a in enumerate(list_of_answers):
+        col = artifacts.major_column_index.get(f"Major_{a['Major']}")
+        if col is not None:
+            major_rows.append(row)
+            major_cols.append(col)
+    majors = csr_matrix(
+        (np.ones(len(major_rows)), (major_rows, major_cols)),
+        shape=(n_rows, len(artifacts.major_columns))
+    )
+
+    # One transform call per vectorizer for the whole batch
+    domain_vectors = artifacts.vectorizer_domain.transform([
+        ' '.join(a[f'Interested Domain_{i}'] for i in range(1, 3)) for a in list_of_answers
+    ])
+    project_vectors = artifacts.vectorizer_projects.transform([
+        ' '.join(a[f'Projects_{i}'] for i in range(1, 4)) for a in list_of_answers
+    ])
+
+    return hstack([csr_matrix(numeric), majors, domain_vectors, project_vectors], format='csr')
+
+def predict_careers(list_of_answers, top_k=3):
+    """
+    Predicts careers for a batch of quiz submissions.
+
+    Args:
+        list_of_answers (list[dict]): One answers dictionary per user.
+        top_k (int): Number of ranked careers to return per user.
+
+    Returns:
+        list[dict]: For each user, the top career and the `top_k` careers with probabilities.
+    """
+    if not list_of_answers:
+        return []
+
+    artifacts = get_artifacts()
+    features = build_feature_matrix(list_of_answers, artifacts)
+    probabilities = artifacts.model.predict_proba(features)
+    class_names = artifacts.class_names
+
+    top_k = max(1, min(top_k, probabilities.shape[1]))
+    ranked = np.argsort(-probabilities, axis=1)[:, :top_k]
+
+    predictions = []
+    for row, columns in enumerate(ranked):
+        top = [{"career": str(class_names[c]), "probability": float(probabilities[row, c])} for c in columns]
+        predictions.append({"career": top[0]["career"], "top_k": top})
+    return predictions
 
 def predict_career(user_answers):
     """
@@ -47,10 +131,21 @@ def predict_career(user_answers):
     Returns:
         str: The predicted career title.
     """
+    return predict_careers([user_answers], top_k=1)[0]["career"]
 
-    # --- The Preprocessing Pipeline for New Data ---
-    print("\n--- Preprocessing Quiz Answers for the Model ---")
+def predict_career_per_row(user_answers):
+    """
+    The original single-row pandas pipeline, kept as the baseline for
+    `benchmarks/classifier_throughput.py`.
 
+    Note: `pd.get_dummies` on a single value with `drop_first=True` drops that value,
+    so this path never sets a Major column; `build_feature_matrix` encodes it properly.
+    """
+    import pandas as pd
+
+    artifacts = get_artifacts()
+    skill_mapping = artifacts.skill_mapping
+    # --- The Preprocessing Pipeline for New Data ---
     # Combine Interested Domain answers into a single string for vectorization
     user_domain_text = ' '.join([user_answers[f'Interested Domain_{i}'] for i in range(1, 3)])
 
@@ -67,14 +162,14 @@ def predict_career(user_answers):
 
     # Process 'Major' with one-hot encoding, ensuring it matches the training columns
     user_major_encoded = pd.get_dummies([user_answers['Major']], drop_first=True, prefix='Major')
-    final_major_cols = pd.DataFrame(0, index=[0], columns=major_columns)
+    final_major_cols = pd.DataFrame(0, index=[0], columns=artifacts.major_columns)
     for col in user_major_encoded.columns:
         if col in final_major_cols.columns:
             final_major_cols[col] = 1
 
     # Apply TF-IDF vectorization to the user's text answers
-    user_domain_vector = vectorizer_domain.transform([user_domain_text])
-    user_projects_vector = vectorizer_projects.transform([user_projects_text])
+    user_domain_vector = artifacts.vectorizer_domain.transform([user_domain_text])
+    user_projects_vector = artifacts.vectorizer_projects.transform([user_projects_text])
 
     # Combine all processed features into a single sparse matrix
     user_features_combined = hstack([
@@ -85,13 +180,11 @@ def predict_career(user_answers):
     ])
 
     # --- Making a Prediction ---
-    print("\n--- Making a Prediction... ---")
-
     # Make a prediction with the loaded model
-    prediction_numeric = loaded_model.predict(user_features_combined)
+    prediction_numeric = artifacts.model.predict(user_features_combined)
 
     # Convert the numerical prediction back to a career title
-    predicted_career = label_encoder.inverse_transform(prediction_numeric)
+    predicted_career = artifacts.label_encoder.inverse_transform(prediction_numeric)
 
     return predicted_career[0]
 
@@ -0,0 +1,115 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+from token_utils import count_tokens, truncate_to_tokens
+
+# --- Configuration ---
+# Prompt tokens available for retrieved context, per model (the rest of the window is prompt, history and answer)
+CONTEXT_BUDGETS = {
+    "llama3.2": 1200,
+    "custom_mistral": 1200,
+    "gemini": 3000,
+}
+DEFAULT_CONTEXT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+MAX_CHUNKS_PER_JOB = int(os.getenv("CONTEXT_MAX_CHUNKS_PER_JOB", "1"))
+MIN_PARTIAL_TOKENS = 80  # a chunk cut below this is more noise than context
+# "raw": cleaned chunk text; "summary": the per-job retrieval summary stored by summarize_chunks.py, when present
+CONTEXT_MODE = os.getenv("RAG_CONTEXT_MODE", "raw")
+
+# Sentences that describe the employer or the application process rather than the role
+BOILERPLATE_PATTERNS = re.compile(
+    r"equal (employment )?opportunit|\beeo\b|affirmative action|regardless of (race|age|sex|gender)|"
+    r"without regard to|protected veteran|disabilit(y|ies) status|reasonable accommodation|e-verify|"
+    r"benefits (package|include)|401\(?k\)?|paid time off|\bpto\b|dental|vision insurance|health insurance|"
+    r"tuition reimbursement|employee assistance program|apply (now|today|online)|click (here|apply)|"
+    r"background check|drug[- ]free|pay range|salary range|compensation range",
+    re.IGNORECASE,
+)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?;])\s+|\s*·\s*")
+
+
+def context_budget(model_name: str) -> int:
+    return int(os.getenv(f"CONTEXT_TOKEN_BUDGET_{model_name.upper()}", CONTEXT_BUDGETS.get(model_name, DEFAULT_CONTEXT_BUDGET)))
+
+
+def clean_chunk(text: str) -> str:
+    """Drops boilerplate sentences and lower-cases all-caps postings (they tokenize far worse)."""
+    lines = []
+    for line in text.splitlines():
+        sentences = [s.strip() for s in _SENTENCE_SPLIT.split(line) if s and s.strip()]
+        kept = [s for s in sentences if not BOILERPLATE_PATTERNS.search(s)]
+        if kept:
+            lines.append(" ".join(kept))
+    cleaned = "\n".join(lines)
+    letters = [c for c in cleaned if c.isalpha()]
+    if letters and sum(c.isupper() for c in letters) / len(letters) > 0.6:
+        cleaned = cleaned.lower()
+    return cleaned
+
+
+def pack_context(documents: List[Document], model_name: str, budget: Optional[int] = None,
+                 mode: Optional[str] = None) -> Tuple[List[Document], Dict[str, Any]]:
+    """
+    Fits retrieved chunks (in retrieval order) into the model's context token budget:
+    keeps at most MAX_CHUNKS_PER_JOB chunks per job posting (`original_index`), strips
+    boilerplate (or uses the job's retrieval summary in "summary" mode), and truncates
+    or drops whatever no longer fits.
+    Returns (packed documents, stats).
+    """
+    budget = budget if budget is not None else context_budget(model_name)
+    mode = mode or CONTEXT_MODE
+    packed: List[Document] = []
+    per_job: Dict[Any, int] = {}
+    seen_texts = set()
+    raw_tokens = used = 0
+    dropped = {"duplicate": 0, "empty": 0, "budget": 0}
+    truncated = summarized = 0
+
+    for doc in documents:
+        raw_tokens += count_tokens(doc.page_content)
+        job = doc.metadata.get("original_index", id(doc))
+        if per_job.get(job, 0) >= MAX_CHUNKS_PER_JOB:
+            dropped["duplicate"] += 1
+            continue
+        summary = doc.metadata.get("retrieval_summary") if mode == "summary" else None
+        text = summary or clean_chunk(doc.page_content)
+        summarized += int(bool(summary))
+        if not text:
+            dropped["empty"] += 1
+            continue
+        if text in seen_texts:
+            dropped["duplicate"] += 1
+            continue
+
+        remaining = budget - used
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            # The best-ranked chunk is always kept (cut to the budget); later ones only if enough room is left
+            if packed and remaining < MIN_PARTIAL_TOKENS:
+                dropped["budget"] += 1
+                continue
+            text = truncate_to_tokens(text, remaining)
+            tokens = count_tokens(text)
+            truncated += 1
+
+        seen_texts.add(text)
+        per_job[job] = per_job.get(job, 0) + 1
+        packed.append(Document(page_content=text, metadata=doc.metadata, id=getattr(doc, "id", None)))
+        used += tokens
+
+    stats = {
+        "model": model_name,
+        "mode": mode,
+        "budget": budget,
+        "raw_tokens": raw_tokens,
+        "used_tokens": used,
+        "kept": len(packed),
+        "truncated": truncated,
+        "summarized": summarized,
+        "dropped": sum(dropped.values()),
+        "dropped_by_reason": dropped,
+    }
+    return packed, stats
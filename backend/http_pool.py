@@ -0,0 +1,138 @@
+import os
+import threading
+from typing import Any, Dict
+
+import httpx
+
+# --- Configuration ---
+MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "32"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "90"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))  # LLM generations can be slow
+
+try:
+    import h2  # noqa: F401  (HTTP/2 support for httpx is optional)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+POOL_LIMITS = httpx.Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=KEEPALIVE_EXPIRY,
+)
+POOL_TIMEOUT = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+class ConnectionStats:
+    """Counts requests, new TCP connections and TLS handshakes seen by a transport."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.https_requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def on_request(self, https: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.https_requests += int(https)
+
+    def on_event(self, event_name: str) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(0, self.requests - self.connections_opened)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+                "tls_handshakes": self.tls_handshakes,
+                "tls_handshakes_saved": max(0, self.https_requests - self.tls_handshakes),
+            }
+
+
+class InstrumentedHTTPTransport(httpx.HTTPTransport):
+    """Pooled sync transport that reports connection reuse through httpcore trace events."""
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.on_request(request.url.scheme == "https")
+        request.extensions["trace"] = lambda event_name, info: self.stats.on_event(event_name)
+        return super().handle_request(request)
+
+
+class InstrumentedAsyncHTTPTransport(httpx.AsyncHTTPTransport):
+    """Pooled async transport that reports connection reuse through httpcore trace events."""
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.stats.on_request(request.url.scheme == "https")
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            self.stats.on_event(event_name)
+
+        request.extensions["trace"] = trace
+        return await super().handle_async_request(request)
+
+
+# --- Global Variables ---
+# One sync and one async pool per upstream service, shared by every client talking to it.
+_transports = {}
+_stats: Dict[str, ConnectionStats] = {}
+_external_stats = {}
+_transport_lock = threading.Lock()
+
+
+def _get_stats(service: str) -> ConnectionStats:
+    if service not in _stats:
+        _stats[service] = ConnectionStats()
+    return _stats[service]
+
+
+def get_transport(service: str, asynchronous: bool = True):
+    """Returns the long-lived pooled transport for `service`, creating it on first use."""
+    key = (service, asynchronous)
+    with _transport_lock:
+        if key not in _transports:
+            transport_class = InstrumentedAsyncHTTPTransport if asynchronous else InstrumentedHTTPTransport
+            _transports[key] = transport_class(_get_stats(service), limits=POOL_LIMITS, http2=HTTP2_AVAILABLE)
+        return _transports[key]
+
+
+def httpx_client_kwargs(service: str, asynchronous: bool = True) -> Dict[str, Any]:
+    """Keyword arguments that make an httpx client (or an SDK wrapping one) use the shared pool."""
+    return {"transport": get_transport(service, asynchronous), "timeout": POOL_TIMEOUT}
+
+
+def register_stats(service: str, snapshot_fn) -> None:
+    """Registers an external stats source (e.g. a requests/urllib3 pool) under `service`."""
+    _external_stats[service] = snapshot_fn
+
+
+def pool_stats() -> Dict[str, Any]:
+    stats = {service: s.snapshot() for service, s in _stats.items()}
+    for service, snapshot_fn in _external_stats.items():
+        stats[service] = snapshot_fn()
+    return {"http2": HTTP2_AVAILABLE, "services": stats}
+
+
+async def aclose_all() -> None:
+    """Closes every pooled transport (called on application shutdown)."""
+    for (service, asynchronous), transport in list(_transports.items()):
+        if asynchronous:
+            await transport.aclose()
+        else:
+            transport.close()
+    _transports.clear()
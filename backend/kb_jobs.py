@@ -0,0 +1,309 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+# --- Configuration ---
+JOBS_DB_PATH = os.getenv("KB_JOBS_DB", "./kb_jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("KB_JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("KB_JOB_RETENTION_SECONDS", "86400"))
+MAX_JOB_ATTEMPTS = 3  # a job interrupted by this many restarts is failed instead of requeued
+# Each process marks the jobs it runs every HEARTBEAT_SECONDS; a running job whose owner has been
+# silent for STALE_SECONDS is requeued by any live process (several uvicorn workers share the file)
+HEARTBEAT_SECONDS = float(os.getenv("KB_JOB_HEARTBEAT_SECONDS", "10"))
+STALE_SECONDS = float(os.getenv("KB_JOB_STALE_SECONDS", "60"))
+PROGRESS_FLUSH_SECONDS = 0.5
+EVENT_KEEPALIVE_SECONDS = 15.0
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    heartbeat_at REAL
+)
+"""
+# Added after the first release; ALTERed into existing databases on start
+MIGRATED_COLUMNS = {"owner": "TEXT", "heartbeat_at": "REAL"}
+
+
+class JobProgress:
+    """
+    Progress of a running job: the current stage with done/total units and an
+    ETA from the stage's rate so far, plus cumulative named counters. Safe to
+    update from worker threads.
+    """
+    def __init__(self, notify: Callable[[], None]):
+        self.stage = "starting"
+        self.done = 0
+        self.total = 0
+        self.counters: Dict[str, int] = {}
+        self._stage_started = time.monotonic()
+        self._notify = notify
+        self._lock = threading.Lock()
+
+    def start_stage(self, stage: str, total: int) -> None:
+        with self._lock:
+            self.stage = stage
+            self.done = 0
+            self.total = total
+            self._stage_started = time.monotonic()
+        self._notify()
+
+    def advance(self, n: int = 1, counter: Optional[str] = None) -> None:
+        with self._lock:
+            self.done += n
+            if counter:
+                self.counters[counter] = self.counters.get(counter, 0) + n
+        self._notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self._stage_started
+            eta = elapsed / self.done * (self.total - self.done) if self.done and self.total else None
+            return {"stage": self.stage, "done": self.done, "total": self.total,
+                    "eta_seconds": round(eta, 1) if eta is not None else None, **self.counters}
+
+
+JobHandler = Callable[[Dict[str, Any], JobProgress], Awaitable[Any]]
+
+
+class JobQueue:
+    """
+    Background jobs persisted in SQLite, shared by every process using the same file.
+    A job is claimed atomically by one process, which keeps a heartbeat on it while it
+    runs; jobs whose owner stopped or died are requeued and picked up by a live process.
+    """
+    def __init__(self, path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS):
+        self.path = path
+        self.workers = workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: list = []
+        self._progress: Dict[str, JobProgress] = {}
+        self._flushed: Dict[str, float] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._queued: set = set()  # job IDs in this process's queue
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    # --- Storage ---
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _row(self, job_id: str) -> Optional[sqlite3.Row]:
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _update_owned(self, job_id: str, **fields: Any) -> bool:
+        """Updates a job only while this process owns it; False if another process has taken it over."""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._db_lock:
+            cursor = self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND owner = ?",
+                                      (*fields.values(), job_id, self.owner))
+            return cursor.rowcount == 1
+
+    def _claim(self, job_id: str) -> bool:
+        now = time.time()
+        with self._db_lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat_at = ?, started_at = ?, attempts = attempts + 1 "
+                "WHERE id = ? AND status = 'queued'", (self.owner, now, now, job_id))
+            return cursor.rowcount == 1
+
+    def _migrate(self) -> None:
+        existing = {row["name"] for row in self._execute("PRAGMA table_info(jobs)")}
+        for column, column_type in MIGRATED_COLUMNS.items():
+            if column not in existing:
+                self._execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def _enqueue(self, job_id: str) -> None:
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    def _recover(self) -> int:
+        """Requeues running jobs whose owner stopped heartbeating and queues every waiting job; returns how many were requeued."""
+        now = time.time()
+        stale = now - STALE_SECONDS
+        self._execute("UPDATE jobs SET status = 'failed', error = 'Interrupted by too many restarts', finished_at = ? "
+                      "WHERE status = 'running' AND attempts >= ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                      (now, MAX_JOB_ATTEMPTS, stale))
+        requeued = self._execute("SELECT id FROM jobs WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)", (stale,))
+        for row in requeued:
+            self._execute("UPDATE jobs SET status = 'queued', owner = NULL WHERE id = ? AND status = 'running' "
+                          "AND (heartbeat_at IS NULL OR heartbeat_at < ?)", (row["id"], stale))
+        # Includes jobs submitted to other processes; whichever claims one first runs it
+        for row in self._execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"):
+            self._enqueue(row["id"])
+        return len(requeued)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                self._execute("UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'", (time.time(), self.owner))
+                requeued = self._recover()
+                if requeued:
+                    print(f"KB jobs: requeued {requeued} job(s) whose process stopped responding.")
+            except sqlite3.Error as e:
+                print(f"KB jobs heartbeat failed: {e}")
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(SCHEMA)
+        self._migrate()
+        self._execute("DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                      (time.time() - JOB_RETENTION_SECONDS,))
+
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        # Jobs still heartbeating belong to another live process and are left alone
+        requeued = self._recover()
+        if requeued or self._queue.qsize():
+            print(f"KB jobs: resuming {self._queue.qsize()} queued job(s), {requeued} interrupted by a stopped process.")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._db is not None:
+            # Hand this process's interrupted jobs back right away instead of waiting for them to go stale
+            self._execute("UPDATE jobs SET status = 'queued', owner = NULL WHERE owner = ? AND status = 'running'", (self.owner,))
+            self._db.close()
+            self._db = None
+
+    # --- Jobs ---
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'.")
+        job_id = uuid.uuid4().hex
+        self._execute("INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, 'queued', ?, ?)",
+                      (job_id, kind, json.dumps(payload), time.time()))
+        self._enqueue(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._row(job_id)
+        if row is None:
+            return None
+        live = self._progress.get(job_id)
+        progress = live.snapshot() if live is not None else json.loads(row["progress"] or "null")
+        job = {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": progress,
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["status"] == "queued":
+            job["queue_position"] = self._execute(
+                "SELECT COUNT(*) AS ahead FROM jobs WHERE status = 'queued' AND created_at < ?", (row["created_at"],))[0]["ahead"]
+        if row["error"]:
+            job["error"] = row["error"]
+        if row["status"] == "succeeded":
+            job["result"] = json.loads(row["result"])
+        return job
+
+    async def events(self, job_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Job snapshots whenever the job changes, until it finishes; None is a keep-alive tick."""
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job["status"] in TERMINAL_STATUSES:
+                yield job
+                return
+            # Registered before yielding so a change made meanwhile still wakes us; only live jobs get
+            # one, and the worker pops it when the job changes or finishes
+            event = self._events.setdefault(job_id, asyncio.Event())
+            yield job
+            try:
+                await asyncio.wait_for(event.wait(), timeout=EVENT_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+
+    def _changed(self, job_id: str) -> None:
+        """Wakes event subscribers and writes live progress to the database at most every PROGRESS_FLUSH_SECONDS."""
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+        progress = self._progress.get(job_id)
+        now = time.monotonic()
+        if progress is not None and now - self._flushed.get(job_id, 0.0) >= PROGRESS_FLUSH_SECONDS:
+            self._flushed[job_id] = now
+            self._update(job_id, progress=json.dumps(progress.snapshot()))
+
+    def _notifier(self, job_id: str) -> Callable[[], None]:
+        loop = self._loop
+        return lambda: loop.call_soon_threadsafe(self._changed, job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            if not self._claim(job_id):
+                continue  # finished, or claimed by another process
+            row = self._row(job_id)
+            progress = JobProgress(self._notifier(job_id))
+            self._progress[job_id] = progress
+            self._changed(job_id)
+            try:
+                result = await self._handlers[row["kind"]](json.loads(row["payload"]), progress)
+                finished = self._update_owned(job_id, status="succeeded", result=json.dumps(result),
+                                              progress=json.dumps(progress.snapshot()), finished_at=time.time())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"KB job {job_id} ({row['kind']}) failed: {e}")
+                finished = self._update_owned(job_id, status="failed", error=str(e) or repr(e),
+                                              progress=json.dumps(progress.snapshot()), finished_at=time.time())
+            finally:
+                self._progress.pop(job_id, None)
+                self._flushed.pop(job_id, None)
+                event = self._events.pop(job_id, None)
+                if event is not None:
+                    event.set()
+            if not finished:
+                print(f"KB job {job_id} was taken over by another process; discarding this run's outcome.")
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {row["status"]: row["n"] for row in self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        return {"workers": self.workers, "running": len(self._progress), **counts}
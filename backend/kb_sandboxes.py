@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# --- Configuration ---
+MAX_SANDBOXES = int(os.getenv("KB_SANDBOX_MAX_SANDBOXES", "20"))
+MAX_SANDBOX_BYTES = int(float(os.getenv("KB_SANDBOX_MAX_MB", "256")) * 1024 * 1024)  # across all sandboxes
+SANDBOX_IDLE_SECONDS = float(os.getenv("KB_SANDBOX_IDLE_SECONDS", "1800"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("KB_EMBEDDING_CACHE_SIZE", "20000"))  # vectors, shared by all sandboxes
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+HNSW_BYTES_PER_VECTOR = 2 * 16 * 4  # layer-0 neighbour lists at Chroma's default M=16
+EMBED_BATCH_SIZE = 64  # chunks added (and embedded) per call, so progress can be reported
+
+Chunk = Tuple[str, str, Dict[str, Any]]  # (id, text, metadata)
+
+
+class SandboxTooLarge(Exception):
+    """A single knowledge base does not fit in the sandbox memory budget."""
+
+
+class SandboxClosed(Exception):
+    """The sandbox was evicted or expired before it could be used."""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """LRU of content hash -> vector, so text that was embedded once is never embedded again."""
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        with self._lock:
+            found = {}
+            for key in keys:
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    self._vectors.move_to_end(key)
+                    found[key] = vector
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._vectors.update(items)
+            for key in items:
+                self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._vectors), "hits": self.hits, "misses": self.misses,
+                    "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0}
+
+
+class CachedEmbeddings(Embeddings):
+    """Document embeddings served from an `EmbeddingCache`; only unseen texts reach the wrapped model."""
+    def __init__(self, base: Embeddings, cache: EmbeddingCache):
+        self.base = base
+        self.cache = cache
+        self.dimensions = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [content_hash(text) for text in texts]
+        vectors = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            fresh = dict(zip(missing, self.base.embed_documents(list(missing.values()))))
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+        result = [vectors[key] for key in keys]
+        if result:
+            self.dimensions = len(result[0])
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.base.aembed_query(text)
+
+
+def validate_kb(kb_data: List[Any]) -> int:
+    """Checks the shape of a generated KB ([{title, sections: [{title, content}]}]); returns its section count."""
+    sections = 0
+    for i, topic in enumerate(kb_data):
+        if not isinstance(topic, dict) or not isinstance(topic.get('title'), str) or not isinstance(topic.get('sections'), list):
+            raise ValueError(f"KB entry {i} needs a 'title' and a 'sections' list.")
+        for section in topic['sections']:
+            if not isinstance(section, dict) or not isinstance(section.get('title'), str) or not isinstance(section.get('content'), str):
+                raise ValueError(f"Every section of KB entry {i} needs a 'title' and 'content'.")
+            sections += 1
+    return sections
+
+
+def kb_chunks(kb_data: List[Dict[str, Any]], on_section: Optional[Callable[[], None]] = None) -> List[Chunk]:
+    """
+    Splits a generated KB into chunks whose IDs are content hashes, so
+    re-uploading an edited KB only touches the chunks that actually changed.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks: Dict[str, Chunk] = {}
+    for topic in kb_data:
+        for section in topic['sections']:
+            metadata = {'topic': topic['title'], 'section': section['title']}
+            for text in splitter.split_text(section['content']):
+                chunk_id = content_hash(json.dumps([metadata['topic'], metadata['section'], text]))
+                chunks.setdefault(chunk_id, (chunk_id, text, metadata))
+            if on_section is not None:
+                on_section()
+    return list(chunks.values())
+
+
+class Sandbox:
+    """One author's temporary knowledge base: its own Chroma collection and RAG chain."""
+    def __init__(self, sandbox_id: str, vectordb, embeddings: CachedEmbeddings):
+        self.id = sandbox_id
+        self.vectordb = vectordb
+        self.embeddings = embeddings
+        self.chain = None
+        self.chunk_bytes: Dict[str, int] = {}
+        self.created = time.time()
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()  # one upload at a time per sandbox
+        self.users = 0  # uploads and chats currently using the collection
+        self.closing = False
+        self._state_lock = threading.Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(self.chunk_bytes.values())
+
+    def _estimate_bytes(self, text: str, metadata: Dict[str, Any]) -> int:
+        """Rough in-memory footprint of one chunk: text, metadata, float32 vector and HNSW links."""
+        return len(text.encode("utf-8")) + len(json.dumps(metadata)) + self.embeddings.dimensions * 4 + HNSW_BYTES_PER_VECTOR
+
+    def sync(self, chunks: List[Chunk], on_start: Optional[Callable[[int], None]] = None,
+             on_added: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+        """
+        Makes the collection hold exactly `chunks`: removes stale ones and embeds
+        only new ones. `on_start(new_count)` and `on_added(batch_count)` report progress.
+        """
+        wanted = {chunk_id for chunk_id, _, _ in chunks}
+        stale = [chunk_id for chunk_id in self.chunk_bytes if chunk_id not in wanted]
+        new = [chunk for chunk in chunks if chunk[0] not in self.chunk_bytes]
+        if on_start is not None:
+            on_start(len(new))
+        if stale:
+            self.vectordb.delete(ids=stale)
+            for chunk_id in stale:
+                del self.chunk_bytes[chunk_id]
+        for start in range(0, len(new), EMBED_BATCH_SIZE):
+            batch = new[start:start + EMBED_BATCH_SIZE]
+            self.vectordb.add_texts(texts=[text for _, text, _ in batch], metadatas=[m for _, _, m in batch], ids=[i for i, _, _ in batch])
+            for chunk_id, text, metadata in batch:
+                self.chunk_bytes[chunk_id] = self._estimate_bytes(text, metadata)
+            if on_added is not None:
+                on_added(len(batch))
+        return {"chunks": len(chunks), "added": len(new), "removed": len(stale), "unchanged": len(chunks) - len(new)}
+
+    @contextmanager
+    def in_use(self) -> Iterator["Sandbox"]:
+        """Holds the collection open for an upload or chat; raises SandboxClosed if it is being closed."""
+        with self._state_lock:
+            if self.closing:
+                raise SandboxClosed(self.id)
+            self.users += 1
+        try:
+            yield self
+        finally:
+            with self._state_lock:
+                self.users -= 1
+                drop = self.closing and self.users == 0
+            if drop:
+                self._drop()
+
+    def close(self) -> None:
+        """Drops the collection now, or when the last upload or chat using it finishes."""
+        with self._state_lock:
+            if self.closing:
+                return
+            self.closing = True
+            if self.users:
+                return
+        self._drop()
+
+    def _drop(self) -> None:
+        try:
+            self.vectordb.delete_collection()
+        except Exception as e:
+            print(f"Could not drop the collection of KB sandbox {self.id}: {e}")
+
+    def describe(self) -> Dict[str, Any]:
+        return {"sandbox_id": self.id, "chunks": len(self.chunk_bytes), "size_bytes": self.size_bytes,
+                "idle_seconds": round(time.monotonic() - self.last_access, 1)}
+
+
+def collection_name(sandbox_id: str) -> str:
+    """
+    A collection name unique to one Sandbox instance. Chroma shares in-memory collections
+    by name, so a re-upload must not reuse the name of a sandbox whose close is deferred.
+    """
+    return f"kb_sandbox_{sandbox_id}_{uuid.uuid4().hex[:8]}"
+
+
+class SandboxStore:
+    """LRU of sandbox ID -> Sandbox, bounded by count and estimated memory, with idle expiry."""
+    def __init__(self, max_sandboxes: int = MAX_SANDBOXES, max_bytes: int = MAX_SANDBOX_BYTES,
+                 idle_seconds: float = SANDBOX_IDLE_SECONDS):
+        self.max_sandboxes = max_sandboxes
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._sandboxes: "OrderedDict[str, Sandbox]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _sweep(self, keep: Optional[str] = None) -> List[Sandbox]:
+        """Drops idle sandboxes, then least recently used ones until within limits; returns them for closing."""
+        removed = []
+        now = time.monotonic()
+        while self._sandboxes:
+            sandbox_id, sandbox = next(iter(self._sandboxes.items()))
+            if now - sandbox.last_access < self.idle_seconds:
+                break
+            removed.append(self._sandboxes.pop(sandbox_id))
+            self.expired += 1
+        total = sum(s.size_bytes for s in self._sandboxes.values())
+        for sandbox_id in list(self._sandboxes):
+            if len(self._sandboxes) <= self.max_sandboxes and total <= self.max_bytes:
+                break
+            if sandbox_id == keep:
+                continue
+            sandbox = self._sandboxes.pop(sandbox_id)
+            total -= sandbox.size_bytes
+            removed.append(sandbox)
+            self.evicted += 1
+        return removed
+
+    def get(self, sandbox_id: str) -> Optional[Sandbox]:
+        """The sandbox with this ID, if it is still live."""
+        with self._lock:
+            removed = self._sweep()
+            sandbox = self._sandboxes.get(sandbox_id)
+            if sandbox is not None:
+                self._sandboxes.move_to_end(sandbox.id)
+                sandbox.last_access = time.monotonic()
+        for old in removed:
+            old.close()
+        return sandbox
+
+    def open(self, sandbox_id: str, create: Callable[[str], Sandbox]) -> Sandbox:
+        """The live sandbox with this ID, or a new one from `create(collection_name)` if there is none or it is closing."""
+        sandbox = self.get(sandbox_id)
+        if sandbox is None or sandbox.closing:
+            sandbox = create(collection_name(sandbox_id))
+        return sandbox
+
+    def put(self, sandbox: Sandbox) -> None:
+        """Stores (or refreshes) a sandbox after an upload, evicting others to make room."""
+        if sandbox.size_bytes > self.max_bytes:
+            with self._lock:
+                if self._sandboxes.get(sandbox.id) is sandbox:
+                    del self._sandboxes[sandbox.id]
+            sandbox.close()
+            raise SandboxTooLarge(f"Knowledge base needs ~{sandbox.size_bytes / 1e6:.0f} MB; the sandbox limit is {self.max_bytes / 1e6:.0f} MB.")
+        with self._lock:
+            self._sandboxes[sandbox.id] = sandbox
+            self._sandboxes.move_to_end(sandbox.id)
+            sandbox.last_access = time.monotonic()
+            removed = self._sweep(keep=sandbox.id)
+        for old in removed:
+            old.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sandboxes": len(self._sandboxes),
+                "size_bytes": sum(s.size_bytes for s in self._sandboxes.values()),
+                "max_bytes": self.max_bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "items": [s.describe() for s in reversed(self._sandboxes.values())],
+            }
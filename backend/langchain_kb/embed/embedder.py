@@ -1,27 +1,154 @@
+"""
+Embeds KB documents with all-MiniLM-L6-v2 and upserts them into Qdrant.
+
+Documents are encoded in batches and upserted in fixed-size pages, so memory
+use does not grow with the corpus. Point IDs are uuid5s of the document text,
+so re-running an ingestion overwrites the same points instead of duplicating
+(or clobbering) others.
+
+QDRANT_PATH selects Qdrant's embedded mode: a directory for an on-disk
+collection, or ":memory:" for a throwaway one. Neither needs a server, so
+builds can run offline. Without it the client connects to QDRANT_HOST:QDRANT_PORT.
+
+Usage (from langchain_kb/):
+    QDRANT_PATH=kb/qdrant python -m embed.embedder            # ingest kb/new_db.jsonl
+"""
+import argparse
+import hashlib
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from sentence_transformers import SentenceTransformer
 
-COLLECTION_NAME = "career_kb"
-
-client = QdrantClient(host="localhost", port=6333)
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-def embed_and_store(docs):
-    points = []
-    for idx, doc in enumerate(docs):
-        vector = model.encode(doc['text']).tolist()
-        points.append(
-            models.PointStruct(
-                id=idx,
-                vector=vector,
-                payload=doc
-            )
-        )
-    # Create or recreate collection with config if needed
+# --- Configuration ---
+COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "career_kb")
+QDRANT_PATH = os.getenv("QDRANT_PATH")  # directory or ":memory:" for embedded mode; unset = server
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "all-MiniLM-L6-v2")
+ENCODE_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_PAGE_SIZE = int(os.getenv("QDRANT_UPSERT_PAGE_SIZE", "256"))  # points per upsert request
+POINT_ID_NAMESPACE = uuid.UUID("5b0f3f3e-4c8a-4f0e-9a51-6c1f0f7b2a10")
+
+_client: Optional[QdrantClient] = None
+_model: Optional[SentenceTransformer] = None
+
+
+def get_client() -> QdrantClient:
+    global _client
+    if _client is None:
+        if QDRANT_PATH == ":memory:":
+            _client = QdrantClient(location=":memory:")
+        elif QDRANT_PATH:
+            _client = QdrantClient(path=QDRANT_PATH)
+        else:
+            _client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    return _client
+
+
+def get_model() -> SentenceTransformer:
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(EMBED_MODEL_NAME)
+    return _model
+
+
+def point_id(text: str) -> str:
+    """Deterministic point ID: the same text always maps to the same point."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, hashlib.sha256(text.encode("utf-8")).hexdigest()))
+
+
+def _text_and_payload(doc: Any) -> tuple:
+    """Accepts LangChain Documents, {"text": ...} dicts and KB entries ({"unified_document": ...})."""
+    if hasattr(doc, "page_content"):
+        return doc.page_content, {"text": doc.page_content, **doc.metadata}
+    text = doc.get("text") or doc.get("unified_document", "")
+    return text, doc
+
+
+def _pages(docs: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    page = []
+    for doc in docs:
+        page.append(doc)
+        if len(page) == size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def ensure_collection(client: QdrantClient, dimensions: int) -> None:
     if COLLECTION_NAME not in [c.name for c in client.get_collections().collections]:
-        client.recreate_collection(
+        client.create_collection(
             collection_name=COLLECTION_NAME,
-            vectors_config=models.VectorParams(size=len(points[0].vector), distance=models.Distance.COSINE)
+            vectors_config=models.VectorParams(size=dimensions, distance=models.Distance.COSINE)
         )
-    client.upsert(collection_name=COLLECTION_NAME, points=points)
+
+
+def embed_and_store(docs: Iterable[Any], batch_size: int = ENCODE_BATCH_SIZE, page_size: int = UPSERT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Embeds and upserts `docs` page by page (any iterable; it is not loaded
+    whole). Returns counts, timings and throughput.
+    """
+    client, model = get_client(), get_model()
+    collection_ready = False
+    stats = {"documents": 0, "points": 0, "skipped_empty": 0, "encode_seconds": 0.0, "upsert_seconds": 0.0}
+    started = time.perf_counter()
+
+    for page in _pages(docs, page_size):
+        stats["documents"] += len(page)
+        unique: Dict[str, tuple] = {}
+        for doc in page:
+            text, payload = _text_and_payload(doc)
+            if not text.strip():
+                stats["skipped_empty"] += 1
+                continue
+            unique[point_id(text)] = (text, payload)  # identical texts in a page collapse into one point
+        if not unique:
+            continue
+
+        t0 = time.perf_counter()
+        vectors = model.encode([text for text, _ in unique.values()], batch_size=batch_size,
+                               convert_to_numpy=True, show_progress_bar=False)
+        stats["encode_seconds"] += time.perf_counter() - t0
+
+        if not collection_ready:
+            ensure_collection(client, vectors.shape[1])
+            collection_ready = True
+
+        t0 = time.perf_counter()
+        client.upsert(
+            collection_name=COLLECTION_NAME,
+            points=[models.PointStruct(id=pid, vector=vector.tolist(), payload=payload)
+                    for (pid, (_, payload)), vector in zip(unique.items(), vectors)],
+            wait=True,
+        )
+        stats["upsert_seconds"] += time.perf_counter() - t0
+        stats["points"] += len(unique)
+
+    elapsed = time.perf_counter() - started
+    stats.update({
+        "encode_seconds": round(stats["encode_seconds"], 2),
+        "upsert_seconds": round(stats["upsert_seconds"], 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "vectors_per_second": round(stats["points"] / elapsed, 1) if elapsed else 0.0,
+    })
+    print(f"Upserted {stats['points']} points into '{COLLECTION_NAME}' at {stats['vectors_per_second']} vectors/s "
+          f"(encode {stats['encode_seconds']}s, upsert {stats['upsert_seconds']}s).")
+    return stats
+
+
+if __name__ == "__main__":
+    from utils.kb_store import DEFAULT_STORE_PATH, KBStore
+
+    parser = argparse.ArgumentParser(description="Embed the KB store into Qdrant.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--batch-size", type=int, default=ENCODE_BATCH_SIZE)
+    parser.add_argument("--page-size", type=int, default=UPSERT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    print(embed_and_store(iter(KBStore(args.store)), batch_size=args.batch_size, page_size=args.page_size))
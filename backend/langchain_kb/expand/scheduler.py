@@ -0,0 +1,68 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class FairScheduler:
+    """
+    Caps the number of concurrent LLM calls across all KB generations. When
+    calls queue up, freed slots are handed out round-robin between topics, so a
+    topic with many entries cannot starve the others.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    async def run(self, topic: str, call: Callable[[], Awaitable[T]]) -> T:
+        await self._acquire(topic)
+        try:
+            return await call()
+        finally:
+            self._release()
+
+    async def _acquire(self, topic: str) -> None:
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(topic, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # the slot was already handed to us; pass it on
+            raise
+
+    def _release(self) -> None:
+        while self._waiting:
+            topic, waiters = next(iter(self._waiting.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._waiting.move_to_end(topic)  # the topic goes to the back of the rotation
+            else:
+                del self._waiting[topic]
+            if not waiter.done():
+                waiter.set_result(None)  # the slot moves to the waiter; `active` is unchanged
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "active": self.active,
+                "queued": sum(len(w) for w in self._waiting.values()), "queued_topics": len(self._waiting)}
+
+
+class GenerationStats:
+    """LLM calls, retries and failures of one KB generation request."""
+    def __init__(self):
+        self.llm_calls = 0
+        self.retries = 0
+        self.failed_sections = 0
+        self.started = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"llm_calls": self.llm_calls, "retries": self.retries, "failed_sections": self.failed_sections,
+                "wall_seconds": round(time.perf_counter() - self.started, 2)}
@@ -0,0 +1,236 @@
+"""
+On-disk cache and rate-limited fetcher for Wikipedia article text.
+
+Lookups are keyed by the requested title, which resolves (following
+redirects) to a page title and revision; the article text is stored per
+revision. Fresh entries are served from disk. Once the TTL passes, only the
+current revision ID is re-checked, and the text is downloaded again only if
+the page has changed. Missing pages and disambiguation pages are cached too,
+with a shorter TTL.
+
+With WIKI_OFFLINE=true nothing is fetched and only the cache directory is
+used, so KB generation is reproducible without network. Seed it with:
+    python -m langchain_kb.expand.wiki_cache seed "Software engineer" "Data scientist"   (from backend/)
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Configuration ---
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://en.wikipedia.org/w/api.php")
+WIKI_CACHE_DIR = os.getenv("WIKI_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "kb", "wiki_cache"))
+WIKI_CACHE_TTL_SECONDS = float(os.getenv("WIKI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+WIKI_NEGATIVE_TTL_SECONDS = float(os.getenv("WIKI_NEGATIVE_TTL_SECONDS", str(24 * 3600)))
+WIKI_OFFLINE = os.getenv("WIKI_OFFLINE", "false").lower() == "true"
+WIKI_MAX_CONCURRENCY = int(os.getenv("WIKI_MAX_CONCURRENCY", "4"))
+WIKI_USER_AGENT = os.getenv("WIKI_USER_AGENT", "career-pathfinder-kb/1.0 (knowledge base generator)")
+REQUEST_TIMEOUT_SECONDS = 15
+
+
+@dataclass
+class WikiResult:
+    """Outcome of a lookup: status is "ok", "missing", "disambiguation" or "error" (not cached)."""
+    query: str
+    status: str
+    title: Optional[str] = None
+    revid: Optional[int] = None
+    content: str = ""
+    options: List[str] = field(default_factory=list)
+    source: str = "network"  # "cache", "network", "stale" (served from cache after a fetch error) or "offline"
+
+
+def _normalize(title: str) -> str:
+    return " ".join(title.replace("_", " ").split()).casefold()
+
+
+def _key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class WikiFetcher:
+    """MediaWiki API client with a pooled session, a concurrency limit and a persistent cache."""
+    def __init__(self, cache_dir: str = WIKI_CACHE_DIR, ttl_seconds: float = WIKI_CACHE_TTL_SECONDS,
+                 negative_ttl_seconds: float = WIKI_NEGATIVE_TTL_SECONDS, offline: bool = WIKI_OFFLINE,
+                 max_concurrency: int = WIKI_MAX_CONCURRENCY, api_url: str = WIKI_API_URL):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.offline = offline
+        self.api_url = api_url
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = WIKI_USER_AGENT
+        self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency))
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._key_locks_lock = threading.Lock()
+        self.counts = {"cache_hits": 0, "revalidated": 0, "fetched": 0, "api_calls": 0, "negative_hits": 0,
+                       "offline_misses": 0, "errors": 0, "stale_served": 0}
+        os.makedirs(os.path.join(cache_dir, "titles"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "pages"), exist_ok=True)
+
+    # --- Disk cache ---
+
+    def _title_path(self, query: str) -> str:
+        return os.path.join(self.cache_dir, "titles", _key(_normalize(query)) + ".json")
+
+    def _page_path(self, title: str, revid: int) -> str:
+        return os.path.join(self.cache_dir, "pages", f"{_key(title)}-{revid}.json")
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write(self, path: str, data: Dict[str, Any]) -> None:
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _from_entry(self, query: str, entry: Dict[str, Any], source: str) -> Optional[WikiResult]:
+        if entry["status"] != "ok":
+            return WikiResult(query, entry["status"], title=entry.get("title"), options=entry.get("options", []), source=source)
+        page = self._read(self._page_path(entry["title"], entry["revid"]))
+        if page is None:
+            return None
+        return WikiResult(query, "ok", title=entry["title"], revid=entry["revid"], content=page["content"], source=source)
+
+    def _store(self, query: str, result: WikiResult) -> None:
+        entry = {"query": query, "status": result.status, "title": result.title, "revid": result.revid,
+                 "options": result.options, "checked_at": time.time()}
+        if result.status == "ok":
+            page_path = self._page_path(result.title, result.revid)
+            if not os.path.exists(page_path):
+                self._write(page_path, {"title": result.title, "revid": result.revid, "content": result.content})
+        self._write(self._title_path(query), entry)
+
+    # --- MediaWiki API ---
+
+    def _api(self, **params: Any) -> Dict[str, Any]:
+        with self._slots:
+            self.counts["api_calls"] += 1
+            response = self._session.get(self.api_url, params={"action": "query", "format": "json", "formatversion": 2, **params},
+                                         timeout=REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return response.json()
+
+    def _resolve(self, query: str) -> Dict[str, Any]:
+        """Current title, revision and kind of the page `query` leads to (after redirects)."""
+        data = self._api(titles=query, redirects=1, prop="revisions|pageprops", rvprop="ids", ppprop="disambiguation")
+        page = data["query"]["pages"][0]
+        if page.get("missing") or page.get("invalid"):
+            return {"status": "missing", "title": page.get("title")}
+        status = "disambiguation" if "disambiguation" in page.get("pageprops", {}) else "ok"
+        return {"status": status, "title": page["title"], "revid": page["revisions"][0]["revid"]}
+
+    def _content(self, title: str) -> str:
+        data = self._api(titles=title, prop="extracts", explaintext=1)
+        return data["query"]["pages"][0].get("extract", "")
+
+    def _options(self, title: str) -> List[str]:
+        data = self._api(titles=title, prop="links", plnamespace=0, pllimit="max")
+        return [link["title"] for link in data["query"]["pages"][0].get("links", [])]
+
+    # --- Lookups ---
+
+    def _lock_for(self, query: str) -> threading.Lock:
+        with self._key_locks_lock:
+            return self._key_locks.setdefault(_normalize(query), threading.Lock())
+
+    def lookup(self, query: str) -> WikiResult:
+        """Article text for `query`, from the cache when fresh; concurrent lookups of one title fetch it once."""
+        with self._lock_for(query):
+            entry = self._read(self._title_path(query))
+            if self.offline:
+                cached = self._from_entry(query, entry, "offline") if entry else None
+                if cached is None:
+                    self.counts["offline_misses"] += 1
+                    return WikiResult(query, "missing", source="offline")
+                return cached
+
+            if entry is not None:
+                ttl = self.ttl_seconds if entry["status"] == "ok" else self.negative_ttl_seconds
+                if time.time() - entry["checked_at"] < ttl:
+                    cached = self._from_entry(query, entry, "cache")
+                    if cached is not None:
+                        self.counts["cache_hits" if cached.status == "ok" else "negative_hits"] += 1
+                        return cached
+
+            try:
+                resolved = self._resolve(query)
+                if (entry is not None and resolved["status"] == "ok" and entry["status"] == "ok"
+                        and (entry["title"], entry["revid"]) == (resolved["title"], resolved["revid"])
+                        and os.path.exists(self._page_path(entry["title"], entry["revid"]))):
+                    # Expired but unchanged: keep the stored text
+                    result = self._from_entry(query, entry, "cache")
+                    self.counts["revalidated"] += 1
+                elif resolved["status"] == "ok":
+                    result = WikiResult(query, "ok", title=resolved["title"], revid=resolved["revid"], content=self._content(resolved["title"]))
+                    self.counts["fetched"] += 1
+                elif resolved["status"] == "disambiguation":
+                    result = WikiResult(query, "disambiguation", title=resolved["title"], options=self._options(resolved["title"]))
+                else:
+                    result = WikiResult(query, "missing", title=resolved.get("title"))
+            except (requests.RequestException, KeyError, IndexError, ValueError) as e:
+                self.counts["errors"] += 1
+                stale = self._from_entry(query, entry, "stale") if entry else None
+                if stale is not None:
+                    self.counts["stale_served"] += 1
+                    return stale
+                print(f"Wikipedia lookup for '{query}' failed: {e}")
+                return WikiResult(query, "error")
+
+            self._store(query, result)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"offline": self.offline, "cache_dir": self.cache_dir, **self.counts}
+
+
+_fetcher: Optional[WikiFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_wiki_fetcher() -> WikiFetcher:
+    """The shared fetcher (one connection pool and concurrency limit per process)."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = WikiFetcher()
+        return _fetcher
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-seed or inspect the Wikipedia cache.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    seed = subcommands.add_parser("seed", help="Fetch titles into the cache (ignores WIKI_OFFLINE)")
+    seed.add_argument("titles", nargs="*")
+    seed.add_argument("--from-file", help="File with one title per line")
+    show = subcommands.add_parser("show", help="Print what the cache holds for titles")
+    show.add_argument("titles", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        titles = list(args.titles)
+        if args.from_file:
+            with open(args.from_file, "r", encoding="utf-8") as f:
+                titles += [line.strip() for line in f if line.strip()]
+        fetcher = WikiFetcher(offline=False)
+        for title in titles:
+            result = fetcher.lookup(title)
+            print(f"{title!r}: {result.status} {result.title or ''} rev {result.revid or '-'} ({len(result.content)} chars, {result.source})")
+        print(fetcher.stats())
+    else:
+        fetcher = WikiFetcher(offline=True)
+        for title in args.titles:
+            print(json.dumps({k: v for k, v in asdict(fetcher.lookup(title)).items() if k != "content"}, ensure_ascii=False))
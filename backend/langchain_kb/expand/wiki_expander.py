@@ -1,15 +1,27 @@
-import warnings
-from bs4 import GuessedAtParserWarning
-warnings.filterwarnings("ignore", category=GuessedAtParserWarning)
-
-import wikipedia
 import asyncio
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional
 from langchain.prompts import PromptTemplate
 from langchain_ollama import OllamaLLM # pyright: ignore[reportMissingImports]
+from .scheduler import FairScheduler, GenerationStats
+from .wiki_cache import WikiFetcher, get_wiki_fetcher
+
+# --- Configuration ---
+KB_LLM_CONCURRENCY = int(os.getenv("KB_LLM_CONCURRENCY", "4"))  # concurrent LLM calls across all KB generations
+KB_BATCH_SECTIONS = os.getenv("KB_BATCH_SECTIONS", "false").lower() == "true"  # one JSON call per entry
+KB_SECTION_RETRIES = int(os.getenv("KB_SECTION_RETRIES", "2"))
+KB_RETRY_BACKOFF_SECONDS = float(os.getenv("KB_RETRY_BACKOFF_SECONDS", "1.0"))
 
 class WikiKBGenerator:
-    def __init__(self, llm: OllamaLLM):
+    def __init__(self, llm: OllamaLLM, wiki: Optional[WikiFetcher] = None, batch_sections: bool = KB_BATCH_SECTIONS,
+                 concurrency: int = KB_LLM_CONCURRENCY, retries: int = KB_SECTION_RETRIES):
         self.llm = llm
+        self.wiki = wiki or get_wiki_fetcher()
+        self.batch_sections = batch_sections
+        self.retries = retries
+        self.scheduler = FairScheduler(concurrency)
         self.prompt_template = """
 You are an AI knowledge extractor. Your task is to generate a section of a knowledge base for a specific job title based on a provided Wikipedia article summary.
 
@@ -30,54 +42,118 @@ Instructions:
             template=self.prompt_template
         )
         self.chain = self.prompt | self.llm
+        self.batch_prompt_template = """
+You are an AI knowledge extractor. Your task is to generate several sections of a knowledge base for a specific job title based on a provided Wikipedia article summary.
+
+Job Title: "{topic}"
+Sections to Generate: {sections}
+
+Wikipedia Summary:
+{wiki_text}
+
+
+Instructions:
+- Based on the Wikipedia summary, generate the content for every listed section.
+- Each section's content should be a concise and informative paragraph.
+- Respond ONLY with a JSON object whose keys are the section names exactly as listed and whose values are the raw text content, e.g. {{"<section>": "<content>"}}. Do not add any extra keys, titles, formatting, or explanations.
+"""
+        self.batch_prompt = PromptTemplate(
+            input_variables=["topic", "sections", "wiki_text"],
+            template=self.batch_prompt_template
+        )
+        self.batch_chain = self.batch_prompt | self.llm
 
-    async def _get_section_content(self, topic: str, section: str, wiki_text: str) -> str:
+    async def _get_section_content(self, topic: str, section: str, wiki_text: str, stats: GenerationStats) -> str:
         """Generates content for a single section using the LLM."""
-        try:
-            response = await self.chain.ainvoke({
+        async def call():
+            stats.llm_calls += 1
+            return await self.chain.ainvoke({
                 "topic": topic,
                 "section": section,
                 "wiki_text": wiki_text,
             })
-            return response if isinstance(response, str) else response.content
-        except Exception as e:
-            print(f"Error generating section '{section}' for topic '{topic}': {e}")
-            return ""
+        response = await self.scheduler.run(topic, call)
+        return (response if isinstance(response, str) else response.content).strip()
+
+    async def _get_sections_content(self, topic: str, sections: List[str], wiki_text: str, stats: GenerationStats) -> Dict[str, str]:
+        """Generates several sections with one structured-JSON LLM call; sections it leaves out come back empty."""
+        async def call():
+            stats.llm_calls += 1
+            return await self.batch_chain.ainvoke({
+                "topic": topic,
+                "sections": json.dumps(sections, ensure_ascii=False),
+                "wiki_text": wiki_text,
+            })
+        response = await self.scheduler.run(topic, call)
+        text = response if isinstance(response, str) else response.content
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        data = json.loads(match.group(0)) if match else {}
+        if not isinstance(data, dict):
+            return {}
+        return {section: str(data.get(section) or "").strip() for section in sections}
+
+    async def _generate_entry_sections(self, topic: str, sections: List[str], wiki_text: str, stats: GenerationStats) -> Dict[str, str]:
+        """
+        Content for every section of one entry. Sections that fail (error or empty
+        reply) are retried on their own, with exponential backoff between rounds.
+        """
+        contents: Dict[str, str] = {}
+        pending = list(dict.fromkeys(sections))
+        for attempt in range(self.retries + 1):
+            if attempt:
+                stats.retries += len(pending)
+                await asyncio.sleep(KB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            if self.batch_sections:
+                try:
+                    contents.update({s: c for s, c in (await self._get_sections_content(topic, pending, wiki_text, stats)).items() if c})
+                except Exception as e:
+                    print(f"Error generating sections {pending} for topic '{topic}': {e}")
+            else:
+                results = await asyncio.gather(*(self._get_section_content(topic, s, wiki_text, stats) for s in pending), return_exceptions=True)
+                for section, result in zip(pending, results):
+                    if isinstance(result, Exception):
+                        print(f"Error generating section '{section}' for topic '{topic}': {result}")
+                    elif result:
+                        contents[section] = result
+            pending = [s for s in pending if s not in contents]
+            if not pending:
+                break
+        stats.failed_sections += len(pending)
+        return contents
 
     def _fetch_wiki_content(self, topic: str) -> str:
-        """Fetches Wikipedia content in a synchronous manner."""
-        try:
-            return wikipedia.page(topic, auto_suggest=False, redirect=True).content
-        except wikipedia.exceptions.PageError:
+        """Fetches Wikipedia content in a synchronous manner (through the shared on-disk cache)."""
+        result = self.wiki.lookup(topic)
+        if result.status == "ok":
+            return result.content
+        if result.status == "missing":
             print(f"Could not find Wikipedia page for '{topic}'.")
             return ""
-        except wikipedia.exceptions.DisambiguationError as e:
+        if result.status == "disambiguation" and result.options:
             print(f"Disambiguation error for '{topic}'. Trying to find a better option.")
-            # Attempt to find a more relevant page
-            for option in e.options:
-                if any(keyword in option for keyword in ["(profession)", "(occupation)", "(job title)"]):
-                    try:
-                        return wikipedia.page(option, auto_suggest=False, redirect=True).content
-                    except (wikipedia.exceptions.PageError, wikipedia.exceptions.DisambiguationError):
-                        continue  # Try next option if this one fails
-            # Fallback to the first option if no better one is found
-            try:
-                return wikipedia.page(e.options[0], auto_suggest=False, redirect=True).content
-            except (wikipedia.exceptions.PageError, wikipedia.exceptions.DisambiguationError):
-                return ""
-        except Exception as e:
-            print(f"An unexpected error occurred while fetching content for '{topic}': {e}")
-            return ""
+            # Attempt to find a more relevant page, falling back to the first option
+            preferred = [o for o in result.options if any(keyword in o for keyword in ["(profession)", "(occupation)", "(job title)"])]
+            for option in preferred + result.options[:1]:
+                option_result = self.wiki.lookup(option)
+                if option_result.status == "ok":
+                    return option_result.content
+        return ""
 
-    async def generate_kb_for_topic(self, topic: str, sections: list[str], num_entries: int = 1) -> list[dict]:
+    async def generate_kb_for_topic(self, topic: str, sections: list[str], num_entries: int = 1,
+                                    on_entry: Optional[Callable[[int, dict], None]] = None,
+                                    stats: Optional[GenerationStats] = None, collect: bool = True) -> list[dict]:
         """
         Generates multiple knowledge base entries for a single topic, each with different content.
+        `on_entry(index, entry)` is called with each entry as soon as it is complete; LLM calls are
+        counted in `stats`. With `collect=False` entries are only passed to `on_entry` and an
+        empty list is returned, so a caller that streams them does not keep them in memory.
         """
+        stats = stats or GenerationStats()
         print(f"Generating {num_entries} KB entries for topic: {topic}")
-        
+
         # Run the synchronous Wikipedia fetch in a separate thread
         full_wiki_text = await asyncio.to_thread(self._fetch_wiki_content, topic)
-        
+
         if not full_wiki_text:
             print(f"Skipping topic '{topic}' due to lack of Wikipedia content.")
             return []
@@ -89,26 +165,15 @@ Instructions:
         if not text_chunks:
             return []
 
-        all_kb_entries = []
-        for i in range(num_entries):
+        async def generate_entry(i: int) -> Optional[dict]:
             # Use a different chunk for each entry, looping if necessary
             wiki_text_chunk = text_chunks[i % len(text_chunks)]
-            
-            kb_entry = {"title": topic, "sections": []}
-            
-            tasks = []
-            for section_title in sections:
-                print(f"  - Scheduling section: {section_title} for entry {i+1}")
-                tasks.append(self._get_section_content(topic, section_title, wiki_text_chunk))
-            
-            section_contents = await asyncio.gather(*tasks)
-
-            for j, section_title in enumerate(sections):
-                kb_entry["sections"].append({
-                    "title": section_title,
-                    "content": section_contents[j].strip()
-                })
-            
-            all_kb_entries.append(kb_entry)
-            
-        return all_kb_entries
\ No newline at end of file
+            contents = await self._generate_entry_sections(topic, sections, wiki_text_chunk, stats)
+            kb_entry = {"title": topic, "sections": [{"title": s, "content": contents.get(s, "")} for s in sections]}
+            if on_entry is not None:
+                on_entry(i, kb_entry)
+            return kb_entry if collect else None
+
+        # Entries are generated concurrently; the scheduler bounds the actual LLM calls
+        entries = await asyncio.gather(*(generate_entry(i) for i in range(num_entries)))
+        return list(entries) if collect else []
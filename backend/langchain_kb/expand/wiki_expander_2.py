@@ -1,10 +1,12 @@
-import wikipedia
+import asyncio
 import json
 import random
+from typing import AsyncIterator, Optional
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
 import os
+from .wiki_cache import get_wiki_fetcher
 
 # ===================== Load API Key =====================
 load_dotenv()
@@ -51,11 +53,8 @@ Job Title: Business Development (Sales) Manager. Job Description: ABOUT THIS OPP
 """.strip()
 
 def get_combined_text(job_title):
-    # Wikipedia text
-    try:
-        wiki_text = wikipedia.page(job_title).content
-    except Exception:
-        wiki_text = ""
+    # Wikipedia text (cached on disk; WIKI_OFFLINE=true serves only from the cache)
+    wiki_text = get_wiki_fetcher().lookup(job_title).content
     
     # Example: load local job postings or files
     job_portal_text = ""
@@ -103,22 +102,105 @@ def expand_job_to_kb(job_title: str, num_sections: int = 30):
 
     # Fill in random job_id if missing and ensure string
     for entry in dict_json:
-        if "job_id" not in entry or not str(entry["job_id"]).isdigit():
-            entry["job_id"] = str(random.randint(10**9, 10**10 - 1))
+        _fill_job_id(entry)
+
+    return build_chunks_dict(dict_json), dict_json  # <-- now returns 2 values
 
-    # Create chunks dictionary
+
+def _fill_job_id(entry: dict) -> dict:
+    if "job_id" not in entry or not str(entry["job_id"]).isdigit():
+        entry["job_id"] = str(random.randint(10**9, 10**10 - 1))
+    return entry
+
+
+def build_chunks_dict(entries: list) -> dict:
+    """Job title -> all its `unified_document`s joined (the raw_corpus.txt shape)."""
     chunks_file = {}
-    for items in dict_json:
+    for items in entries:
         career = items['job_title']
         texts = items.get('unified_document', '')
         if career not in chunks_file:
             chunks_file[career] = texts
         else:
             chunks_file[career] += ' ' + texts
+    return chunks_file
+
+
+def is_valid_entry(entry) -> bool:
+    return (isinstance(entry, dict)
+            and isinstance(entry.get("job_title"), str) and entry["job_title"].strip() != ""
+            and isinstance(entry.get("job_description"), str)
+            and isinstance(entry.get("job_skill_set"), list)
+            and isinstance(entry.get("unified_document"), str) and entry["unified_document"].strip() != "")
+
+
+class _ArrayStreamParser:
+    """
+    Pulls the elements of a streamed top-level JSON array out one by one, as
+    soon as each is complete. Anything before the opening `[` (e.g. a ```json
+    fence) is ignored; an element that is not valid JSON stops the parse.
+    """
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self.finished = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        items = []
+        if not self._started:
+            start = self._buffer.find("[", self._pos)
+            if start == -1:
+                return items
+            self._started, self._pos = True, start + 1
+        while not self.finished:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n,":
+                self._pos += 1
+            if self._pos >= len(self._buffer):
+                break
+            if self._buffer[self._pos] == "]":
+                self.finished = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                break  # element still incomplete; wait for more text
+            items.append(item)
+            self._pos = end
+        return items
+
+
+async def astream_job_entries(job_title: str, num_sections: int = 30, stats: Optional[dict] = None) -> AsyncIterator[dict]:
+    """
+    Async version of `expand_job_to_kb` that yields each valid entry (with a
+    job_id) as soon as the model has finished writing it, instead of waiting
+    for the whole array. Invalid elements are counted in `stats["invalid"]`.
+    """
+    category = job_title.upper().replace(" ", "-")
+    try:
+        wiki_text = await asyncio.to_thread(get_combined_text, job_title)
+    except Exception:
+        wiki_text = ""
 
-    return chunks_file, dict_json  # <-- now returns 2 values
+    parser = _ArrayStreamParser()
+    async for chunk in chain.astream({
+        "career_title": job_title,
+        "wiki_text": wiki_text,
+        "num_sections": num_sections,
+        "category": category,
+    }):
+        for entry in parser.feed(chunk.content if hasattr(chunk, "content") else str(chunk)):
+            if is_valid_entry(entry):
+                yield _fill_job_id(entry)
+            elif stats is not None:
+                stats["invalid"] = stats.get("invalid", 0) + 1
+        if parser.finished:
+            break
 
 # ===================== Example Run =====================
+# python -m expand.wiki_expander_2   (from langchain_kb/)
 if __name__ == "__main__":
     chunks_dict, new_docs = expand_job_to_kb("AI/ML Engineer", num_sections=3)
     print(json.dumps(new_docs, indent=2, ensure_ascii=False))
@@ -1,47 +1,148 @@
-import sys
+import argparse
+import asyncio
+import json
+import os
+import time
 #from expand.wiki_expander import expand_job_to_kb
-from expand.wiki_expander_2 import expand_job_to_kb
+from expand.wiki_expander_2 import astream_job_entries, expand_job_to_kb
 from embed.embedder import embed_and_store
-from utils.io_utils import load_kb, save_kb, save_chunks, load_corpus
+from utils.io_utils import load_kb
+from utils.kb_store import KBStore
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <job_title>")
-        return
+LEGACY_KB_PATH = "kb/new_db.json"
+BATCH_LOG_PATH = "kb/batch_log.jsonl"  # "started"/"done" events per title, for resuming batches
+DEFAULT_CONCURRENCY = int(os.getenv("KB_EXPAND_CONCURRENCY", "4"))
 
-    job_title = sys.argv[1]
-    print(f"Expanding KB for job: {job_title}")
 
-    # Load existing KB
-    kb = load_kb("kb/new_db.json")
+def open_store() -> KBStore:
+    """Opens the append-only store (index only; entries stay on disk)."""
+    store = KBStore()
+    if not len(store):
+        for entry in load_kb(LEGACY_KB_PATH):  # one-time migration of the old JSON list
+            store.add(entry)
+    return store
+
+
+def expand_one(job_title: str, num_sections: int):
+    print(f"Expanding KB for job: {job_title}")
+    store = open_store()
 
     # Get new expanded docs
-    chunks_dict, new_docs = expand_job_to_kb(job_title)
+    chunks_dict, new_docs = expand_job_to_kb(job_title, num_sections=num_sections)
     print("Generated new KB chunks.")
 
-    # Append new docs to KB (doesn't avoid duplicate, raw input)
-    kb.extend(new_docs)
+    # Append new docs to the store; entries whose content is already stored are skipped
+    added = sum(store.add(entry) for entry in new_docs)
+    print(f"Saved {added} new KB entries ({len(new_docs) - added} duplicates skipped, {len(store)} total).")
+    # The title -> text corpus (kb/raw_corpus.txt) is derived from the store on demand:
+    #   python -m utils.kb_store export-corpus kb/raw_corpus.txt
 
-    # Save updated KB
-    save_kb("kb/new_db.json", kb)
-    print("Saved updated KB.")
+    # Embed and store to vector DB
+    #embed_and_store(new_docs)
+    #print("Embedded and stored new docs in vector DB.")
 
-    # Load Corpus.txt
-    raw_corpus = load_corpus('kb/raw_corpus.txt')
-    #print(raw_corpus) # -> For testing Purpose
 
-    # Append new data
-    raw_corpus.update(chunks_dict)
-    #print(chunks_dict)
-    #print(raw_corpus)
+def read_titles(path: str) -> list:
+    """One title per line; blank lines and `#` comments are ignored, repeats dropped."""
+    with open(path, "r", encoding="utf-8") as f:
+        titles = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    return list(dict.fromkeys(titles))
 
-    # Save Corpus
-    save_chunks('kb/raw_corpus.txt', raw_corpus)
-    print(f"Saved Updated Corpus.")
 
-    # Embed and store to vector DB
-    #embed_and_store(new_docs)
-    #print("Embedded and stored new docs in vector DB.")
+def read_batch_log(path: str) -> tuple:
+    started, done = set(), set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                (done if event["event"] == "done" else started).add(event["title"].casefold())
+    except FileNotFoundError:
+        pass
+    return started, done
+
+
+def log_batch_event(path: str, event: str, title: str, **fields) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"event": event, "title": title, "at": time.time(), **fields}, ensure_ascii=False) + "\n")
+
+
+async def expand_batch(titles: list, concurrency: int, num_sections: int, log_path: str = BATCH_LOG_PATH) -> dict:
+    """
+    Expands many titles with at most `concurrency` LLM streams at a time. Each
+    entry is written to the store as soon as it has been parsed. Titles are
+    skipped if a previous batch finished them, or if they are already in the
+    store from a single-title run. Titles that were started but never finished
+    are expanded again.
+    """
+    store = open_store()
+    started, done = read_batch_log(log_path)
+    todo = [t for t in titles if t.casefold() not in done and not (t.casefold() not in started and store.has_title(t))]
+    summary = {"titles": len(titles), "skipped": len(titles) - len(todo), "succeeded": 0, "failed": 0,
+               "entries_added": 0, "duplicates": 0, "invalid": 0, "failures": {}}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def expand(title: str) -> None:
+        async with semaphore:
+            log_batch_event(log_path, "started", title)
+            stats = {"invalid": 0}
+            added = duplicates = 0
+            try:
+                async for entry in astream_job_entries(title, num_sections=num_sections, stats=stats):
+                    if store.add(entry):
+                        added += 1
+                    else:
+                        duplicates += 1
+            except Exception as e:
+                summary["failures"][title] = f"{type(e).__name__}: {e}"
+            finally:
+                summary["entries_added"] += added
+                summary["duplicates"] += duplicates
+                summary["invalid"] += stats["invalid"]
+            if title not in summary["failures"] and added + duplicates == 0:
+                summary["failures"][title] = "no valid entries in the response"
+            if title in summary["failures"]:
+                summary["failed"] += 1
+                print(f"[failed] {title}: {summary['failures'][title]}")
+                return
+            log_batch_event(log_path, "done", title, entries=added + duplicates)
+            summary["succeeded"] += 1
+            print(f"[{summary['succeeded'] + summary['failed']}/{len(todo)}] {title}: {added} new entries"
+                  f" ({duplicates} duplicates, {stats['invalid']} invalid)")
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(expand(title) for title in todo))
+    elapsed = time.perf_counter() - started_at
+    summary.update({
+        "elapsed_seconds": round(elapsed, 1),
+        "titles_per_minute": round(60 * (summary["succeeded"] + summary["failed"]) / elapsed, 2) if elapsed else 0.0,
+        "entries_per_second": round(summary["entries_added"] / elapsed, 2) if elapsed else 0.0,
+        "store_entries": len(store),
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand the KB for one job title, or for a list of titles with --batch.")
+    parser.add_argument("job_title", nargs="?")
+    parser.add_argument("--batch", metavar="TITLES_FILE", help="File with one job title per line")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Titles expanded at the same time")
+    parser.add_argument("--num-sections", type=int, default=30, help="Entries requested per title")
+    args = parser.parse_args()
+
+    if args.batch:
+        titles = read_titles(args.batch)
+        summary = asyncio.run(expand_batch(titles, args.concurrency, args.num_sections))
+        failures = summary.pop("failures")
+        print(json.dumps(summary, indent=2))
+        for title, error in failures.items():
+            print(f"  failed: {title}: {error}")
+    elif args.job_title:
+        expand_one(args.job_title, args.num_sections)
+    else:
+        parser.print_usage()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,236 @@
+"""
+Append-only JSONL store for expanded KB entries, with a sidecar index.
+
+`<name>.jsonl` holds one entry per line and is only ever appended to.
+`<name>.idx.jsonl` is an append-only log of index operations:
+    {"op": "put", "job_id", "hash", "title", "offset", "length"}   or   {"op": "del", "job_id"}
+Replaying the log gives job_id -> (offset, length), content hash -> job_id
+and title -> job_ids in memory. So adding an entry costs one append to each
+file however large the store is, and lookups by job_id or title are dict
+lookups plus one seek.
+
+Writes are deduplicated on the content hash (the entry without its job_id).
+Replaced and deleted entries stay in the data file until `compact()`.
+
+Usage (from langchain_kb/):
+    python -m utils.kb_store stats
+    python -m utils.kb_store import kb/new_db.json
+    python -m utils.kb_store compact
+    python -m utils.kb_store export-corpus kb/raw_corpus.txt
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.io_utils import load_kb, save_chunks
+
+DEFAULT_STORE_PATH = "kb/new_db.jsonl"
+
+
+def content_hash(entry: Dict[str, Any]) -> str:
+    """Hash of the entry without its (randomly assigned) job_id, so regenerated duplicates match."""
+    body = {k: v for k, v in entry.items() if k != "job_id"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _title_key(title: Any) -> str:
+    return " ".join(str(title or "").split()).casefold()
+
+
+class KBStore:
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".idx.jsonl"
+        self._lock = threading.Lock()
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._hashes: Dict[str, str] = {}  # content hash -> job_id
+        self._entry_hash: Dict[str, str] = {}  # job_id -> content hash
+        self._titles: Dict[str, List[str]] = {}
+        self._entry_title: Dict[str, str] = {}
+        self.duplicates_skipped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._load_index()
+
+    # --- Index ---
+
+    def _apply(self, op: Dict[str, Any]) -> None:
+        job_id = op["job_id"]
+        self._forget(job_id)
+        if op["op"] == "put":
+            self._offsets[job_id] = (op["offset"], op["length"])
+            self._hashes[op["hash"]] = job_id
+            self._entry_hash[job_id] = op["hash"]
+            title = _title_key(op["title"])
+            self._titles.setdefault(title, []).append(job_id)
+            self._entry_title[job_id] = title
+
+    def _forget(self, job_id: str) -> None:
+        if job_id not in self._offsets:
+            return
+        del self._offsets[job_id]
+        old_hash = self._entry_hash.pop(job_id)
+        if self._hashes.get(old_hash) == job_id:
+            del self._hashes[old_hash]
+        title = self._entry_title.pop(job_id)
+        self._titles[title].remove(job_id)
+        if not self._titles[title]:
+            del self._titles[title]
+
+    def _load_index(self) -> None:
+        indexed_end = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from an interrupted write
+                    self._apply(op)
+                    if op["op"] == "put":
+                        indexed_end = max(indexed_end, op["offset"] + op["length"])
+        self._recover_tail(indexed_end)
+
+    def _recover_tail(self, indexed_end: int) -> None:
+        """Indexes entries appended to the data file after the last index write (e.g. after a crash)."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) <= indexed_end:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(indexed_end)
+            offset = indexed_end
+            for raw in f:
+                try:
+                    entry = json.loads(raw)
+                except json.JSONDecodeError:
+                    break
+                self._log_put(entry, offset, len(raw))
+                offset += len(raw)
+
+    def _log_put(self, entry: Dict[str, Any], offset: int, length: int) -> None:
+        op = {"op": "put", "job_id": str(entry["job_id"]), "hash": content_hash(entry),
+              "title": entry.get("job_title", ""), "offset": offset, "length": length}
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(op, ensure_ascii=False) + "\n")
+        self._apply(op)
+
+    # --- Writes ---
+
+    def add(self, entry: Dict[str, Any]) -> bool:
+        """
+        Appends an entry; returns False (and writes nothing) if the same content
+        is already stored. An entry with a known job_id but new content replaces it.
+        """
+        if "job_id" not in entry:
+            raise ValueError("KB entries need a job_id.")
+        entry = {**entry, "job_id": str(entry["job_id"])}
+        digest = content_hash(entry)
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if digest in self._hashes:
+                self.duplicates_skipped += 1
+                return False
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            self._log_put(entry, offset, len(line))
+            return True
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            if job_id not in self._offsets:
+                return False
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"op": "del", "job_id": job_id}) + "\n")
+            self._forget(job_id)
+            return True
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrites both files with only the live entries; returns the sizes before and after."""
+        with self._lock:
+            before = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            data_tmp, index_tmp = self.path + ".tmp", self.index_path + ".tmp"
+            ops = []
+            with open(self.path, "rb") as src, open(data_tmp, "wb") as dst:
+                for job_id, (offset, length) in sorted(self._offsets.items(), key=lambda item: item[1][0]):
+                    src.seek(offset)
+                    raw = src.read(length)
+                    ops.append({"op": "put", "job_id": job_id, "hash": self._entry_hash[job_id],
+                                "title": json.loads(raw).get("job_title", ""), "offset": dst.tell(), "length": length})
+                    dst.write(raw)
+            with open(index_tmp, "w", encoding="utf-8") as f:
+                for op in ops:
+                    f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            os.replace(data_tmp, self.path)
+            os.replace(index_tmp, self.index_path)
+            self._offsets, self._hashes, self._entry_hash, self._titles, self._entry_title = {}, {}, {}, {}, {}
+            for op in ops:
+                self._apply(op)
+            return {"bytes_before": before, "bytes_after": os.path.getsize(self.path), "entries": len(ops)}
+
+    # --- Reads ---
+
+    def _read_at(self, offset: int, length: int) -> Dict[str, Any]:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        location = self._offsets.get(str(job_id))
+        return self._read_at(*location) if location else None
+
+    def get_by_title(self, title: str) -> List[Dict[str, Any]]:
+        return [self._read_at(*self._offsets[job_id]) for job_id in self._titles.get(_title_key(title), [])]
+
+    def has_title(self, title: str) -> bool:
+        return _title_key(title) in self._titles
+
+    def contains(self, entry: Dict[str, Any]) -> bool:
+        return content_hash(entry) in self._hashes
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for offset, length in sorted(self._offsets.values()):
+            yield self._read_at(offset, length)
+
+    def corpus(self) -> Dict[str, str]:
+        """Job title -> all its `unified_document`s joined, the shape of kb/raw_corpus.txt."""
+        corpus: Dict[str, str] = {}
+        for entry in self:
+            career, text = entry["job_title"], entry.get("unified_document", "")
+            corpus[career] = f"{corpus[career]} {text}" if career in corpus else text
+        return corpus
+
+    def stats(self) -> Dict[str, Any]:
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        live = sum(length for _, length in self._offsets.values())
+        return {"entries": len(self._offsets), "titles": len(self._titles), "bytes": size,
+                "garbage_bytes": size - live, "duplicates_skipped": self.duplicates_skipped}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and maintain the append-only KB store.")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("stats")
+    subcommands.add_parser("compact", help="Drop replaced/deleted entries from the data file")
+    import_cmd = subcommands.add_parser("import", help="Add entries from a legacy JSON list (e.g. kb/new_db.json)")
+    import_cmd.add_argument("path")
+    export_cmd = subcommands.add_parser("export-corpus", help="Write the title -> text corpus JSON (kb/raw_corpus.txt format)")
+    export_cmd.add_argument("path")
+    args = parser.parse_args()
+
+    store = KBStore(args.store)
+    if args.command == "stats":
+        print(store.stats())
+    elif args.command == "compact":
+        print(store.compact())
+    elif args.command == "import":
+        added = sum(store.add(entry) for entry in load_kb(args.path))
+        print(f"Imported {added} new entries ({store.duplicates_skipped} duplicates skipped); {store.stats()}")
+    else:
+        save_chunks(args.path, store.corpus())
+        print(f"Wrote the corpus of {len(store)} entries to {args.path}")
@@ -1,4 +1,5 @@
 import os
+import hashlib
 import pandas as pd
 from langchain_chroma import Chroma
 from langchain_ollama import OllamaEmbeddings, OllamaLLM
@@ -6,31 +7,59 @@ from langchain_mistralai import ChatMistralAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langdetect import detect
 from google.cloud import translate_v2 as translate
+import httpx
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from langchain.chains import ConversationalRetrievalChain
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import PromptTemplate
 from langchain.callbacks.base import BaseCallbackHandler
-from typing import Any, Dict, List, AsyncIterator
+from langchain_core.embeddings import Embeddings
+from typing import Any, Dict, List, AsyncIterator, Optional, Tuple
+from collections import Counter, OrderedDict
 import asyncio
 import json
+import time
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
 import spacy
 import re  # added
+from admission import admission_slot, AdmissionRejected
+from singleflight import llm_flights, flight_key
+from http_pool import httpx_client_kwargs, register_stats, MAX_KEEPALIVE_CONNECTIONS, READ_TIMEOUT
+from context_packer import pack_context, CONTEXT_MODE
+from tracing import span, traced
+from metrics import RETRIEVAL_SECONDS, EMBEDDING_SECONDS, LLM_GENERATION_SECONDS, TRANSLATION_SECONDS, SPACY_SECONDS, StreamTimer, record_cache
 
 # --- Configuration ---
 PERSIST_DIRECTORY = "./all_min_chromadb"
 EMBEDDING_MODEL = "all-minilm:l6-v2"
+# "ollama" (HTTP to the Ollama server) or "local" (the same model in-process, see local_embeddings.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "ollama")
 DEFAULT_OLLAMA_MODEL = "llama3.2"
 MISTRAL_FT_MODEL = "ft:ministral-3b-latest:9b8fa9c6:20250902:e97f6b36"
+MISTRAL_ENDPOINT = "https://api.mistral.ai/v1"
 DATA_PATH = './ground_truth/processed_job.json'
+# How follow-up questions are turned into a standalone retrieval query:
+# "none" (use the question as is), "heuristic" (prepend the last user turn),
+# "cached" (LLM rephrase, memoized) or "llm" (LLM rephrase every time, the original behaviour)
+CONDENSE_STRATEGY = os.getenv("CONDENSE_STRATEGY", "llm")
+# Opt-in: with "llm"/"cached", retrieve with the heuristic query while the LLM rephrases: the
+# rephrase is then only used in the answer prompt (and skipped where the prompt does not use it)
+CONDENSE_PARALLEL_RETRIEVAL = os.getenv("CONDENSE_PARALLEL_RETRIEVAL", "false").lower() == "true"
+CONDENSE_CACHE_SIZE = 1024
+# Chunks retrieved per query; the context packer then fits them into the model's token budget
+RETRIEVAL_K = int(os.getenv("RAG_RETRIEVAL_K", "2"))
 
 # --- Global Variables ---
 vectordb = None
+embedding_function = None
+translate_client = None
 llm_instances = {}
 rag_chain_instances = {}
 nlp = None
+condense_cache = OrderedDict()
+rag_stats = Counter()
 
 def _initialize_mistral_llm():
     """Initializes the Mistral LLM from environment variables."""
@@ -38,13 +67,24 @@ def _initialize_mistral_llm():
     api_key = os.getenv("MISTRAL_API_KEY")
     if not api_key:
         raise ValueError("MISTRAL_API_KEY not found in environment variables.")
-    llm = ChatMistralAI(api_key=api_key, model=MISTRAL_FT_MODEL)
+    # Share the pooled keep-alive transports instead of letting the SDK open its own
+    headers = {"Content-Type": "application/json", "Accept": "application/json", "Authorization": f"Bearer {api_key}"}
+    llm = ChatMistralAI(
+        api_key=api_key,
+        model=MISTRAL_FT_MODEL,
+        client=httpx.Client(base_url=MISTRAL_ENDPOINT, headers=headers, **httpx_client_kwargs("mistral", asynchronous=False)),
+        async_client=httpx.AsyncClient(base_url=MISTRAL_ENDPOINT, headers=headers, **httpx_client_kwargs("mistral", asynchronous=True)),
+    )
     print("Mistral LLM initialized.")
     return llm
 
 def _initialize_ollama_llm(model_name: str):
     """Initializes an Ollama LLM."""
-    llm = OllamaLLM(model=model_name)
+    llm = OllamaLLM(
+        model=model_name,
+        sync_client_kwargs=httpx_client_kwargs("ollama", asynchronous=False),
+        async_client_kwargs=httpx_client_kwargs("ollama", asynchronous=True),
+    )
     print(f"Ollama LLM '{model_name}' initialized.")
     return llm
 
@@ -54,7 +94,9 @@ def _initialize_gemini_llm():
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY not found in environment variables.")
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=api_key)
+    # The Gemini SDK talks gRPC over a single long-lived, HTTP/2-multiplexed channel; it is
+    # created once here and reused, so only the request timeout needs tuning.
+    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=api_key, timeout=READ_TIMEOUT, max_retries=2)
     print("Gemini LLM initialized.")
     return llm
 
@@ -69,6 +111,7 @@ def get_llm(model_name: str = DEFAULT_OLLAMA_MODEL):
             llm_instances[model_name] = _initialize_ollama_llm(model_name)
     return llm_instances[model_name]
 
+@traced("detect_language")
 def detect_language(text: str) -> str:
     """Detects the language of the input text."""
     try:
@@ -76,10 +119,79 @@ def detect_language(text: str) -> str:
     except:
         return "en"
 
+class TimedEmbeddings(Embeddings):
+    """Embeddings wrapper that records call times in the `embedding_seconds` histogram."""
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with EMBEDDING_SECONDS.labels("documents").time():
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with EMBEDDING_SECONDS.labels("query").time():
+            return self.inner.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with EMBEDDING_SECONDS.labels("documents").time():
+            return await self.inner.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with EMBEDDING_SECONDS.labels("query").time():
+            return await self.inner.aembed_query(text)
+
+def get_embedding_function() -> Embeddings:
+    """Returns the shared embedding client: pooled Ollama HTTP, or in-process with EMBEDDING_BACKEND=local."""
+    global embedding_function
+    if embedding_function is None:
+        if EMBEDDING_BACKEND == "local":
+            from local_embeddings import get_local_embeddings, warm_up
+            inner = get_local_embeddings()
+            print(f"Local embedding model loaded ({warm_up(inner) * 1000:.0f} ms first query).")
+        elif EMBEDDING_BACKEND == "ollama":
+            inner = OllamaEmbeddings(
+                model=EMBEDDING_MODEL,
+                sync_client_kwargs=httpx_client_kwargs("ollama", asynchronous=False),
+                async_client_kwargs=httpx_client_kwargs("ollama", asynchronous=True),
+            )
+        else:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{EMBEDDING_BACKEND}' (expected ollama or local).")
+        embedding_function = TimedEmbeddings(inner)
+    return embedding_function
+
+def _translate_pool_stats() -> Dict[str, Any]:
+    """Connection reuse of the translation client's urllib3 pools."""
+    requests_count = connections = 0
+    if translate_client is not None:
+        pools = translate_client._http.get_adapter("https://").poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            requests_count += pool.num_requests
+            connections += pool.num_connections
+    reused = max(0, requests_count - connections)
+    return {
+        "requests": requests_count,
+        "connections_opened": connections,
+        "connections_reused": reused,
+        "reuse_ratio": round(reused / requests_count, 3) if requests_count else 0.0,
+        "tls_handshakes": connections,
+        "tls_handshakes_saved": reused,
+    }
+
+def _get_translate_client():
+    """Creates the Google Translate client once, with a keep-alive connection pool."""
+    global translate_client
+    if translate_client is None:
+        translate_client = translate.Client()
+        translate_client._http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=MAX_KEEPALIVE_CONNECTIONS))
+        register_stats("google_translate", _translate_pool_stats)
+    return translate_client
+
+@traced("translate")
+@TRANSLATION_SECONDS.time()
 def translate_to_burmese(text: str) -> str:
     """Translates the text to Burmese."""
-    translate_client = translate.Client()
-    result = translate_client.translate(text, target_language="my")
+    result = _get_translate_client().translate(text, target_language="my")
     return result["translatedText"]
 
 def _initialize_vector_store():
@@ -90,7 +202,7 @@ def _initialize_vector_store():
     global vectordb
     if vectordb is not None: return
 
-    embedding_function = OllamaEmbeddings(model=EMBEDDING_MODEL)
+    embedding_function = get_embedding_function()
     if os.path.exists(PERSIST_DIRECTORY) and os.listdir(PERSIST_DIRECTORY):
         print("Loading existing ChromaDB vector store...")
         vectordb = Chroma(persist_directory=PERSIST_DIRECTORY, embedding_function=embedding_function)
@@ -116,6 +228,27 @@ def _initialize_vector_store():
         vectordb.persist()
     print(f"ChromaDB vector store is ready with {vectordb._collection.count()} documents.")
 
+_kb_version: Optional[str] = None
+
+def get_kb_version() -> str:
+    """
+    Fingerprint of the loaded vector store: its document count plus a digest of every
+    chunk id and its metadata. The store is only rebuilt offline, so this is computed
+    once per process.
+    """
+    global _kb_version
+    if _kb_version is not None:
+        return _kb_version
+    if vectordb is None:
+        return "unavailable"
+    records = vectordb._collection.get(include=["metadatas"])
+    digest = hashlib.sha1(str(len(records["ids"])).encode())
+    for chunk_id, metadata in sorted(zip(records["ids"], records["metadatas"]), key=lambda r: r[0]):
+        digest.update(chunk_id.encode())
+        digest.update(json.dumps(metadata or {}, sort_keys=True, default=str).encode())
+    _kb_version = digest.hexdigest()[:12]
+    return _kb_version
+
 def create_rag_chain(llm: Any):
     """Creates a RAG chain with the given LLM."""
     if vectordb is None:
@@ -123,7 +256,7 @@ def create_rag_chain(llm: Any):
 
     retriever = vectordb.as_retriever(
         search_type="similarity",
-        search_kwargs={"k": 2}
+        search_kwargs={"k": RETRIEVAL_K}
     )
 
     _template = """
@@ -163,6 +296,140 @@ def get_rag_chain_for_model(model_name: str = DEFAULT_OLLAMA_MODEL):
         rag_chain_instances[model_name] = create_rag_chain(llm)
     return rag_chain_instances[model_name]
 
+async def retrieve_documents(model_name: str, question: str) -> List[Document]:
+    """Runs only the retrieval step of the model's RAG chain."""
+    rag_chain = get_rag_chain_for_model(model_name)
+    with span("retrieval", model=model_name), RETRIEVAL_SECONDS.labels(model_name).time():
+        return await rag_chain.retriever.ainvoke(question)
+
+_HISTORY_SPEAKERS = {"human": "Human", "system": "Summary"}
+
+def _heuristic_condense(question: str, chat_history: List) -> str:
+    """Standalone query without an LLM: the last user turn followed by the new question."""
+    last_user_turn = next((msg.content for msg in reversed(chat_history) if msg.type == "human"), "")
+    return f"{last_user_turn}\n{question}".strip()
+
+async def _llm_condense(model_name: str, question: str, chat_history: List) -> str:
+    """Rephrases the follow-up with the chain's own condense-question prompt."""
+    rag_chain = get_rag_chain_for_model(model_name)
+    formatted_history = "\n".join(
+        f"{_HISTORY_SPEAKERS.get(msg.type, 'Assistant')}: {msg.content}" for msg in chat_history
+    )
+    async with admission_slot(model_name):
+        result = await rag_chain.question_generator.ainvoke({"question": question, "chat_history": formatted_history})
+    return result.get("text", question).strip() or question
+
+@traced("condense")
+async def condense_question(model_name: str, question: str, chat_history: List, strategy: str, stats: Dict[str, Any]) -> str:
+    """Turns a follow-up question into a standalone one using `strategy`; records LLM calls in `stats`."""
+    if not chat_history or strategy == "none":
+        return question
+    if strategy == "heuristic":
+        return _heuristic_condense(question, chat_history)
+
+    cache_key = None
+    if strategy == "cached":
+        cache_key = hashlib.sha1(json.dumps([model_name, question, [(m.type, m.content) for m in chat_history]]).encode()).hexdigest()
+        record_cache("condense", cache_key in condense_cache)
+        if cache_key in condense_cache:
+            condense_cache.move_to_end(cache_key)
+            stats["condense_cache_hit"] = True
+            return condense_cache[cache_key]
+
+    try:
+        condensed = await _llm_condense(model_name, question, chat_history)
+        stats["llm_calls"] += 1
+    except AdmissionRejected:
+        # Never fail a request just because the optional rephrase could not get a slot
+        return _heuristic_condense(question, chat_history)
+
+    if cache_key is not None:
+        condense_cache[cache_key] = condensed
+        if len(condense_cache) > CONDENSE_CACHE_SIZE:
+            condense_cache.popitem(last=False)
+    return condensed
+
+async def prepare_conversational_query(model_name: str, question: str, chat_history: List, strategy: Optional[str] = None,
+                                       condensed_for_answer: bool = True) -> Tuple[str, List[Document], Dict[str, Any]]:
+    """
+    Condenses the question and retrieves documents for it.
+    Returns (question to answer, retrieved documents, per-request stats).
+    In parallel mode an LLM rephrase only feeds the answer prompt, so callers whose
+    prompt uses the original question (`condensed_for_answer=False`) skip it.
+    """
+    strategy = strategy or CONDENSE_STRATEGY
+    if strategy in ("llm", "cached") and CONDENSE_PARALLEL_RETRIEVAL and not condensed_for_answer:
+        strategy = "heuristic"
+    stats = {"strategy": strategy if chat_history else "none", "llm_calls": 0, "condense_cache_hit": False}
+    started = time.perf_counter()
+
+    if chat_history and strategy in ("llm", "cached") and CONDENSE_PARALLEL_RETRIEVAL:
+        # Retrieval does not wait for the rephrase; it uses the cheap heuristic query instead
+        condensed, documents = await asyncio.gather(
+            condense_question(model_name, question, chat_history, strategy, stats),
+            retrieve_documents(model_name, _heuristic_condense(question, chat_history)),
+        )
+        stats["condense_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    else:
+        condensed = await condense_question(model_name, question, chat_history, strategy, stats)
+        stats["condense_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        documents = await retrieve_documents(model_name, condensed)
+
+    stats["prepare_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    rag_stats["requests"] += 1
+    rag_stats["condense_llm_calls"] += stats["llm_calls"]
+    rag_stats["condense_cache_hits"] += int(stats["condense_cache_hit"])
+    rag_stats["condense_ms_total"] += stats["condense_ms"]
+    return condensed, documents, stats
+
+def pack_documents(model_name: str, documents: List[Document], mode: Optional[str] = None) -> List[Document]:
+    """Packs retrieved chunks into `model_name`'s context budget and logs what was kept."""
+    with span("context_pack", model=model_name) as current:
+        packed, stats = pack_context(documents, model_name, mode=mode)
+        if current is not None:
+            current.attributes.update(budget=stats["budget"], used_tokens=stats["used_tokens"], dropped=stats["dropped"])
+    print(f"Context packing for '{model_name}' ({stats['mode']}): budget={stats['budget']} used={stats['used_tokens']}/{stats['raw_tokens']} tokens, "
+          f"kept={stats['kept']} summarized={stats['summarized']} truncated={stats['truncated']} dropped={stats['dropped_by_reason']}")
+    rag_stats["packed_requests"] += 1
+    rag_stats["context_raw_tokens"] += stats["raw_tokens"]
+    rag_stats["context_used_tokens"] += stats["used_tokens"]
+    rag_stats["context_chunks_dropped"] += stats["dropped"]
+    return packed
+
+def get_rag_stats() -> Dict[str, Any]:
+    requests = rag_stats["requests"]
+    return {
+        "condense_strategy": CONDENSE_STRATEGY,
+        "parallel_retrieval": CONDENSE_PARALLEL_RETRIEVAL,
+        "requests": requests,
+        "condense_llm_calls": rag_stats["condense_llm_calls"],
+        "condense_cache_hits": rag_stats["condense_cache_hits"],
+        "avg_condense_ms": round(rag_stats["condense_ms_total"] / requests, 1) if requests else 0.0,
+        "context_mode": CONTEXT_MODE,
+        "context_raw_tokens": rag_stats["context_raw_tokens"],
+        "context_used_tokens": rag_stats["context_used_tokens"],
+        "context_chunks_dropped": rag_stats["context_chunks_dropped"],
+        "embedding_backend": EMBEDDING_BACKEND,
+        "local_embeddings": embedding_function.inner.stats() if embedding_function is not None and EMBEDDING_BACKEND == "local" else None,
+    }
+
+async def generate_answer(model_name: str, question: str, documents: List[Document]) -> str:
+    """
+    Runs the answer step of the RAG chain over already retrieved documents.
+    Identical in-flight (model, prompt, documents) generations are coalesced into one LLM call,
+    and only that call occupies an admission slot.
+    """
+    rag_chain = get_rag_chain_for_model(model_name)
+    documents = pack_documents(model_name, documents)
+
+    async def _generate() -> str:
+        async with admission_slot(model_name):
+            with span("llm", model=model_name), LLM_GENERATION_SECONDS.labels(model_name, "invoke").time():
+                result = await rag_chain.combine_docs_chain.ainvoke({"input_documents": documents, "question": question})
+        return result.get("output_text", "")
+
+    return await llm_flights.do(flight_key(model_name, question, documents), _generate)
+
 def _initialize_spacy():
     """Loads the spaCy model."""
     global nlp
@@ -180,6 +447,8 @@ def _initialize_spacy():
                 nlp = None
 
 # Extraction of Keywords
+@traced("spacy_keywords")
+@SPACY_SECONDS.time()
 def extract_keywords_from_text_spacy(text: str) -> str:
     """
     Extracts de-identified, domain-relevant keywords/phrases.
@@ -301,6 +570,48 @@ def perform_semantic_search(query: str, k: int = 3):
     if vectordb is None: return {"error": "Vector store is not available."}
     return vectordb.similarity_search(query, k=k)
 
+def _parse_skills(text: str) -> List[str]:
+    """Pulls the skill list out of a unified document's 'Required Skills: [...]' suffix."""
+    match = re.search(r"Required Skills:\s*\[(.*?)\]", text, re.S)
+    if not match:
+        return []
+    return [s.strip().strip("'\"") for s in match.group(1).split(",") if s.strip().strip("'\"")]
+
+def build_retrieval_only_answer(documents: List[Document]) -> str:
+    """
+    Assembles a short answer straight from retrieved job documents, without an LLM call.
+    Used as the degraded response when the LLM backends are saturated.
+    """
+    if not documents:
+        return "The recommendation service is busy right now. Please try again in a few seconds."
+
+    lines = ["Here are the most relevant roles from our knowledge base (quick answer while the assistant is busy):", ""]
+    seen_titles = set()
+    for doc in documents:
+        title = doc.metadata.get("job_title") or "Related role"
+        if title in seen_titles:
+            continue
+        seen_titles.add(title)
+
+        text = doc.page_content
+        description = re.search(r"Job Description:\s*(.*?)(?:Required Skills:|$)", text, re.S)
+        description = re.sub(r"\s+", " ", description.group(1) if description else text).strip()
+        if len(description) > 300:
+            description = description[:300].rsplit(" ", 1)[0] + "..."
+
+        lines.append(f"- **{title}**: {description}")
+        skills = _parse_skills(text)
+        if skills:
+            lines.append(f"  - Key skills: {', '.join(skills[:10])}")
+    return "\n".join(lines)
+
+async def get_retrieval_only_response(question: str, k: int = 3) -> Dict[str, Any]:
+    """Retrieval-only fallback with the same shape as a ConversationalRetrievalChain result."""
+    if vectordb is None:
+        return {"answer": build_retrieval_only_answer([]), "source_documents": []}
+    documents = await vectordb.asimilarity_search(question, k=k)
+    return {"answer": build_retrieval_only_answer(documents), "source_documents": documents}
+
 class StreamingCallbackHandler(BaseCallbackHandler):
     """Callback handler for streaming responses"""
     def __init__(self):
@@ -322,15 +633,17 @@ async def get_streaming_rag_response(model_name: str, question: str, chat_histor
         rag_chain = get_rag_chain_for_model(model_name)
         llm = get_llm(model_name)
         
-        retriever = rag_chain.retriever
         print("get_streaming_rag_response: Getting relevant documents...")
-        relevant_docs = await retriever.ainvoke(question)
-        print(f"get_streaming_rag_response: Got {len(relevant_docs)} relevant documents.")
+        # History is passed to the prompt as is; only the retrieval query is condensed
+        _, relevant_docs, stats = await prepare_conversational_query(model_name, question, chat_history, condensed_for_answer=False)
+        print(f"get_streaming_rag_response: Got {len(relevant_docs)} relevant documents. Stats: {stats}")
         
         sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in relevant_docs]
         yield {"type": "sources", "sources": sources}
         
-        context = "\n\n".join([doc.page_content for doc in relevant_docs])
+        # Sources report the retrieved chunks; the prompt only gets what fits the model's budget
+        context_docs = pack_documents(model_name, relevant_docs)
+        context = "\n\n".join([doc.page_content for doc in context_docs])
         
         _template = """
         You are a career recommendation assistant. Your goal is to provide clear, concise, and well-structured answers based on the user's query and the provided context.
@@ -356,7 +669,10 @@ async def get_streaming_rag_response(model_name: str, question: str, chat_histor
         Human: {question}
         Assistant:"""
         
-        formatted_history = "\n".join([f"{msg.type}: {msg.content}" for msg in chat_history[-5:]])
+        # A session summary (system message) always stays; only the verbatim turns are cut to the last 5
+        summary_messages = [msg for msg in chat_history if msg.type == "system"]
+        recent_turns = [msg for msg in chat_history if msg.type != "system"][-5:]
+        formatted_history = "\n".join([f"{msg.type}: {msg.content}" for msg in summary_messages + recent_turns])
         
         full_prompt = _template.format(
             context=context,
@@ -364,24 +680,38 @@ async def get_streaming_rag_response(model_name: str, question: str, chat_histor
             question=question
         )
         
-        print("get_streaming_rag_response: Streaming response from LLM...")
-        current_response = ""
-        async for token in llm.astream(full_prompt):
-            content = token.content if hasattr(token, 'content') else token
-            current_response += content
+        async def _stream_tokens() -> AsyncIterator[Dict[str, Any]]:
+            print("get_streaming_rag_response: Streaming response from LLM...")
+            current_response = ""
+            async with admission_slot(model_name):
+                with span("llm_stream", model=model_name) as current:
+                    timer = StreamTimer(model_name)
+                    async for token in llm.astream(full_prompt):
+                        timer.token()
+                        content = token.content if hasattr(token, 'content') else token
+                        current_response += content
+                        yield {
+                            "type": "token",
+                            "content": current_response,
+                            "is_final": False
+                        }
+                    timer.finish()
+                    if current is not None and timer.first_token_at is not None:
+                        current.attributes["ttft_ms"] = round((timer.first_token_at - timer.started) * 1000, 1)
+            print("get_streaming_rag_response: Finished streaming.")
+            
             yield {
                 "type": "token",
                 "content": current_response,
-                "is_final": False
+                "is_final": True
             }
-        print("get_streaming_rag_response: Finished streaming.")
-        
-        yield {
-            "type": "token",
-            "content": current_response,
-            "is_final": True
-        }
+
+        # Identical concurrent questions subscribe to the same token stream
+        async for chunk in llm_flights.stream(flight_key(model_name, full_prompt, context_docs), _stream_tokens):
+            yield chunk
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"get_streaming_rag_response: Exception: {e}")
         yield {"error": f"Streaming error: {str(e)}"}
@@ -0,0 +1,208 @@
+"""
+In-process all-MiniLM-L6-v2 embeddings (sentence-transformers), as an
+alternative to calling Ollama over HTTP for every query.
+
+The model is the one the all_min_chromadb index was built with in Ollama
+(all-minilm:l6-v2): mean pooling, L2-normalised, 384 dimensions. Its vectors
+match Ollama's up to float16 rounding, so the existing index keeps working.
+Check this with `python -m benchmarks.embedding_latency`.
+
+Concurrent queries are coalesced into one `encode` batch: CPU inference is
+much cheaper per text in a batch than one text at a time. Chroma's async
+search runs the sync `embed_query` in executor threads, so that path batches
+across threads; `aembed_query` batches on the event loop.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+# --- Configuration ---
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# "torch", "onnx" or "onnx-quantized" (int8 weights; needs `sentence-transformers[onnx]`)
+LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch")
+LOCAL_EMBEDDING_QUANTIZED_FILE = os.getenv("LOCAL_EMBEDDING_QUANTIZED_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))  # 0 = the runtime's default
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+LOCAL_EMBEDDING_BATCH_WAIT_MS = float(os.getenv("LOCAL_EMBEDDING_BATCH_WAIT_MS", "2"))  # how long a query waits for others to share its batch
+
+
+def load_sentence_transformer(model_name: str = LOCAL_EMBEDDING_MODEL, runtime: str = LOCAL_EMBEDDING_RUNTIME,
+                              threads: int = LOCAL_EMBEDDING_THREADS):
+    """Loads the model on CPU with the chosen runtime and thread count."""
+    from sentence_transformers import SentenceTransformer
+
+    if runtime == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name, device="cpu")
+    if runtime not in ("onnx", "onnx-quantized"):
+        raise ValueError(f"Unknown LOCAL_EMBEDDING_RUNTIME '{runtime}' (expected torch, onnx or onnx-quantized).")
+
+    model_kwargs: Dict[str, Any] = {"provider": "CPUExecutionProvider"}
+    if threads:
+        # ONNX Runtime sizes its own thread pools per session
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+        model_kwargs["session_options"] = session_options
+    if runtime == "onnx-quantized":
+        model_kwargs["file_name"] = LOCAL_EMBEDDING_QUANTIZED_FILE
+    return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+
+class _QueuedQuery:
+    """A sync `embed_query` waiting for a batch; `lead` marks the thread that runs the next one."""
+    __slots__ = ("text", "ready", "lead", "vector", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.ready = threading.Event()
+        self.lead = False
+        self.vector: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class LocalEmbeddings(Embeddings):
+    """LangChain embeddings backed by an in-process SentenceTransformer."""
+    def __init__(self, model: Any = None, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+                 batch_wait_ms: float = LOCAL_EMBEDDING_BATCH_WAIT_MS):
+        self.model = model if model is not None else load_sentence_transformer()
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_scheduled = False
+        self._batches: Set[asyncio.Task] = set()
+        self._queued: List[_QueuedQuery] = []  # sync queries waiting for the leading thread
+        self._leader_active = False
+        self._queue_lock = threading.Lock()
+        self._lock = threading.Lock()  # one encode at a time; the runtime already uses every configured thread
+        self.counts = {"encode_calls": 0, "texts": 0, "query_batches": 0, "batched_queries": 0}
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.counts["encode_calls"] += 1
+            self.counts["texts"] += len(texts)
+            vectors = self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                        convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Threads calling this concurrently share encode batches: the first one waits `batch_wait`
+        for others, encodes up to `batch_size` queries, then hands the lead to the next waiter.
+        """
+        query = _QueuedQuery(text)
+        with self._queue_lock:
+            self._queued.append(query)
+            if not self._leader_active:
+                self._leader_active = query.lead = True
+                first = True
+            else:
+                first = False
+        if not query.lead:
+            query.ready.wait()
+        if query.lead:
+            if first and self.batch_wait > 0:
+                time.sleep(self.batch_wait)
+            self._run_queued_batch()
+        if query.error is not None:
+            raise query.error
+        return query.vector
+
+    def _run_queued_batch(self) -> None:
+        with self._queue_lock:
+            batch, self._queued = self._queued[:self.batch_size], self._queued[self.batch_size:]
+            self.counts["query_batches"] += 1
+            self.counts["batched_queries"] += len(batch)
+        try:
+            vectors = self._encode([query.text for query in batch])
+        except Exception as e:
+            for query in batch:
+                query.error = e
+        else:
+            for query, vector in zip(batch, vectors):
+                query.vector = vector
+        with self._queue_lock:
+            # Queries that arrived during this encode form the next batch, led by the oldest one
+            successor = self._queued[0] if self._queued else None
+            if successor is not None:
+                successor.lead = True
+            else:
+                self._leader_active = False
+        for query in batch:
+            if not query.lead:
+                query.ready.set()
+        if successor is not None:
+            successor.ready.set()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Queued for up to `batch_wait` so concurrent queries share one encode call."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_later(self.batch_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        self._flush_scheduled = False
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        if self._pending and not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+        if batch:
+            self.counts["query_batches"] += 1
+            self.counts["batched_queries"] += len(batch)
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)  # the loop only holds tasks weakly
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            vectors = await asyncio.to_thread(self._encode, [text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self.counts["query_batches"]
+        return {**self.counts, "mean_query_batch": round(self.counts["batched_queries"] / batches, 2) if batches else 0.0}
+
+
+def warm_up(embeddings: Embeddings) -> float:
+    """Runs one query so model loading and first-call setup stay off the request path; returns seconds taken."""
+    started = time.perf_counter()
+    embeddings.embed_query("warm up")
+    return time.perf_counter() - started
+
+
+_local: Optional[LocalEmbeddings] = None
+_local_lock = threading.Lock()
+
+
+def get_local_embeddings() -> LocalEmbeddings:
+    global _local
+    with _local_lock:
+        if _local is None:
+            _local = LocalEmbeddings()
+        return _local
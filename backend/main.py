@@ -1,31 +1,44 @@
 import io
 import hashlib
+import re
+import uuid
 import tempfile
 import os
+from contextlib import aclosing
 from functools import lru_cache
 from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
-from typing import List, Any, Iterator, AsyncIterator, Dict, Optional
+from typing import List, Any, Iterator, AsyncIterator, Dict, Literal, Optional, Tuple
 from pypdf import PdfReader
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 import json
 import asyncio
 import whisper
 
 # LangChain Imports
-from langchain.docstore.document import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma # pyright: ignore[reportMissingImports]
-from langchain_ollama import OllamaEmbeddings # pyright: ignore[reportMissingImports]
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
 # App Services
-from llm_services import get_rag_chain_for_model, build_keywords_prompt_from_text, get_streaming_rag_response, get_llm, extract_keywords_from_text_spacy, detect_language, translate_to_burmese, perform_semantic_search
+from llm_services import get_rag_chain_for_model, build_keywords_prompt_from_text, get_streaming_rag_response, get_llm, extract_keywords_from_text_spacy, detect_language, translate_to_burmese, perform_semantic_search, get_retrieval_only_response, prepare_conversational_query, generate_answer, get_rag_stats, get_embedding_function, get_kb_version
+from admission import admission_slot, admission_stats, AdmissionRejected, OVERLOAD_MODE
+from singleflight import llm_flights
+from router import ModelRouter, RouterUnavailable
+from http_pool import pool_stats, aclose_all
 from langchain_kb.expand.wiki_expander import WikiKBGenerator
-from classification.run import predict_career
+from langchain_kb.expand.scheduler import GenerationStats
+from classification.run import predict_career, predict_careers, get_artifacts, install_artifacts, ClassifierUnavailable
+from classification.artifacts import UnknownBundle, bundle_path, get_current_version
+from recommendation_store import RecommendationStore, CS_RECOMMENDATION_PROMPT
+from cache_warmup import QuizFrequencyTracker, quiz_fingerprint, run_warmup_schedule
+from kb_sandboxes import CachedEmbeddings, EmbeddingCache, Sandbox, SandboxClosed, SandboxStore, kb_chunks, validate_kb
+from kb_jobs import JobProgress, JobQueue
+from sessions import Session, SessionStore, SUMMARY_MODEL, summarize_with_llm, format_turns
+from tracing import TracingMiddleware, create_exporter, span, traced, timing_event
+from metrics import CONTENT_TYPE_LATEST, PDF_SECONDS, WHISPER_SECONDS, StreamTimer, record_cache, register_in_flight_source, monitor_event_loop_lag, render_metrics
 
 # --- API Application Setup ---
 app = FastAPI(
@@ -35,14 +48,37 @@ app = FastAPI(
 )
 
 # --- Global Variables & Services ---
-temporary_rag_chain = None
 kb_generator = None
 whisper_model = None
 
+# Hedged, circuit-broken routing across the LLM backends
+model_router = ModelRouter(neutral_errors=(AdmissionRejected,))
+
+# Precomputed /api/career-quiz/cs answers per (career, model, language)
+recommendation_store = RecommendationStore()
+
 # In-memory cache for career quiz recommendations
 career_quiz_cache = {}
+quiz_frequencies = QuizFrequencyTracker()
+warmup_task = None
+lag_monitor_task = None
 cv_analysis_cache = {}
 
+# Spans exported to OTLP_TRACES_ENDPOINT when set
+trace_exporter = create_exporter()
+
+# Server-side conversation state (rolling summary + recent turns) keyed by session ID
+session_store = SessionStore()
+background_tasks = set()
+
+# Test KBs from /api/kb/test-setup, one per author, sharing an embedding cache keyed by content hash
+kb_sandboxes = SandboxStore()
+kb_embedding_cache = EmbeddingCache()
+SANDBOX_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,48}$")
+
+# KB setup and generation run as background jobs persisted in SQLite (KB_JOBS_DB)
+kb_jobs = JobQueue()
+
 # --- FastAPI Startup Event ---
 @app.on_event("startup")
 def startup_event():
@@ -59,6 +95,34 @@ def startup_event():
     whisper_model = whisper.load_model("base")
     print("Whisper model loaded successfully.")
 
+    recommendation_store.load()
+    # Version from the bundle pointer so the classifier itself can stay lazily loaded
+    recommendation_store.refresh_versions(get_kb_version(), get_current_version() or "legacy-pickle")
+
+@app.on_event("startup")
+async def start_cache_warmup():
+    global warmup_task, lag_monitor_task
+    register_in_flight_source(admission_stats)
+    kb_jobs.register("kb_setup", _run_kb_setup_job)
+    kb_jobs.register("kb_generate", _run_kb_generate_job)
+    await kb_jobs.start()
+    lag_monitor_task = asyncio.create_task(monitor_event_loop_lag())
+    # Pre-generate the most frequent quiz answers in the background so they are cache hits from the start
+    quiz_frequencies.load()
+    warmup_task = asyncio.create_task(run_warmup_schedule(quiz_frequencies, career_quiz_cache, _generate_quiz_recommendation))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in (warmup_task, lag_monitor_task):
+        if task is not None:
+            task.cancel()
+    await asyncio.to_thread(quiz_frequencies.save)
+    await kb_jobs.stop()
+    # Close the shared keep-alive connection pools
+    await aclose_all()
+    if trace_exporter is not None:
+        trace_exporter.shutdown()
+
 # --- CORS Configuration ---
 origins = ["*"]
 app.add_middleware(
@@ -66,18 +130,25 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"] ,
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["Server-Timing"]
 )
+# Outermost, so Server-Timing covers the whole request
+app.add_middleware(TracingMiddleware, exporter=trace_exporter)
 
 # --- Pydantic Models ---
 class ChatRequest(BaseModel):
     message: str
     history: List[dict] = []
     model: str = "gemini"
+    session_id: Optional[str] = None  # "" starts a new server-side session; then `history` can be omitted
+    sandbox_id: Optional[str] = None  # /api/kb/test-chat: the sandbox returned by /api/kb/test-setup
 
 class ChatResponse(BaseModel):
     reply: str
     source_documents: list = []
+    degraded: bool = False
+    session_id: Optional[str] = None
 
 class KBTopic(BaseModel):
     name: str
@@ -92,7 +163,7 @@ class QuizAnswersRequest(BaseModel):
     model: str = "gemini"
     history: List[dict] = []
 
-class CSQuizAnswersRequest(BaseModel):
+class CSQuizAnswers(BaseModel):
     GPA: float
     Major: str
     Python: str
@@ -103,8 +174,34 @@ class CSQuizAnswersRequest(BaseModel):
     Projects_1: str
     Projects_2: str
     Projects_3: str
+
+    def to_model_input(self) -> Dict[str, Any]:
+        """Answers keyed the way the career classifier was trained."""
+        return {
+            'GPA': self.GPA,
+            'Major': self.Major,
+            'Python': self.Python,
+            'SQL': self.SQL,
+            'Java': self.Java,
+            'Interested Domain_1': self.Interested_Domain_1,
+            'Interested Domain_2': self.Interested_Domain_2,
+            'Projects_1': self.Projects_1,
+            'Projects_2': self.Projects_2,
+            'Projects_3': self.Projects_3
+        }
+
+class CSQuizAnswersRequest(CSQuizAnswers):
     model: str = "gemini"
     history: List[dict] = []
+    language: Optional[str] = None  # "en" or "my"; detected from the prompt when omitted
+
+class CSQuizBatchRequest(BaseModel):
+    submissions: List[CSQuizAnswers]
+    top_k: int = 3
+
+class CareerPrediction(BaseModel):
+    career: str
+    top_k: List[Dict[str, Any]]
 
 class CVAnalysisRequest(BaseModel):
     cv_text: str
@@ -114,6 +211,140 @@ class StreamChatRequest(BaseModel):
     message: str
     history: List[dict] = []
     model: str = "gemini"
+    session_id: Optional[str] = None
+    sandbox_id: Optional[str] = None
+
+# --- Admission Control Helpers ---
+
+async def _handle_overload(error: Exception, question: str) -> Dict[str, Any]:
+    """
+    Answers from retrieval only, or rejects with 429 (queue full) / 503 (all circuits open),
+    when no backend can take the request.
+    """
+    print(f"Admission rejected for '{error.model_name}': {error.reason}")
+    if OVERLOAD_MODE != "degrade":
+        raise HTTPException(
+            status_code=503 if isinstance(error, RouterUnavailable) else 429,
+            detail=f"Model '{error.model_name}' is busy. Please retry shortly.",
+            headers={"Retry-After": str(error.retry_after)}
+        )
+    result = await get_retrieval_only_response(question)
+    result["degraded"] = True
+    return result
+
+async def _invoke_rag_with_admission(model_name: str, question: str, chat_history: list) -> Dict[str, Any]:
+    """
+    Runs the RAG chain for `model_name` inside one of that backend's admission slots,
+    hedging to fallback models through the router when it is slow or failing.
+    Follow-ups are condensed with the configured strategy (see CONDENSE_STRATEGY) and
+    identical generations are coalesced.
+    """
+    rag_chain = get_rag_chain_for_model(model_name)
+    if rag_chain is None:
+        raise HTTPException(status_code=503, detail="RAG chain is not available.")
+    try:
+        with span("rag", model=model_name):
+            standalone_question, documents, stats = await prepare_conversational_query(model_name, question, chat_history)
+            answer = await model_router.run(model_name, lambda name: generate_answer(name, standalone_question, documents))
+        stats["llm_calls"] += 1
+        print(f"RAG request stats: {stats}")
+        return {"answer": answer, "source_documents": documents}
+    except (AdmissionRejected, RouterUnavailable) as e:
+        return await _handle_overload(e, question)
+
+def _sse_timing_event() -> Optional[str]:
+    """Trailing stage-timing event for streams (TRACE_SSE_TIMING=true or `X-Timing-Events: 1`)."""
+    timing = timing_event()
+    return f"data: {json.dumps(timing)}\n\n" if timing else None
+
+# --- Conversation Helpers ---
+
+def _history_to_messages(history: List[dict], summary: str = "") -> list:
+    """Converts {'sender', 'text'} history to LangChain messages, led by the session summary if any."""
+    chat_history = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] if summary else []
+    for msg in history:
+        if msg.get('sender') == 'user':
+            chat_history.append(HumanMessage(content=msg.get('text', '')))
+        elif msg.get('sender') == 'bot':
+            chat_history.append(AIMessage(content=msg.get('text', '')))
+    return chat_history
+
+async def _summarize_session_turns(previous_summary: str, turns: List[Dict[str, str]]) -> str:
+    return await summarize_with_llm(get_llm(SUMMARY_MODEL), SUMMARY_MODEL, previous_summary, turns)
+
+def _summarize_later(session: Session, evicted: List[Dict[str, str]], previous_summary: Optional[str] = None) -> None:
+    # Summaries are updated off the request path; the next turn picks up the new one
+    task = asyncio.create_task(session_store.summarize(session, evicted, _summarize_session_turns, previous_summary))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def _save_quiz_frequencies_later() -> None:
+    # The merge reads and rewrites the shared file under a lock; keep it off the event loop
+    task = asyncio.create_task(asyncio.to_thread(quiz_frequencies.save))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def _remember_turn(session: Session, sender: str, text: str) -> None:
+    evicted = session_store.append(session, sender, text)
+    if evicted:
+        _summarize_later(session, evicted)
+
+def _open_session(session_id: Optional[str], history: List[dict]) -> Tuple[Optional[Session], List[dict], str]:
+    """
+    Returns (session, recent history, summary) for a request. Without a session ID the
+    client-sent history is used as-is; a new or expired session is seeded from it.
+    """
+    if session_id is None:
+        return None, history, ""
+    session = session_store.get_or_create(session_id)
+    if not session.turns and not session.summary:
+        # One summary call for everything pushed out of the window; until it lands,
+        # the seeding request (and any before it) uses an extractive summary
+        evicted = session_store.seed(session, [{"sender": msg['sender'], "text": msg.get('text', '')}
+                                               for msg in history if msg.get('sender') in ('user', 'bot')])
+        if evicted:
+            _summarize_later(session, evicted, previous_summary="")
+    return session, session.history(), session.summary
+
+def _record_exchange(session: Optional[Session], message: str, reply: str) -> None:
+    if session is None or not reply:
+        return
+    _remember_turn(session, 'user', message)
+    _remember_turn(session, 'bot', reply)
+
+def _build_chatbot_prompt(message: str, quiz_data: Optional[Dict], history: List[Dict[str, str]], summary: str = "") -> str:
+    """Prompt for the custom Mistral chatbot (no RAG)."""
+    # Process quiz data in background if provided
+    quiz_context = ""
+    if quiz_data:
+        quiz_context = f"""
+User Profile (for context only, do not mention this directly):
+- GPA: {quiz_data.get('GPA', 'N/A')}
+- Python Skills: {quiz_data.get('Python', 'N/A')}
+- SQL Skills: {quiz_data.get('SQL', 'N/A')}
+- Java Skills: {quiz_data.get('Java', 'N/A')}
+- Interested Domains: {quiz_data.get('Interested_Domain_1', 'N/A')}, {quiz_data.get('Interested_Domain_2', 'N/A')}
+- Projects: {quiz_data.get('Projects_1', 'N/A')}, {quiz_data.get('Projects_2', 'N/A')}, {quiz_data.get('Projects_3', 'N/A')}
+
+Based on this profile, provide relevant and personalized responses when appropriate.
+"""
+
+    # Build conversation context: session summary, then the recent turns verbatim
+    conversation_context = f"Summary: {summary}\n" if summary else ""
+    turns = [msg for msg in history[-10:] if msg.get('sender') in ('user', 'bot')]
+    if turns:
+        conversation_context += format_turns([{"sender": msg['sender'], "text": msg.get('text', '')} for msg in turns]) + "\n"
+
+    return f"""You are a helpful AI assistant. You can discuss various topics and provide general assistance.
+
+{quiz_context}
+
+Previous conversation:
+{conversation_context}
+
+Current question:
+Human: {message}
+Assistant:"""
 
 # --- API Endpoints ---
 
@@ -121,110 +352,276 @@ class StreamChatRequest(BaseModel):
 def read_root():
     return {"status": "Career Pathfinder API is running"}
 
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint (stage latency histograms, cache hit/miss counters, in-flight LLM requests)."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/api/admission/stats")
+def get_admission_stats():
+    """In-flight, queued and rejected requests plus queue times per LLM backend."""
+    return admission_stats()
+
+@app.get("/api/coalescing/stats")
+def get_coalescing_stats():
+    """How many LLM generations were led vs. shared by identical concurrent requests."""
+    return llm_flights.stats()
+
+@app.get("/api/router/stats")
+def get_router_stats():
+    """Rolling p50/p95 latency, circuit state, routing decisions and hedge win rates per model."""
+    return model_router.stats()
+
+@app.get("/api/http-pool/stats")
+def get_http_pool_stats():
+    """Requests, connections opened/reused and TLS handshakes saved per upstream service."""
+    return pool_stats()
+
+@app.get("/api/sessions/stats")
+def get_session_stats():
+    """Number of live conversation sessions and how many were expired or evicted."""
+    return session_store.stats()
+
+@app.get("/api/rag/stats")
+def get_rag_request_stats():
+    """Condense strategy in use, LLM rephrase calls avoided/made and time spent condensing."""
+    return get_rag_stats()
+
+@app.get("/api/recommendation-store/stats")
+def get_recommendation_store_stats():
+    """Size, version match and hit rate of the precomputed career recommendations."""
+    return recommendation_store.stats()
+
 # --- Knowledge Base Endpoints ---
 
-@app.post("/api/kb/generate")
-async def generate_knowledge_base(request: KBGenerateRequest):
+async def _run_kb_generate_job(payload: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
     if kb_generator is None:
-        raise HTTPException(status_code=503, detail="Knowledge Base Generator is not available.")
-    print(f"Received request to generate KB for {len(request.topics)} topics.")
-    
-    # Process topics in parallel for better performance
+        raise RuntimeError("Knowledge Base Generator is not available.")
+    topics = [KBTopic(**t) for t in payload["topics"]]
+    progress.start_stage("generating", total=sum(t.num_entries for t in topics))
+    on_entry = lambda index, entry: progress.advance(counter="entries_generated")
+    stats = GenerationStats()
+
+    # Topics run concurrently; the generator's scheduler caps and interleaves their LLM calls
     tasks = []
-    for t in request.topics:
-        tasks.append(kb_generator.generate_kb_for_topic(t.name, t.sections, t.num_entries))
-    
+    for t in topics:
+        tasks.append(kb_generator.generate_kb_for_topic(t.name, t.sections, t.num_entries, on_entry=on_entry, stats=stats))
+
     # Execute all topic generations concurrently
     results = await asyncio.gather(*tasks, return_exceptions=True)
-    
+
     full_kb = []
     for i, result in enumerate(results):
         if isinstance(result, Exception):
-            print(f"Error generating KB for topic {request.topics[i].name}: {result}")
+            print(f"Error generating KB for topic {topics[i].name}: {result}")
             continue
         full_kb.extend(result)
-    
-    return full_kb
+
+    print(f"Generated {len(full_kb)} KB entries: {stats.as_dict()}")
+    return {"entries": full_kb, "stats": stats.as_dict()}
+
+@app.post("/api/kb/generate", status_code=202)
+async def generate_knowledge_base(request: KBGenerateRequest):
+    """
+    Queues KB generation; poll the returned job (or follow its events) for progress.
+    Its result holds the generated `entries` and `stats` (LLM calls, retries, wall time).
+    """
+    if kb_generator is None:
+        raise HTTPException(status_code=503, detail="Knowledge Base Generator is not available.")
+    print(f"Received request to generate KB for {len(request.topics)} topics.")
+    job_id = kb_jobs.submit("kb_generate", {"topics": [t.dict() for t in request.topics]})
+    return _job_accepted(job_id)
+
+@app.get("/api/kb/wiki-cache/stats")
+def get_wiki_cache_stats():
+    """Wikipedia lookups served from the on-disk cache, revalidated, fetched or missed (offline mode)."""
+    if kb_generator is None:
+        raise HTTPException(status_code=503, detail="Knowledge Base Generator is not available.")
+    return kb_generator.wiki.stats()
+
+@app.get("/api/kb/scheduler/stats")
+def get_kb_scheduler_stats():
+    """KB generation LLM calls running and queued (per topic) under KB_LLM_CONCURRENCY."""
+    if kb_generator is None:
+        raise HTTPException(status_code=503, detail="Knowledge Base Generator is not available.")
+    return kb_generator.scheduler.stats()
+
+@app.post("/api/kb/generate/stream")
+async def stream_knowledge_base(request: KBGenerateRequest, stream_format: Literal["ndjson", "sse"] = Query("ndjson", alias="format")):
+    """
+    Generates the KB in the request and streams it as it is produced, one JSON event per line:
+    {"type": "entry", "topic", "index", "entry"} for every finished entry (`index` is its position in the topic,
+    entries arrive in completion order),
+    {"type": "topic_complete", "topic", "entries"} or {"type": "error", "topic", "error"} per topic,
+    and a final {"type": "done", "entries", "stats"}. `?format=sse` wraps the events as server-sent events.
+    """
+    if kb_generator is None:
+        raise HTTPException(status_code=503, detail="Knowledge Base Generator is not available.")
+    print(f"Received request to stream KB for {len(request.topics)} topics.")
+
+    def encode(event: Dict[str, Any]) -> str:
+        line = json.dumps(event, ensure_ascii=False)
+        return f"data: {line}\n\n" if stream_format == "sse" else line + "\n"
+
+    async def generate_events() -> AsyncIterator[str]:
+        events: asyncio.Queue = asyncio.Queue()
+        stats = GenerationStats()
+
+        async def run_topic(t: KBTopic) -> None:
+            sent = 0
+
+            def on_entry(index: int, entry: Dict[str, Any]) -> None:
+                nonlocal sent
+                sent += 1
+                events.put_nowait({"type": "entry", "topic": t.name, "index": index, "entry": entry})
+
+            try:
+                # collect=False: the generator does not keep entries once they are queued here
+                await kb_generator.generate_kb_for_topic(t.name, t.sections, t.num_entries, on_entry=on_entry, stats=stats, collect=False)
+                events.put_nowait({"type": "topic_complete", "topic": t.name, "entries": sent})
+            except Exception as e:
+                print(f"Error generating KB for topic {t.name}: {e}")
+                events.put_nowait({"type": "error", "topic": t.name, "error": str(e)})
+
+        tasks = [asyncio.create_task(run_topic(t)) for t in request.topics]
+        pending_topics = len(tasks)
+        entries = 0
+        try:
+            # Entries are forwarded as soon as they finish and not kept once sent
+            while pending_topics:
+                event = await events.get()
+                if event["type"] == "entry":
+                    entries += 1
+                else:
+                    pending_topics -= 1
+                yield encode(event)
+            yield encode({"type": "done", "entries": entries, "stats": stats.as_dict()})
+        finally:
+            # Client went away (or we are done): stop generating for it
+            for task in tasks:
+                task.cancel()
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(generate_events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/kb/jobs/stats")
+def get_kb_job_stats():
+    """KB jobs per status and how many are running now."""
+    return kb_jobs.stats()
+
+@app.get("/api/kb/jobs/{job_id}")
+def get_kb_job(job_id: str):
+    """Status and progress (stage, done/total, ETA) of a KB job; `result` once it has succeeded."""
+    job = kb_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="KB job not found.")
+    return job
+
+@app.get("/api/kb/jobs/{job_id}/events")
+async def stream_kb_job(job_id: str):
+    """Server-sent events with the job's state on every change, ending after it succeeds or fails."""
+    if kb_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="KB job not found.")
+
+    async def generate_events() -> AsyncIterator[str]:
+        async for job in kb_jobs.events(job_id):
+            yield ": keep-alive\n\n" if job is None else f"data: {json.dumps(job)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.post("/api/career-quiz/cs", response_model=ChatResponse)
-def career_quiz_cs_recommendation(request: CSQuizAnswersRequest):
-    user_answers = {
-        'GPA': request.GPA,
-        'Major': request.Major,
-        'Python': request.Python,
-        'SQL': request.SQL,
-        'Java': request.Java,
-        'Interested Domain_1': request.Interested_Domain_1,
-        'Interested Domain_2': request.Interested_Domain_2,
-        'Projects_1': request.Projects_1,
-        'Projects_2': request.Projects_2,
-        'Projects_3': request.Projects_3
-    }
-    
-    predicted_career = predict_career(user_answers)
-    
-    rag_chain = get_rag_chain_for_model(request.model)
-    if rag_chain is None:
-        raise HTTPException(status_code=503, detail="RAG chain is not available.")
+async def career_quiz_cs_recommendation(request: CSQuizAnswersRequest):
+    try:
+        # The first call loads the classifier bundle from disk; inference is CPU-bound too
+        with span("predict_career"):
+            predicted_career = await asyncio.to_thread(predict_career, request.to_model_input())
+    except ClassifierUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    prompt = f"Based on the predicted career of '{predicted_career}', provide a detailed career recommendation from the knowledge base. Focus on job roles, required skills, and potential career paths."
+    prompt = CS_RECOMMENDATION_PROMPT.format(career=predicted_career)
+    lang = request.language or await asyncio.to_thread(detect_language, prompt)
+
+    # Fresh quiz submissions are answered from the offline-generated store when it is current
+    if not request.history:
+        with span("recommendation_lookup"):
+            stored = recommendation_store.lookup(predicted_career, request.model, lang)
+        record_cache("recommendation_store", stored is not None)
+        if stored is not None:
+            return ChatResponse(reply=stored['reply'], source_documents=stored['source_documents'])
     
-    chat_history = []
-    for msg in request.history:
-        if msg['sender'] == 'user':
-            chat_history.append(HumanMessage(content=msg['text']))
-        elif msg['sender'] == 'bot':
-            chat_history.append(AIMessage(content=msg['text']))
-
-    result = rag_chain.invoke({"question": prompt, "chat_history": chat_history})
+    chat_history = _history_to_messages(request.history)
+
+    result = await _invoke_rag_with_admission(request.model, prompt, chat_history)
     sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get('source_documents', [])]
     
     reply = result.get('answer', '')
     
-    # Language detection and translation
-    lang = detect_language(prompt)
+    # Translation
     if lang == 'my':
-        reply = translate_to_burmese(reply)
+        reply = await asyncio.to_thread(translate_to_burmese, reply)
         
-    response = ChatResponse(reply=reply, source_documents=sources)
+    response = ChatResponse(reply=reply, source_documents=sources, degraded=result.get('degraded', False))
     
     return response
 
-@app.post("/api/career-quiz", response_model=ChatResponse)
-def career_quiz_recommendation(request: QuizAnswersRequest):
-    # Create a cache key from the sorted answers and model to ensure consistency
-    cache_key = f"{request.model}_".join(sorted(request.answers))
+@app.post("/api/career-quiz/cs/batch", response_model=List[CareerPrediction])
+def career_quiz_cs_batch(request: CSQuizBatchRequest):
+    """Classifier-only predictions for bulk (e.g. school-wide) assessments, no LLM calls."""
+    if not request.submissions:
+        return []
+    try:
+        return predict_careers([s.to_model_input() for s in request.submissions], top_k=request.top_k)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Unknown answer value: {e}")
+    except ClassifierUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    # Check if the recommendation is already in the cache
-    if cache_key in career_quiz_cache and not request.history:
-        print(f"Returning cached recommendation for quiz answers: {cache_key}")
-        return career_quiz_cache[cache_key]
+class ClassifierReloadRequest(BaseModel):
+    version: Optional[str] = None
 
-    rag_chain = get_rag_chain_for_model(request.model)
-    if rag_chain is None:
-        raise HTTPException(status_code=503, detail="RAG chain is not available.")
-    
+@app.get("/api/classifier")
+def classifier_info():
+    try:
+        return {"version": get_artifacts().version}
+    except ClassifierUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/api/classifier/reload")
+def reload_classifier(request: ClassifierReloadRequest):
+    """Hot-swaps the career model to a bundle version (default: the one CURRENT points at)."""
+    if request.version is not None:
+        try:
+            bundle_path(request.version)
+        except UnknownBundle as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        version = install_artifacts(request.version)
+        recommendation_store.refresh_versions(get_kb_version(), version)
+        return {"status": "success", "version": version}
+    except (ClassifierUnavailable, FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _generate_quiz_recommendation(model_name: str, answers: List[str], history: Optional[List[dict]] = None) -> ChatResponse:
+    """Runs the quiz RAG call; history-free answers are cached under the canonical quiz fingerprint."""
     quiz_prompt = f'''
         Based on the following quiz answers, provide a career recommendation
         from the knowledge base. Focus on job roles, required skills, and potential career paths.
         If the knowledge base does not contain direct information, provide a general recommendation
         and suggest further exploration. Do not make up information.
 
-        Quiz Answers: {', '.join(request.answers)}
+        Quiz Answers: {', '.join(answers)}
 
         Career Recommendation:
     '''.strip()
 
     print(f"Written Print: {quiz_prompt}")
     
-    chat_history = []
-    for msg in request.history:
-        if msg['sender'] == 'user':
-            chat_history.append(HumanMessage(content=msg['text']))
-        elif msg['sender'] == 'bot':
-            chat_history.append(AIMessage(content=msg['text']))
-
-    result = rag_chain.invoke({"question": quiz_prompt, "chat_history": chat_history})
+    chat_history = _history_to_messages(history or [])
+
+    result = await _invoke_rag_with_admission(model_name, quiz_prompt, chat_history)
     sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get('source_documents', [])]
     
     reply = result.get('answer', '')
@@ -232,34 +629,36 @@ def career_quiz_recommendation(request: QuizAnswersRequest):
     # Language detection and translation
     lang = detect_language(quiz_prompt)
     if lang == 'my':
-        reply = translate_to_burmese(reply)
+        reply = await asyncio.to_thread(translate_to_burmese, reply)
 
-    response = ChatResponse(reply=reply, source_documents=sources)
+    degraded = result.get('degraded', False)
+    response = ChatResponse(reply=reply, source_documents=sources, degraded=degraded)
     
-    # Store the new recommendation in the cache before returning
+    # Store the new recommendation in the cache before returning (degraded answers are not cached)
+    if not history and not degraded:
+        career_quiz_cache[quiz_fingerprint(model_name, answers)] = response
+    return response
+
+@app.post("/api/career-quiz", response_model=ChatResponse)
+async def career_quiz_recommendation(request: QuizAnswersRequest):
+    # Order- and formatting-insensitive key; also counted so warm-up knows the hot combinations
+    cache_key = quiz_frequencies.record(request.model, request.answers)
+    if quiz_frequencies.save_due():
+        _save_quiz_frequencies_later()
+
+    # Check if the recommendation is already in the cache
     if not request.history:
-        career_quiz_cache[cache_key] = response
+        record_cache("career_quiz", cache_key in career_quiz_cache)
+    if cache_key in career_quiz_cache and not request.history:
+        print(f"Returning cached recommendation for quiz answers: {cache_key}")
+        return career_quiz_cache[cache_key]
+
+    response = await _generate_quiz_recommendation(request.model, request.answers, request.history)
     print(f"Returning career quiz recommendation: {response.reply[:100]}...")
     
     return response
 
-@app.post("/api/kb/test-setup")
-def setup_test_rag(kb_data: List[Any]):
-    global temporary_rag_chain
-    print("Setting up temporary RAG chain...")
-    try:
-        all_docs = [Document(page_content=sec['content'], metadata={'topic': topic['title'], 'section': sec['title']}) for topic in kb_data for sec in topic['sections']]
-        if not all_docs:
-            raise HTTPException(status_code=400, detail="Cannot create KB from empty content.")
-        
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-        chunks = text_splitter.split_documents(all_docs)
-        
-        embedding_function = OllamaEmbeddings(model="all-minilm:l6-v2")
-        vectordb = Chroma.from_documents(documents=chunks, embedding=embedding_function)
-        
-        retriever = vectordb.as_retriever()
-        prompt_template = '''
+TEST_RAG_PROMPT = PromptTemplate(template='''
 You are a career recommendation assistant. Your goal is to provide clear, concise, and well-structured answers based on the user's query and the provided context.
 
 **Instructions for your response:**
@@ -279,37 +678,96 @@ If you don't know the answer or the context is not sufficient, just say that you
 **User's Query:**
 Human: {question}
 
-Assistant:'''.strip()
-        
-        PROMPT = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-        
-        temporary_rag_chain = RetrievalQA.from_chain_type(llm=get_llm(), chain_type="stuff", retriever=retriever, return_source_documents=True, chain_type_kwargs={"prompt": PROMPT})
-        print("Temporary RAG chain is ready.")
-        return {"status": "success"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+Assistant:'''.strip(), input_variables=["context", "question"])
+
+def _build_sandbox(kb_data: List[Dict[str, Any]], sandbox_id: str, progress: JobProgress) -> Dict[str, Any]:
+    """Chunks the KB and embeds whatever the sandbox does not hold yet (runs in a worker thread)."""
+    progress.start_stage("chunking", total=validate_kb(kb_data))
+    chunks = kb_chunks(kb_data, on_section=lambda: progress.advance(counter="sections_chunked"))
+    if not chunks:
+        raise ValueError("Cannot create KB from empty content.")
+
+    def create(collection_name: str) -> Sandbox:
+        print(f"Creating KB sandbox {sandbox_id}...")
+        embeddings = CachedEmbeddings(get_embedding_function(), kb_embedding_cache)
+        vectordb = Chroma(collection_name=collection_name, embedding_function=embeddings)
+        sandbox = Sandbox(sandbox_id, vectordb, embeddings)
+        sandbox.chain = RetrievalQA.from_chain_type(llm=get_llm(), chain_type="stuff", retriever=vectordb.as_retriever(), return_source_documents=True, chain_type_kwargs={"prompt": TEST_RAG_PROMPT})
+        return sandbox
+
+    sandbox = kb_sandboxes.open(sandbox_id, create)
+    with sandbox.lock, sandbox.in_use():
+        changes = sandbox.sync(
+            chunks,
+            on_start=lambda new: progress.start_stage("embedding", total=new),
+            on_added=lambda n: progress.advance(n, counter="chunks_embedded"),
+        )
+    kb_sandboxes.put(sandbox)
+    print(f"KB sandbox {sandbox.id} ready: {changes}")
+    return {"sandbox_id": sandbox.id, **changes, "size_bytes": sandbox.size_bytes}
+
+async def _run_kb_setup_job(payload: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    return await asyncio.to_thread(_build_sandbox, payload["kb"], payload["sandbox_id"], progress)
+
+def _job_accepted(job_id: str, **extra: Any) -> Dict[str, Any]:
+    return {"status": "queued", "job_id": job_id, "status_url": f"/api/kb/jobs/{job_id}", "events_url": f"/api/kb/jobs/{job_id}/events", **extra}
+
+@app.post("/api/kb/test-setup", status_code=202)
+def setup_test_rag(kb_data: List[Any], sandbox_id: Optional[str] = Query(None, description="Re-upload into this sandbox; only changed sections are re-embedded")):
+    """
+    Queues loading a generated KB into a private sandbox. Returns the `sandbox_id`
+    for /api/kb/test-chat and a job to poll; the sandbox is usable once the job succeeds.
+    """
+    if sandbox_id is not None and not SANDBOX_ID_PATTERN.match(sandbox_id):
+        raise HTTPException(status_code=400, detail="sandbox_id may only contain letters, digits, '-' and '_' (max 48).")
+    try:
+        if not validate_kb(kb_data):
+            raise ValueError("Cannot create KB from empty content.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sandbox_id = sandbox_id or uuid.uuid4().hex
+    job_id = kb_jobs.submit("kb_setup", {"kb": kb_data, "sandbox_id": sandbox_id})
+    return _job_accepted(job_id, sandbox_id=sandbox_id)
+
+SANDBOX_NOT_FOUND = "Test KB sandbox not found (still building, or expired); check the setup job or run /api/kb/test-setup again."
+
+def _get_sandbox(sandbox_id: Optional[str]) -> Sandbox:
+    if not sandbox_id:
+        raise HTTPException(status_code=400, detail="sandbox_id is required; use the one returned by /api/kb/test-setup.")
+    sandbox = kb_sandboxes.get(sandbox_id)
+    if sandbox is None:
+        raise HTTPException(status_code=404, detail=SANDBOX_NOT_FOUND)
+    return sandbox
+
+@app.get("/api/kb/sandboxes/stats")
+def get_kb_sandbox_stats():
+    """Live test KB sandboxes with their estimated memory, evictions and embedding cache hit ratio."""
+    return {**kb_sandboxes.stats(), "embedding_cache": kb_embedding_cache.stats()}
 
 @app.post("/api/kb/test-chat", response_model=ChatResponse)
 async def chat_with_test_rag(request: ChatRequest):
-    if temporary_rag_chain is None:
-        raise HTTPException(status_code=404, detail="Temporary RAG chain not found.")
+    sandbox = _get_sandbox(request.sandbox_id)
     try:
-        result = temporary_rag_chain.invoke({"query": request.message})
+        # Eviction waits for the chat to finish before dropping the collection
+        with sandbox.in_use():
+            result = sandbox.chain.invoke({"query": request.message})
         sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get('source_documents', [])]
         return ChatResponse(reply=result.get('result', ''), source_documents=sources)
+    except SandboxClosed:
+        raise HTTPException(status_code=404, detail=SANDBOX_NOT_FOUND)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/kb/test-chat/stream")
 def stream_chat_with_test_rag(request: StreamChatRequest):
     """Streaming endpoint for test RAG chatbot"""
-    if temporary_rag_chain is None:
-        raise HTTPException(status_code=404, detail="Temporary RAG chain not found.")
+    sandbox = _get_sandbox(request.sandbox_id)
     
     async def generate_test_stream() -> AsyncIterator[str]:
         try:
             # For test RAG, we'll simulate streaming by chunking the response
-            result = temporary_rag_chain.invoke({"query": request.message})
+            with sandbox.in_use():
+                result = sandbox.chain.invoke({"query": request.message})
             reply = result.get('result', '')
             sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get('source_documents', [])]
             
@@ -331,6 +789,9 @@ def stream_chat_with_test_rag(request: StreamChatRequest):
             error_data = {"error": str(e)}
             yield f"data: {json.dumps(error_data)}\n\n"
         finally:
+            timing = _sse_timing_event()
+            if timing:
+                yield timing
             yield "data: [DONE]\n\n"
     
     return StreamingResponse(
@@ -352,6 +813,7 @@ async def analyze_cv_rag(request: CVAnalysisRequest):
     # The cache key should still be based on the full CV text to avoid re-processing
     cache_key = f"spacy_keywords_{request.model}_".join(hashlib.md5(request.cv_text.encode()).hexdigest())
 
+    record_cache("cv_analysis", cache_key in cv_analysis_cache)
     if cache_key in cv_analysis_cache:
         print(f"Returning cached recommendation for CV analysis.")
         return cv_analysis_cache[cache_key]
@@ -362,10 +824,6 @@ async def analyze_cv_rag(request: CVAnalysisRequest):
         raise HTTPException(status_code=400, detail="Could not extract any keywords from the provided CV text.")
     print(f"Extracted keywords from CV: {keywords}")
 
-    rag_chain = get_rag_chain_for_model(request.model)
-    if rag_chain is None:
-        raise HTTPException(status_code=503, detail="RAG chain is not available.")
-    
     # 2. Create a new prompt with keywords
     cv_prompt = f'''
         Analyze the following keywords from a CV and provide career recommendations,
@@ -379,18 +837,22 @@ async def analyze_cv_rag(request: CVAnalysisRequest):
     '''.strip()
     
     # 3. Invoke the RAG chain
-    result = await rag_chain.ainvoke({"question": cv_prompt, "chat_history": []})
+    result = await _invoke_rag_with_admission(request.model, cv_prompt, [])
     sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get('source_documents', [])]
     
-    response = ChatResponse(reply=result.get('answer', ''), source_documents=sources)
+    degraded = result.get('degraded', False)
+    response = ChatResponse(reply=result.get('answer', ''), source_documents=sources, degraded=degraded)
     
     # Store the new recommendation in the cache
-    cv_analysis_cache[cache_key] = response
+    if not degraded:
+        cv_analysis_cache[cache_key] = response
     print(f"Returning CV analysis recommendation based on keywords: {response.reply[:100]}...")
     
     return response
 
 @lru_cache(maxsize=50)  # Cache PDF extractions
+@traced("pdf_extract")
+@PDF_SECONDS.time()  # only cache misses reach the timer
 def extract_pdf_text_cached(file_hash: str, contents_bytes: bytes) -> str:
     """Extract text from PDF with caching based on file hash."""
     reader = PdfReader(io.BytesIO(contents_bytes))
@@ -413,7 +875,9 @@ async def analyze_cv(file: UploadFile = File(...)):
         file_hash = hashlib.md5(contents).hexdigest()
         
         # Use cached extraction if available
+        hits_before = extract_pdf_text_cached.cache_info().hits
         text = extract_pdf_text_cached(file_hash, contents)
+        record_cache("pdf_text", extract_pdf_text_cached.cache_info().hits > hits_before)
         
         print(f"Extracted text length: {len(text)} (limited to first 5 pages for performance)")
         print(f"Extracted CV Text:\n{text[:500]}... (truncated for brevity)") # Print first 500 chars
@@ -428,27 +892,23 @@ async def analyze_cv(file: UploadFile = File(...)):
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_with_rag(request: ChatRequest):
-    rag_chain = get_rag_chain_for_model(request.model)
-    if rag_chain is None:
-        raise HTTPException(status_code=503, detail="RAG chain is not available.")
-    
-    # Convert history from dict to LangChain message objects
-    chat_history = []
-    for msg in request.history:
-        if msg['sender'] == 'user':
-            chat_history.append(HumanMessage(content=msg['text']))
-        elif msg['sender'] == 'bot':
-            chat_history.append(AIMessage(content=msg['text']))
+    # Convert history (server-side session or client-sent) to LangChain message objects
+    session, history, summary = _open_session(request.session_id, request.history)
+    chat_history = _history_to_messages(history, summary)
 
     try:
         # ConversationalRetrievalChain expects 'question' and 'chat_history'
-        result = rag_chain.invoke({"question": request.message, "chat_history": chat_history})
+        result = await _invoke_rag_with_admission(request.model, request.message, chat_history)
         
         # ConversationalRetrievalChain returns 'answer' directly
         reply = result.get('answer', '')
         sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get('source_documents', [])]
+        _record_exchange(session, request.message, reply)
         
-        return ChatResponse(reply=reply, source_documents=sources)
+        return ChatResponse(reply=reply, source_documents=sources, degraded=result.get('degraded', False),
+                            session_id=session.id if session else None)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error during chat with RAG: {e}")
         raise HTTPException(status_code=500, detail=f"Error during chat with RAG: {e}")
@@ -459,28 +919,24 @@ async def stream_chat_with_rag(request: StreamChatRequest):
     # Detect the language of the user's message
     lang = detect_language(request.message)
 
-    # Convert history from dict to LangChain message objects
-    chat_history = []
-    for msg in request.history:
-        if msg['sender'] == 'user':
-            chat_history.append(HumanMessage(content=msg['text']))
-        elif msg['sender'] == 'bot':
-            chat_history.append(AIMessage(content=msg['text']))
+    # Convert history (server-side session or client-sent) to LangChain message objects
+    session, history, summary = _open_session(request.session_id, request.history)
+    chat_history = _history_to_messages(history, summary)
 
     async def generate_stream() -> AsyncIterator[str]:
+        reply = ""
         try:
+            if session is not None:
+                yield f"data: {json.dumps({'type': 'session', 'session_id': session.id})}\n\n"
             # If the language is Burmese, get the full response, translate it, then stream it
             if lang == 'my':
-                rag_chain = get_rag_chain_for_model(request.model)
-                if rag_chain is None:
-                    raise HTTPException(status_code=503, detail="RAG chain is not available.")
-                
                 # Get the full response (non-streamed)
-                result = rag_chain.invoke({"question": request.message, "chat_history": chat_history})
+                result = await _invoke_rag_with_admission(request.model, request.message, chat_history)
                 reply = result.get('answer', '')
                 
                 # Translate the full response
-                translated_reply = translate_to_burmese(reply)
+                translated_reply = await asyncio.to_thread(translate_to_burmese, reply)
+                reply = translated_reply
                 
                 # Stream the translated response
                 words = translated_reply.split()
@@ -492,13 +948,30 @@ async def stream_chat_with_rag(request: StreamChatRequest):
                     await asyncio.sleep(0.05)  # Small delay to simulate streaming
             else:
                 # If the language is not Burmese, stream the response directly
-                async for chunk in get_streaming_rag_response(request.model, request.message, chat_history):
-                    yield f"data: {json.dumps(chunk)}\n\n"
-
+                try:
+                    # Streams are not hedged; the router only steers them away from open circuits
+                    async with aclosing(model_router.stream(
+                            request.model,
+                            lambda backend: get_streaming_rag_response(backend, request.message, chat_history),
+                            failed=lambda chunk: "error" in chunk)) as chunks:
+                        async for chunk in chunks:
+                            if chunk.get("is_final"):
+                                reply = chunk["content"]
+                            yield f"data: {json.dumps(chunk)}\n\n"
+                except (AdmissionRejected, RouterUnavailable) as e:
+                    result = await _handle_overload(e, request.message)
+                    sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in result.get('source_documents', [])]
+                    yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
+                    yield f"data: {json.dumps({'type': 'token', 'content': result['answer'], 'is_final': True, 'degraded': True})}\n\n"
+
+            _record_exchange(session, request.message, reply)
         except Exception as e:
             error_data = {"error": str(e)}
             yield f"data: {json.dumps(error_data)}\n\n"
         finally:
+            timing = _sse_timing_event()
+            if timing:
+                yield timing
             yield "data: [DONE]\n\n"
     
     return StreamingResponse(
@@ -526,9 +999,11 @@ class ChatbotRequest(BaseModel):
     message: str
     history: List[Dict[str, str]] = []
     quiz_data: Optional[Dict] = None  # Optional quiz data for background processing
+    session_id: Optional[str] = None
 
 class ChatbotResponse(BaseModel):
     reply: str
+    session_id: Optional[str] = None
 
 @app.post("/api/chatbot", response_model=ChatbotResponse)
 async def chatbot_conversation(request: ChatbotRequest):
@@ -536,48 +1011,22 @@ async def chatbot_conversation(request: ChatbotRequest):
     try:
         # Get the custom Mistral LLM
         llm = get_llm("custom_mistral")
-        
-        # Process quiz data in background if provided
-        quiz_context = ""
-        if request.quiz_data:
-            quiz_context = f"""
-User Profile (for context only, do not mention this directly):
-- GPA: {request.quiz_data.get('GPA', 'N/A')}
-- Python Skills: {request.quiz_data.get('Python', 'N/A')}
-- SQL Skills: {request.quiz_data.get('SQL', 'N/A')}
-- Java Skills: {request.quiz_data.get('Java', 'N/A')}
-- Interested Domains: {request.quiz_data.get('Interested_Domain_1', 'N/A')}, {request.quiz_data.get('Interested_Domain_2', 'N/A')}
-- Projects: {request.quiz_data.get('Projects_1', 'N/A')}, {request.quiz_data.get('Projects_2', 'N/A')}, {request.quiz_data.get('Projects_3', 'N/A')}
-
-Based on this profile, provide relevant and personalized responses when appropriate.
-"""
-        
-        # Build conversation context from history
-        conversation_context = ""
-        for msg in request.history[-10:]:
-            if msg.get('sender') == 'user':
-                conversation_context += f"Human: {msg.get('text', '')}\n"
-            elif msg.get('sender') == 'bot':
-                conversation_context += f"Assistant: {msg.get('text', '')}\n"
-        
-        # Create prompt for the chatbot
-        prompt = f"""You are a helpful AI assistant. You can discuss various topics and provide general assistance.
-
-{quiz_context}
-
-Previous conversation:
-{conversation_context}
-
-Current question:
-Human: {request.message}
-Assistant:"""
+        session, history, summary = _open_session(request.session_id, request.history)
+        prompt = _build_chatbot_prompt(request.message, request.quiz_data, history, summary)
         
         # Get response from Mistral
-        response = await llm.ainvoke(prompt)
-        reply = response.content if hasattr(response, 'content') else str(response)
+        try:
+            async with admission_slot("custom_mistral"):
+                response = await llm.ainvoke(prompt)
+            reply = response.content if hasattr(response, 'content') else str(response)
+        except AdmissionRejected as e:
+            reply = (await _handle_overload(e, request.message))["answer"]
+        _record_exchange(session, request.message, reply)
         
-        return ChatbotResponse(reply=reply)
+        return ChatbotResponse(reply=reply, session_id=session.id if session else None)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Chatbot error: {e}")
         raise HTTPException(status_code=500, detail=f"Chatbot error: {str(e)}")
@@ -586,6 +1035,7 @@ class StreamChatbotRequest(BaseModel):
     message: str
     history: List[Dict[str, str]] = []
     quiz_data: Optional[Dict] = None  # Optional quiz data for background processing
+    session_id: Optional[str] = None
 
 class SpeechToTextResponse(BaseModel):
     text: str
@@ -598,55 +1048,38 @@ async def stream_chatbot_conversation(request: StreamChatbotRequest):
         try:
             # Get the custom Mistral LLM
             llm = get_llm("custom_mistral")
-            
-            # Process quiz data in background if provided
-            quiz_context = ""
-            if request.quiz_data:
-                quiz_context = f"""
-User Profile (for context only, do not mention this directly):
-- GPA: {request.quiz_data.get('GPA', 'N/A')}
-- Python Skills: {request.quiz_data.get('Python', 'N/A')}
-- SQL Skills: {request.quiz_data.get('SQL', 'N/A')}
-- Java Skills: {request.quiz_data.get('Java', 'N/A')}
-- Interested Domains: {request.quiz_data.get('Interested_Domain_1', 'N/A')}, {request.quiz_data.get('Interested_Domain_2', 'N/A')}
-- Projects: {request.quiz_data.get('Projects_1', 'N/A')}, {request.quiz_data.get('Projects_2', 'N/A')}, {request.quiz_data.get('Projects_3', 'N/A')}
-
-Based on this profile, provide relevant and personalized responses when appropriate.
-"""
-            
-            # Build conversation context from history
-            conversation_context = ""
-            for msg in request.history[-10:]:
-                if msg.get('sender') == 'user':
-                    conversation_context += f"Human: {msg.get('text', '')}\n"
-                elif msg.get('sender') == 'bot':
-                    conversation_context += f"Assistant: {msg.get('text', '')}\n"
-            
-            # Create prompt for the chatbot
-            prompt = f"""You are a helpful AI assistant. You can discuss various topics and provide general assistance.
-
-{quiz_context}
-
-Previous conversation:
-{conversation_context}
-
-Current question:
-Human: {request.message}
-Assistant:"""
+            session, history, summary = _open_session(request.session_id, request.history)
+            prompt = _build_chatbot_prompt(request.message, request.quiz_data, history, summary)
+            if session is not None:
+                yield f"data: {json.dumps({'type': 'session', 'session_id': session.id})}\n\n"
             
             # Stream response from Mistral
             current_response = ""
-            async for token in llm.astream(prompt):
-                content = token.content if hasattr(token, 'content') else str(token)
-                current_response += content
-                yield f"data: {json.dumps({'type': 'token', 'content': current_response, 'is_final': False})}\n\n"
+            async with admission_slot("custom_mistral"):
+                timer = StreamTimer("custom_mistral")
+                async for token in llm.astream(prompt):
+                    timer.token()
+                    content = token.content if hasattr(token, 'content') else str(token)
+                    current_response += content
+                    yield f"data: {json.dumps({'type': 'token', 'content': current_response, 'is_final': False})}\n\n"
+                timer.finish()
             
             # Send final response
             yield f"data: {json.dumps({'type': 'token', 'content': current_response, 'is_final': True})}\n\n"
+            _record_exchange(session, request.message, current_response)
             
+        except AdmissionRejected as e:
+            try:
+                result = await _handle_overload(e, request.message)
+                yield f"data: {json.dumps({'type': 'token', 'content': result['answer'], 'is_final': True, 'degraded': True})}\n\n"
+            except HTTPException as http_error:
+                yield f"data: {json.dumps({'error': http_error.detail, 'retry_after': e.retry_after})}\n\n"
         except Exception as e:
             error_data = {"error": str(e)}
             yield f"data: {json.dumps(error_data)}\n\n"
+        timing = _sse_timing_event()
+        if timing:
+            yield timing
     
     return StreamingResponse(
         generate_stream(),
@@ -681,7 +1114,8 @@ async def speech_to_text(audio_file: UploadFile = File(...)):
         
         try:
             # Transcribe audio using Whisper
-            result = whisper_model.transcribe(temp_file_path)
+            with span("whisper"), WHISPER_SECONDS.time():
+                result = whisper_model.transcribe(temp_file_path)
             
             # Extract text and detected language
             transcribed_text = result["text"].strip()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+# --- Configuration ---
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))  # seconds between lag probes
+
+# Buckets tuned to this service: local retrieval is milliseconds, LLM calls are seconds
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160)
+
+# --- Metrics ---
+RETRIEVAL_SECONDS = Histogram("rag_retrieval_seconds", "Vector store retrieval time (includes the query embedding)", ["model"], buckets=FAST_BUCKETS)
+EMBEDDING_SECONDS = Histogram("embedding_seconds", "Embedding call time", ["operation"], buckets=FAST_BUCKETS)
+LLM_TTFT_SECONDS = Histogram("llm_time_to_first_token_seconds", "Time from sending the prompt to the first streamed token", ["model"], buckets=SLOW_BUCKETS)
+LLM_TOKENS_PER_SECOND = Histogram("llm_tokens_per_second", "Generated tokens per second after the first token", ["model"], buckets=RATE_BUCKETS)
+LLM_GENERATION_SECONDS = Histogram("llm_generation_seconds", "Full LLM generation time", ["model", "mode"], buckets=SLOW_BUCKETS)
+TRANSLATION_SECONDS = Histogram("translation_seconds", "Google Translate call time", buckets=SLOW_BUCKETS)
+SPACY_SECONDS = Histogram("spacy_keywords_seconds", "spaCy keyword extraction time", buckets=FAST_BUCKETS)
+PDF_SECONDS = Histogram("pdf_extraction_seconds", "PDF text extraction time", buckets=FAST_BUCKETS)
+WHISPER_SECONDS = Histogram("whisper_transcription_seconds", "Whisper transcription time", buckets=SLOW_BUCKETS)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+EVENT_LOOP_LAG_SECONDS = Histogram("event_loop_lag_seconds", "Delay of a scheduled wake-up on the asyncio event loop", buckets=FAST_BUCKETS)
+EVENT_LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+class StreamTimer:
+    """Records time-to-first-token and tokens/sec for one streamed generation."""
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.chunks = 0
+
+    def token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            LLM_TTFT_SECONDS.labels(self.model_name).observe(self.first_token_at - self.started)
+        self.chunks += 1
+
+    def finish(self, generated_tokens: Optional[int] = None) -> None:
+        """`generated_tokens` defaults to the number of streamed chunks (about one token each)."""
+        finished = time.perf_counter()
+        LLM_GENERATION_SECONDS.labels(self.model_name, "stream").observe(finished - self.started)
+        if self.first_token_at is not None and finished > self.first_token_at:
+            tokens = generated_tokens if generated_tokens is not None else self.chunks
+            LLM_TOKENS_PER_SECOND.labels(self.model_name).observe(tokens / (finished - self.first_token_at))
+
+
+class _InFlightCollector:
+    """Reads in-flight and queued requests per LLM backend from the admission controllers at scrape time."""
+    def __init__(self, source: Callable[[], Dict[str, Dict[str, int]]]):
+        self.source = source
+
+    def collect(self):
+        in_flight = GaugeMetricFamily("llm_in_flight_requests", "LLM requests holding an admission slot", labels=["backend"])
+        waiting = GaugeMetricFamily("llm_queued_requests", "LLM requests waiting for an admission slot", labels=["backend"])
+        rejected = GaugeMetricFamily("llm_rejected_requests", "LLM requests rejected by admission control since start", labels=["backend"])
+        for backend, stats in self.source().items():
+            in_flight.add_metric([backend], stats["in_flight"])
+            waiting.add_metric([backend], stats["waiting"])
+            rejected.add_metric([backend], stats["rejected"])
+        yield in_flight
+        yield waiting
+        yield rejected
+
+
+_in_flight_registered = False
+
+
+def register_in_flight_source(source: Callable[[], Dict[str, Dict[str, int]]]) -> None:
+    global _in_flight_registered
+    if not _in_flight_registered:
+        REGISTRY.register(_InFlightCollector(source))
+        _in_flight_registered = True
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL) -> None:
+    """Measures how late the loop wakes a sleeping task; sustained lag means blocking code on the loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - scheduled - interval)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+# --- Configuration ---
+STORE_PATH = "./recommendations/store.json"
+DEFAULT_MODELS = ["gemini"]
+DEFAULT_LANGUAGES = ["en", "my"]
+
+# Shared with /api/career-quiz/cs so stored and live answers come from the same prompt
+CS_RECOMMENDATION_PROMPT = "Based on the predicted career of '{career}', provide a detailed career recommendation from the knowledge base. Focus on job roles, required skills, and potential career paths."
+PROMPT_VERSION = hashlib.sha1(CS_RECOMMENDATION_PROMPT.encode()).hexdigest()[:8]
+
+
+def _entry_key(career: str, model_name: str, language: str) -> str:
+    return f"{career}|{model_name}|{language}"
+
+
+class RecommendationStore:
+    """
+    Precomputed career recommendations for every (career class, model, language).
+    The store is only served while its KB, classifier and prompt versions match the running ones.
+    """
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self.versions: Dict[str, str] = {}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.current_versions: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            print(f"No recommendation store found at {self.path}.")
+            return
+        self.versions = data.get("versions", {})
+        self.entries = data.get("entries", {})
+        print(f"Loaded {len(self.entries)} precomputed recommendations (versions: {self.versions}).")
+
+    def refresh_versions(self, kb_version: str, classifier_version: str) -> None:
+        """Records the versions currently running; call again after a KB rebuild or classifier swap."""
+        self.current_versions = {"kb": kb_version, "classifier": classifier_version, "prompt": PROMPT_VERSION}
+        if self.entries and not self.is_current():
+            print(f"Recommendation store is stale (store {self.versions}, running {self.current_versions}). Regenerate with: python recommendation_store.py")
+
+    def is_current(self) -> bool:
+        return bool(self.current_versions) and self.versions == self.current_versions
+
+    def lookup(self, career: str, model_name: str, language: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(_entry_key(career, model_name, language)) if self.is_current() else None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def save(self, versions: Dict[str, str], entries: Dict[str, Dict[str, Any]]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"versions": versions, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.versions, self.entries = versions, entries
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "current": self.is_current(),
+            "store_versions": self.versions,
+            "running_versions": self.current_versions,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+async def build_store(store: RecommendationStore, models: List[str], languages: List[str]) -> None:
+    """Offline job: generates the recommendation and sources for every (career, model, language)."""
+    from llm_services import retrieve_documents, generate_answer, translate_to_burmese, get_kb_version
+    from classification.run import get_artifacts
+
+    artifacts = get_artifacts()
+    versions = {"kb": get_kb_version(), "classifier": artifacts.version, "prompt": PROMPT_VERSION}
+    careers = [str(c) for c in artifacts.class_names]
+    print(f"Building recommendation store for {len(careers)} careers x {models} x {languages} (versions: {versions})")
+
+    entries = {}
+    for career in careers:
+        prompt = CS_RECOMMENDATION_PROMPT.format(career=career)
+        for model_name in models:
+            documents = await retrieve_documents(model_name, prompt)
+            reply = await generate_answer(model_name, prompt, documents)
+            sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+            for language in languages:
+                translated = reply if language == "en" else await asyncio.to_thread(translate_to_burmese, reply)
+                entries[_entry_key(career, model_name, language)] = {"reply": translated, "source_documents": sources}
+            print(f"  - {career} / {model_name}: done")
+
+    store.save(versions, entries)
+    print(f"Saved {len(entries)} recommendations to {store.path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute /api/career-quiz/cs recommendations for every career class.")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--languages", nargs="+", default=DEFAULT_LANGUAGES, choices=["en", "my"])
+    parser.add_argument("--path", default=STORE_PATH)
+    args = parser.parse_args()
+
+    asyncio.run(build_store(RecommendationStore(args.path), args.models, args.languages))
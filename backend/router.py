@@ -0,0 +1,265 @@
+import asyncio
+import math
+import time
+from collections import Counter, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Type
+
+# --- Configuration ---
+# Backends tried, in order, when the requested model is slow or its circuit is open.
+FALLBACK_MODELS: Dict[str, List[str]] = {
+    "gemini": ["custom_mistral", "llama3.2"],
+    "custom_mistral": ["gemini", "llama3.2"],
+    "llama3.2": ["gemini"],
+}
+HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_DELAY = 4.0  # seconds, used until a model has enough latency samples
+MIN_HEDGE_DELAY = 0.5
+MIN_SAMPLES = 10
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+
+
+class RouterUnavailable(Exception):
+    """Raised when every candidate backend for a request has an open circuit."""
+    def __init__(self, model_name: str, retry_after: int):
+        super().__init__(f"No healthy backend for '{model_name}'.")
+        self.model_name = model_name
+        self.retry_after = retry_after
+        self.reason = "all circuits open"
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one model."""
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, lets a single probe through after `reset_timeout`."""
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def probe_in_flight(self) -> bool:
+        # A probe that never reported back (e.g. its caller went away) expires after `reset_timeout`
+        return self.probe_started_at is not None and time.monotonic() - self.probe_started_at < self.reset_timeout
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probe_in_flight)
+
+    def allow(self) -> bool:
+        """Like `available`, but claims the single half-open probe slot."""
+        if not self.available():
+            return False
+        if self.state == "half_open":
+            self.probe_started_at = time.monotonic()
+        return True
+
+    def release_probe(self) -> None:
+        self.probe_started_at = None
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.probe_started_at = None
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class ModelRouter:
+    """
+    Routes a call to the requested model, hedging to a fallback model when the primary
+    has not answered within its rolling p95 latency, and skipping models whose circuit is open.
+    """
+    def __init__(self, fallbacks: Optional[Dict[str, List[str]]] = None, hedge_percentile: float = HEDGE_PERCENTILE,
+                 default_hedge_delay: float = DEFAULT_HEDGE_DELAY, min_hedge_delay: float = MIN_HEDGE_DELAY,
+                 failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT,
+                 neutral_errors: Tuple[Type[BaseException], ...] = ()):
+        self.fallbacks = FALLBACK_MODELS if fallbacks is None else fallbacks
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # Errors that trigger failover but say nothing about backend health (e.g. local admission rejections)
+        self.neutral_errors = neutral_errors
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.decisions = Counter()
+        self.wins = Counter()
+        self.failures = Counter()
+
+    def _tracker(self, model_name: str) -> LatencyTracker:
+        if model_name not in self.latency:
+            self.latency[model_name] = LatencyTracker()
+        return self.latency[model_name]
+
+    def _breaker(self, model_name: str) -> CircuitBreaker:
+        if model_name not in self.breakers:
+            self.breakers[model_name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[model_name]
+
+    def hedge_delay(self, model_name: str) -> float:
+        tracker = self._tracker(model_name)
+        if len(tracker.samples) < MIN_SAMPLES:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, tracker.percentile(self.hedge_percentile))
+
+    def candidates(self, model_name: str) -> List[str]:
+        """The requested model followed by its fallbacks, keeping only those whose circuit admits a call."""
+        ordered = [model_name] + [m for m in self.fallbacks.get(model_name, []) if m != model_name]
+        return [m for m in ordered if self._breaker(m).available()]
+
+    def pick(self, model_name: str) -> str:
+        """Chooses a single healthy backend (used for streams, which are not hedged)."""
+        for backend in self.candidates(model_name):
+            if self._breaker(backend).allow():
+                self.decisions["primary" if backend == model_name else "rerouted"] += 1
+                return backend
+        self.decisions["unavailable"] += 1
+        raise RouterUnavailable(model_name, math.ceil(self.reset_timeout))
+
+    def record(self, model_name: str, seconds: float, ok: bool) -> None:
+        if ok:
+            self._tracker(model_name).record(seconds)
+            self._breaker(model_name).record_success()
+        else:
+            self.failures[model_name] += 1
+            self._breaker(model_name).record_failure()
+
+    async def _timed(self, model_name: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await call(model_name)
+        except asyncio.CancelledError:
+            # A cancelled hedge loser says nothing about the backend's health
+            self._breaker(model_name).release_probe()
+            raise
+        except self.neutral_errors:
+            self._breaker(model_name).release_probe()
+            raise
+        except Exception:
+            self.record(model_name, time.perf_counter() - started, ok=False)
+            raise
+        self.record(model_name, time.perf_counter() - started, ok=True)
+        return result
+
+    async def run(self, model_name: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        """
+        Calls `call(backend_name)` on the primary backend, launching the next fallback
+        after the primary's hedge delay (or immediately if it fails). First success wins.
+        """
+        queue = self.candidates(model_name)
+        running: Dict[asyncio.Task, str] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            while queue:
+                backend = queue.pop(0)
+                if self._breaker(backend).allow():
+                    running[asyncio.ensure_future(self._timed(backend, call))] = backend
+                    return
+
+        launch()
+        if not running:
+            self.decisions["unavailable"] += 1
+            raise RouterUnavailable(model_name, math.ceil(self.reset_timeout))
+        self.decisions["primary" if model_name in running.values() else "rerouted"] += 1
+        try:
+            while running:
+                timeout = self.hedge_delay(list(running.values())[-1]) if queue else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.decisions["hedged"] += 1
+                    launch()
+                    continue
+                for task in done:
+                    backend = running.pop(task)
+                    if task.exception() is None:
+                        self.wins[backend] += 1
+                        return task.result()
+                    last_error = task.exception()
+                    if queue:
+                        self.decisions["failover"] += 1
+                        launch()
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def stream(self, model_name: str, open_stream: Callable[[str], AsyncIterator[Any]],
+                     failed: Callable[[Any], bool] = lambda item: False) -> AsyncIterator[Any]:
+        """
+        Streams from a single healthy backend (streams are not hedged) and reports the outcome
+        to its breaker the way `_timed` does; `failed(item)` marks in-band error items.
+        """
+        backend = self.pick(model_name)
+        started = time.perf_counter()
+        ok = True
+        try:
+            async for item in open_stream(backend):
+                ok = ok and not failed(item)
+                yield item
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client went away: says nothing about the backend's health
+            self._breaker(backend).release_probe()
+            raise
+        except self.neutral_errors:
+            self._breaker(backend).release_probe()
+            raise
+        except Exception:
+            self.record(backend, time.perf_counter() - started, ok=False)
+            raise
+        self.record(backend, time.perf_counter() - started, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        models = set(self.latency) | set(self.breakers)
+        total_wins = sum(self.wins.values()) or 1
+        return {
+            "decisions": dict(self.decisions),
+            "models": {
+                name: {
+                    "p50_ms": _ms(self._tracker(name).percentile(50)),
+                    "p95_ms": _ms(self._tracker(name).percentile(95)),
+                    "samples": len(self._tracker(name).samples),
+                    "hedge_delay_ms": _ms(self.hedge_delay(name)),
+                    "circuit": self._breaker(name).state,
+                    "wins": self.wins[name],
+                    "win_rate": round(self.wins[name] / total_wins, 3),
+                    "failures": self.failures[name],
+                }
+                for name in sorted(models)
+            },
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from admission import admission_slot
+from token_utils import count_tokens, truncate_to_tokens
+
+# --- Configuration ---
+MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "2000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+KEEP_LAST_TURNS = int(os.getenv("SESSION_KEEP_LAST_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("SESSION_HISTORY_TOKEN_BUDGET", "800"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SESSION_SUMMARY_TOKEN_BUDGET", "250"))
+SUMMARY_MODEL = os.getenv("SESSION_SUMMARY_MODEL", "llama3.2")  # a cheap local model is enough
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a career guidance assistant.
+Keep facts about the user (skills, background, goals, constraints) and any decisions or recommendations made.
+Write at most {max_words} words of plain prose.
+
+Current summary:
+{summary}
+
+New conversation lines:
+{turns}
+
+Updated summary:"""
+
+Summarizer = Callable[[str, List[Dict[str, str]]], Awaitable[str]]
+
+
+class Session:
+    """One conversation: a rolling summary of older turns plus the most recent turns verbatim."""
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        self.last_access = time.monotonic()
+        self._summary_lock = asyncio.Lock()
+
+    def history(self) -> List[Dict[str, str]]:
+        """Recent turns in the request `history` format ({'sender', 'text'})."""
+        return list(self.turns)
+
+
+class SessionStore:
+    """LRU + TTL bounded map of session ID -> Session."""
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl_seconds: float = SESSION_TTL_SECONDS,
+                 keep_last_turns: int = KEEP_LAST_TURNS, history_token_budget: int = HISTORY_TOKEN_BUDGET):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.keep_last_turns = keep_last_turns
+        self.history_token_budget = history_token_budget
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        # Least recently used sessions sit at the front, so stop at the first live one
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def get_or_create(self, session_id: Optional[str] = None) -> Session:
+        with self._lock:
+            self._sweep()
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = Session(session_id or uuid.uuid4().hex)
+                self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            session.last_access = time.monotonic()
+            self._sweep()
+            return session
+
+    def append(self, session: Session, sender: str, text: str) -> List[Dict[str, str]]:
+        """
+        Adds a turn and returns the turns pushed out of the verbatim window
+        (beyond the last K turns or the token budget); those belong in the summary.
+        """
+        session.turns.append({"sender": sender, "text": text})
+        kept: List[Dict[str, str]] = []
+        used = 0
+        for turn in reversed(session.turns):
+            cost = count_tokens(turn["text"])
+            if kept and (len(kept) >= self.keep_last_turns or used + cost > self.history_token_budget):
+                break
+            kept.append(turn)
+            used += cost
+        kept.reverse()
+        evicted = session.turns[:len(session.turns) - len(kept)]
+        session.turns = kept
+        return evicted
+
+    def seed(self, session: Session, turns: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Fills a new session from a client-sent history in one go. Returns every turn
+        pushed out of the window, and sets an extractive summary of them right away,
+        so the seeding request does not lose them while the real summary is written.
+        """
+        evicted: List[Dict[str, str]] = []
+        for turn in turns:
+            evicted += self.append(session, turn["sender"], turn["text"])
+        if evicted:
+            session.summary = truncate_to_tokens(extractive_summary("", evicted), SUMMARY_TOKEN_BUDGET, keep="tail")
+        return evicted
+
+    async def summarize(self, session: Session, evicted: List[Dict[str, str]], summarizer: Summarizer,
+                        previous_summary: Optional[str] = None) -> None:
+        """
+        Folds evicted turns into the rolling summary (incrementally, one update at a time per session).
+        `previous_summary` replaces the session's current summary as the starting point ("" after `seed`).
+        """
+        if not evicted:
+            return
+        async with session._summary_lock:
+            previous = session.summary if previous_summary is None else previous_summary
+            try:
+                summary = await summarizer(previous, evicted)
+            except Exception as e:
+                print(f"Session summary update failed, keeping an extractive summary: {e}")
+                summary = extractive_summary(previous, evicted)
+            session.summary = truncate_to_tokens(summary.strip(), SUMMARY_TOKEN_BUDGET, keep="tail")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "expired": self.expired, "evicted": self.evicted}
+
+
+def extractive_summary(previous_summary: str, turns: List[Dict[str, str]]) -> str:
+    """LLM-free fallback: keeps the start of each evicted turn after the previous summary."""
+    lines = [previous_summary] if previous_summary else []
+    for turn in turns:
+        speaker = "User" if turn["sender"] == "user" else "Assistant"
+        lines.append(f"{speaker}: {truncate_to_tokens(turn['text'], 40)}")
+    return "\n".join(lines)
+
+
+async def summarize_with_llm(llm, model_name: str, previous_summary: str, turns: List[Dict[str, str]]) -> str:
+    """Summarizer that folds `turns` into `previous_summary` with one LLM call."""
+    prompt = SUMMARY_PROMPT.format(
+        max_words=int(SUMMARY_TOKEN_BUDGET * 0.75),
+        summary=previous_summary or "(none yet)",
+        turns=format_turns(turns),
+    )
+    async with admission_slot(model_name):
+        response = await llm.ainvoke(prompt)
+    return response.content if hasattr(response, 'content') else str(response)
+
+
+def format_turns(turns: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{'Human' if t['sender'] == 'user' else 'Assistant'}: {t['text']}" for t in turns)
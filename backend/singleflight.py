@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lower-cases and collapses whitespace so trivially different prompts share a key."""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+def document_ids(documents: List[Any]) -> Tuple[str, ...]:
+    """Stable identifiers for retrieved documents (Chroma ids when present, content hashes otherwise)."""
+    ids = []
+    for doc in documents:
+        doc_id = getattr(doc, "id", None)
+        if not doc_id:
+            doc_id = hashlib.md5(doc.page_content.encode("utf-8")).hexdigest()
+        ids.append(str(doc_id))
+    return tuple(ids)
+
+
+def flight_key(model_name: str, prompt: str, documents: List[Any]) -> Tuple[str, str, Tuple[str, ...]]:
+    return (model_name, normalize_prompt(prompt), document_ids(documents))
+
+
+class _Broadcast:
+    """Replayable event buffer so late subscribers see every item the leader has produced."""
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.producer: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, item: Any) -> None:
+        async with self._changed:
+            self.items.append(item)
+            self._changed.notify_all()
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.items) or self.done)
+                pending = self.items[index:]
+                finished, error = self.done, self.error
+            for item in pending:
+                yield item
+            index += len(pending)
+            if finished and index >= len(self.items):
+                if error is not None:
+                    raise error
+                return
+
+
+class _Flight:
+    """One in-flight call and the number of callers awaiting it."""
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key runs the work,
+    everyone else arriving while it is in flight shares the result (or the token stream).
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, _Flight] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self._producers: Set[asyncio.Task] = set()
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    def _forget_call(self, key: Hashable, flight: _Flight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._calls.get(key)
+        if flight is None:
+            self.leaders += 1
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget_call(key, flight))
+        else:
+            self.followers += 1
+        flight.waiters += 1
+        try:
+            # Shield so one disconnecting client does not cancel the generation the others wait on.
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the result any more (e.g. a hedge loser): stop the call and free its slot
+                self.abandoned += 1
+                self._forget_call(key, flight)
+                flight.task.cancel()
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self.leaders += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+
+            async def produce():
+                try:
+                    async for item in factory():
+                        await broadcast.publish(item)
+                    await broadcast.close()
+                except BaseException as e:
+                    await broadcast.close(e)
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                finally:
+                    if self._streams.get(key) is broadcast:
+                        del self._streams[key]
+
+            # Keep a reference: the loop only holds tasks weakly
+            broadcast.producer = asyncio.ensure_future(produce())
+            self._producers.add(broadcast.producer)
+            broadcast.producer.add_done_callback(self._producers.discard)
+        else:
+            self.followers += 1
+
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.producer.done():
+                # Every client has gone: stop generating and free the admission slot
+                self.abandoned += 1
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+                broadcast.producer.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "abandoned": self.abandoned,
+        }
+
+
+# Shared by every LLM generation path in the API
+llm_flights = SingleFlight()
@@ -0,0 +1,178 @@
+"""
+Offline stage: stores a compact "retrieval summary" (role, key responsibilities,
+canonical skills) per job posting as metadata on every chunk of that posting in
+the Chroma store, so the RAG prompt can use it instead of the raw chunk
+(RAG_CONTEXT_MODE=summary).
+
+Usage (from backend/):
+    python summarize_chunks.py [--model llama3.2] [--concurrency 2] [--force]
+"""
+import argparse
+import ast
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from token_utils import truncate_to_tokens
+
+SUMMARY_MODEL = "llama3.2"
+MAX_SOURCE_TOKENS = 2500
+MAX_RESPONSIBILITIES = 5
+MAX_SKILLS = 12
+
+SUMMARY_PROMPT = """Summarize this job posting for a career recommendation assistant.
+Ignore company boilerplate, equal opportunity statements, benefits and application instructions.
+Answer with JSON only, in this shape:
+{{"role": "<job role in a few words>", "responsibilities": ["<short phrase>", ...], "skills": ["<skill>", ...]}}
+Use at most {max_responsibilities} responsibilities and {max_skills} skills, most important first.
+{skills_hint}
+Job posting:
+{posting}
+
+JSON:"""
+SUMMARY_VERSION = hashlib.sha1(SUMMARY_PROMPT.encode()).hexdigest()[:8]
+
+
+def canonical_skills(skills: List[str]) -> List[str]:
+    """Lower-cased, de-duplicated skill names in their original order."""
+    seen = OrderedDict()
+    for skill in skills:
+        name = re.sub(r"\s+", " ", str(skill)).strip(" .;,-").lower()
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def parse_summary(text: str) -> Optional[Dict[str, Any]]:
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not data.get("role"):
+        return None
+    return data
+
+
+def format_summary(data: Dict[str, Any], job_title: str) -> str:
+    responsibilities = [str(r).strip() for r in data.get("responsibilities", []) if str(r).strip()][:MAX_RESPONSIBILITIES]
+    skills = canonical_skills(data.get("skills", []))[:MAX_SKILLS]
+    lines = [f"Role: {data.get('role') or job_title}"]
+    if job_title and job_title.lower() not in str(data.get("role", "")).lower():
+        lines.append(f"Job title: {job_title}")
+    if responsibilities:
+        lines.append("Key responsibilities: " + "; ".join(responsibilities))
+    if skills:
+        lines.append("Skills: " + ", ".join(skills))
+    return "\n".join(lines)
+
+
+def _parse_skill_set(value: Any) -> List[str]:
+    """`job_skill_set` is stored as the string form of a Python list."""
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    try:
+        parsed = ast.literal_eval(str(value))
+        return list(parsed) if isinstance(parsed, (list, tuple)) else [str(parsed)]
+    except (ValueError, SyntaxError):
+        return re.split(r"[,;\n]", str(value))
+
+
+def _load_postings(data_path: str) -> Dict[int, Dict[str, Any]]:
+    """Full postings by original_index, when the source data is available."""
+    try:
+        df = pd.read_json(data_path)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {index: row.to_dict() for index, row in df.iterrows()}
+
+
+def _group_chunks(collection) -> Dict[Any, Dict[str, Any]]:
+    records = collection.get(include=["metadatas", "documents"])
+    jobs: Dict[Any, Dict[str, Any]] = OrderedDict()
+    for chunk_id, metadata, text in zip(records["ids"], records["metadatas"], records["documents"]):
+        metadata = metadata or {}
+        job = jobs.setdefault(metadata.get("original_index", chunk_id), {"ids": [], "metadatas": [], "texts": []})
+        job["ids"].append(chunk_id)
+        job["metadatas"].append(metadata)
+        job["texts"].append(text or "")
+    return jobs
+
+
+async def summarize_job(llm, job_title: str, posting: str, skills: List[str]) -> str:
+    skills_hint = f"Skills listed by the employer: {', '.join(skills)}\n" if skills else ""
+    prompt = SUMMARY_PROMPT.format(
+        max_responsibilities=MAX_RESPONSIBILITIES,
+        max_skills=MAX_SKILLS,
+        skills_hint=skills_hint,
+        posting=truncate_to_tokens(posting, MAX_SOURCE_TOKENS),
+    )
+    response = await llm.ainvoke(prompt)
+    text = response.content if hasattr(response, 'content') else str(response)
+    data = parse_summary(text)
+    if data is None:
+        # Unparseable output still yields a usable, if thinner, summary
+        data = {"role": job_title, "responsibilities": [], "skills": skills}
+    return format_summary(data, job_title)
+
+
+async def summarize_store(model_name: str = SUMMARY_MODEL, concurrency: int = 2, force: bool = False) -> Dict[str, int]:
+    from llm_services import vectordb, get_llm, DATA_PATH
+
+    if vectordb is None:
+        raise RuntimeError("Vector store is not available.")
+    collection = vectordb._collection
+    llm = get_llm(model_name)
+    postings = _load_postings(DATA_PATH)
+    jobs = _group_chunks(collection)
+    version = f"{SUMMARY_VERSION}:{model_name}"
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"jobs": len(jobs), "summarized": 0, "skipped": 0, "failed": 0}
+    print(f"Summarizing {len(jobs)} job postings ({sum(len(j['ids']) for j in jobs.values())} chunks) with '{model_name}'...")
+
+    async def _process(job_key, job) -> None:
+        if not force and all(m.get("retrieval_summary_version") == version for m in job["metadatas"]):
+            counts["skipped"] += 1
+            return
+        row = postings.get(job_key, {})
+        job_title = str(row.get("job_title") or job["metadatas"][0].get("job_title") or "")
+        posting = row.get("unified_document") or "\n".join(job["texts"])
+        listed_skills = _parse_skill_set(row.get("job_skill_set"))
+        async with semaphore:
+            try:
+                summary = await summarize_job(llm, job_title, posting, canonical_skills(listed_skills))
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"  - {job_title or job_key}: failed ({e})")
+                return
+        metadatas = [{**m, "retrieval_summary": summary, "retrieval_summary_version": version} for m in job["metadatas"]]
+        # Metadata-only update: the chunk embeddings stay as they are
+        collection.update(ids=job["ids"], metadatas=metadatas)
+        counts["summarized"] += 1
+        if counts["summarized"] % 25 == 0:
+            print(f"  - {counts['summarized']} postings summarized")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_process(key, job) for key, job in jobs.items()))
+    print(f"Done in {time.perf_counter() - started:.1f}s: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store a compact retrieval summary per job posting as chunk metadata.")
+    parser.add_argument("--model", default=SUMMARY_MODEL, help="Local (Ollama) model used for the summaries")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--force", action="store_true", help="Regenerate summaries that are already current")
+    args = parser.parse_args()
+
+    asyncio.run(summarize_store(args.model, args.concurrency, args.force))
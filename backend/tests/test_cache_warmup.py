@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+from cache_warmup import QuizFrequencyTracker, quiz_fingerprint, warm_up
+
+
+def test_concurrent_saves_from_several_trackers_keep_every_count(tmp_path):
+    path = str(tmp_path / "quiz_frequencies.json")
+    workers = [QuizFrequencyTracker(path) for _ in range(4)]
+
+    def submit(tracker):
+        for _ in range(50):
+            tracker.record("gemini", ["Python", "Data"])
+            tracker.save()
+
+    threads = [threading.Thread(target=submit, args=(tracker,)) for tracker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reloaded = QuizFrequencyTracker(path)
+    reloaded.load()
+    assert reloaded.counts[quiz_fingerprint("gemini", ["data", "python"])] == 200
+
+
+def test_failed_save_keeps_pending_counts(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    tracker = QuizFrequencyTracker(str(blocker / "quiz_frequencies.json"))
+    tracker.record("gemini", ["Python"])
+
+    tracker.save()
+
+    assert sum(tracker.pending.values()) == 1
+
+
+def test_warm_up_with_zero_rate_is_unthrottled(tmp_path):
+    tracker = QuizFrequencyTracker(str(tmp_path / "quiz_frequencies.json"))
+    for answers in (["a"], ["b"], ["c"]):
+        tracker.record("gemini", answers)
+    generated = []
+
+    async def generate(model, answers):
+        generated.append(answers)
+
+    assert asyncio.run(warm_up(tracker, {}, generate, rate_per_second=0)) == 3
+    assert len(generated) == 3
@@ -0,0 +1,84 @@
+"""Exporting the classifier to a bundle and loading it back must not change predictions."""
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("sklearn")
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import LabelEncoder
+
+from classification import artifacts as artifacts_module
+from classification import run
+
+SKILLS = {"Weak": 0, "Average": 1, "Strong": 2}
+ROWS = [
+    ({"GPA": 3.8, "Major": "Computer Science", "Python": "Strong", "SQL": "Average", "Java": "Weak",
+      "Interested Domain_1": "Machine Learning", "Interested Domain_2": "Data Science",
+      "Projects_1": "Image Recognition", "Projects_2": "Chatbot", "Projects_3": "Deep Learning Models"}, "Machine Learning Engineer"),
+    ({"GPA": 3.1, "Major": "Information Technology", "Python": "Average", "SQL": "Strong", "Java": "Average",
+      "Interested Domain_1": "Data Science", "Interested Domain_2": "Cloud Computing",
+      "Projects_1": "Data Analytics Dashboard", "Projects_2": "E-commerce Website", "Projects_3": "Chatbot"}, "Data Analyst"),
+    ({"GPA": 2.9, "Major": "Software Engineering", "Python": "Weak", "SQL": "Average", "Java": "Strong",
+      "Interested Domain_1": "Web Development", "Interested Domain_2": "Mobile Development",
+      "Projects_1": "E-commerce Website", "Projects_2": "Network Security", "Projects_3": "Chatbot"}, "Web Developer"),
+    ({"GPA": 3.4, "Major": "Computer Science", "Python": "Average", "SQL": "Weak", "Java": "Average",
+      "Interested Domain_1": "Cybersecurity", "Interested Domain_2": "Cloud Computing",
+      "Projects_1": "Network Security", "Projects_2": "Data Analytics Dashboard", "Projects_3": "Image Recognition"}, "Security Analyst"),
+]
+
+
+@pytest.fixture
+def trained():
+    """Tools and model in the shape the training script pickles, fit on a few rows."""
+    answers = [a for a, _ in ROWS]
+    # The training script fits on a pandas column, which gives object-dtype classes
+    label_encoder = LabelEncoder().fit(np.array([career for _, career in ROWS], dtype=object))
+    vectorizer_domain = TfidfVectorizer().fit([f"{a['Interested Domain_1']} {a['Interested Domain_2']}" for a in answers])
+    vectorizer_projects = TfidfVectorizer().fit([f"{a['Projects_1']} {a['Projects_2']} {a['Projects_3']}" for a in answers])
+    tools = {"skill_mapping": SKILLS, "vectorizer_domain": vectorizer_domain, "vectorizer_projects": vectorizer_projects,
+             "major_columns": ["Major_Information Technology", "Major_Software Engineering"], "label_encoder": label_encoder}
+    layout = SimpleNamespace(skill_mapping=SKILLS, vectorizer_domain=vectorizer_domain, vectorizer_projects=vectorizer_projects,
+                             major_columns=tools["major_columns"],
+                             major_column_index={col: i for i, col in enumerate(tools["major_columns"])})
+    features = run.build_feature_matrix(answers, layout)
+    model = LogisticRegression(max_iter=1000).fit(features, label_encoder.transform([career for _, career in ROWS]))
+    return tools, model
+
+
+def _predict(monkeypatch, artifacts):
+    monkeypatch.setattr(run, "_artifacts", artifacts)
+    return run.predict_careers([a for a, _ in ROWS], top_k=3)
+
+
+def test_bundle_round_trip_matches_pickle_path(tmp_path, monkeypatch, trained):
+    tools, model = trained
+    legacy = artifacts_module.CareerArtifacts("legacy-pickle", tools["skill_mapping"], tools["vectorizer_domain"],
+                                              tools["vectorizer_projects"], tools["major_columns"], tools["label_encoder"], model)
+    assert tools["label_encoder"].classes_.dtype == object
+
+    artifacts_module.export_bundle(tools, model, version="v1", root=str(tmp_path))
+    loaded = artifacts_module.load_bundle("v1", root=str(tmp_path))
+
+    expected, actual = _predict(monkeypatch, legacy), _predict(monkeypatch, loaded)
+    assert [p["career"] for p in actual] == [p["career"] for p in expected]
+    for got, want in zip(actual, expected):
+        assert [t["career"] for t in got["top_k"]] == [t["career"] for t in want["top_k"]]
+        assert [t["probability"] for t in got["top_k"]] == pytest.approx([t["probability"] for t in want["top_k"]])
+
+
+@pytest.mark.parametrize("version", ["../outside", "..", "a/b", "", "v1 ", "v1\n"])
+def test_bundle_path_rejects_malformed_versions(tmp_path, version):
+    with pytest.raises(ValueError):
+        artifacts_module.bundle_path(version, root=str(tmp_path))
+
+
+def test_bundle_path_rejects_unknown_versions(tmp_path, trained):
+    tools, model = trained
+    artifacts_module.export_bundle(tools, model, version="v1", root=str(tmp_path))
+    assert artifacts_module.list_bundles(str(tmp_path)) == ["v1"]
+    with pytest.raises(artifacts_module.UnknownBundle):
+        artifacts_module.bundle_path("v2", root=str(tmp_path))
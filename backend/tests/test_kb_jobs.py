@@ -0,0 +1,98 @@
+import asyncio
+
+from kb_jobs import JobQueue
+
+
+async def _collect(queue, job_id):
+    return [job async for job in queue.events(job_id)]
+
+
+def test_events_for_unknown_and_finished_jobs_register_nothing(tmp_path):
+    async def main():
+        queue = JobQueue(str(tmp_path / "jobs.db"), workers=1)
+
+        async def handler(payload, progress):
+            return {"ok": True}
+
+        queue.register("noop", handler)
+        await queue.start()
+        try:
+            assert await _collect(queue, "missing") == []
+
+            job_id = queue.submit("noop", {})
+            snapshots = await _collect(queue, job_id)
+            assert snapshots[-1]["status"] == "succeeded"
+
+            for _ in range(3):
+                assert [job["status"] for job in await _collect(queue, job_id)] == ["succeeded"]
+            assert queue._events == {}
+        finally:
+            await queue.stop()
+
+    asyncio.run(main())
+
+
+def test_second_process_does_not_rerun_a_job_another_is_running(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def main():
+        release = asyncio.Event()
+        runs = []
+
+        async def slow(payload, progress):
+            runs.append("a")
+            await release.wait()
+            return {"by": "a"}
+
+        async def other(payload, progress):
+            runs.append("b")
+            return {"by": "b"}
+
+        first, second = JobQueue(path, workers=1), JobQueue(path, workers=1)
+        first.register("build", slow)
+        second.register("build", other)
+        await first.start()
+        try:
+            job_id = first.submit("build", {})
+            while not runs:
+                await asyncio.sleep(0.01)
+            await second.start()  # e.g. another uvicorn worker booting
+            await asyncio.sleep(0.05)
+            assert runs == ["a"]
+            release.set()
+            snapshots = await _collect(first, job_id)
+            assert snapshots[-1]["result"] == {"by": "a"}
+            assert runs == ["a"]
+        finally:
+            await second.stop()
+            await first.stop()
+
+    asyncio.run(main())
+
+
+def test_job_of_a_dead_process_is_requeued(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def main():
+        dead = JobQueue(path, workers=0)
+        dead.register("build", None)
+        await dead.start()
+        job_id = dead.submit("build", {})
+        assert dead._claim(job_id)
+        dead._execute("UPDATE jobs SET heartbeat_at = 0 WHERE id = ?", (job_id,))
+        dead._db.close()  # crashed: no stop(), no heartbeat
+
+        async def handler(payload, progress):
+            return {"ok": True}
+
+        alive = JobQueue(path, workers=1)
+        alive.register("build", handler)
+        await alive.start()
+        try:
+            job = (await _collect(alive, job_id))[-1]
+            assert job["status"] == "succeeded"
+            assert job["attempts"] == 2
+        finally:
+            await alive.stop()
+
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+
+from kb_sandboxes import Sandbox, SandboxClosed, SandboxStore  # noqa: E402
+
+
+class FakeVectorDB:
+    def __init__(self):
+        self.dropped = 0
+
+    def delete_collection(self):
+        self.dropped += 1
+
+
+def test_close_waits_for_the_chat_using_the_sandbox():
+    vectordb = FakeVectorDB()
+    sandbox = Sandbox("s1", vectordb, embeddings=None)
+
+    with sandbox.in_use():
+        sandbox.close()
+        assert vectordb.dropped == 0
+        with pytest.raises(SandboxClosed):
+            with sandbox.in_use():
+                pass
+
+    assert vectordb.dropped == 1
+    sandbox.close()
+    assert vectordb.dropped == 1
+
+
+def test_idle_sandbox_closes_immediately():
+    vectordb = FakeVectorDB()
+    Sandbox("s2", vectordb, embeddings=None).close()
+    assert vectordb.dropped == 1
+
+
+class FakeChroma:
+    """In-memory Chroma stand-in: instances with the same collection name share their documents."""
+    collections = {}
+
+    def __init__(self, collection_name):
+        self.name = collection_name
+        self.collections.setdefault(collection_name, {})
+
+    def add_texts(self, texts, metadatas, ids):
+        self.collections[self.name].update(zip(ids, texts))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.collections[self.name].pop(chunk_id, None)
+
+    def delete_collection(self):
+        self.collections.pop(self.name, None)
+
+    def search(self):
+        return sorted(self.collections.get(self.name, {}).values())
+
+
+def _upload(store, sandbox_id, chunks):
+    sandbox = store.open(sandbox_id, lambda name: Sandbox(sandbox_id, FakeChroma(name), SimpleNamespace(dimensions=4)))
+    with sandbox.lock, sandbox.in_use():
+        sandbox.sync(chunks)
+    store.put(sandbox)
+    return sandbox
+
+
+def test_reupload_while_closing_keeps_its_own_collection():
+    store = SandboxStore(idle_seconds=60)
+    first = _upload(store, "author", [("c1", "first text", {})])
+
+    with first.in_use():  # a chat is still running on the first upload
+        first.last_access = time.monotonic() - 120
+        assert store.get("author") is None  # expired; close is deferred until the chat ends
+        assert first.closing
+        second = _upload(store, "author", [("c2", "second text", {})])
+        assert second is not first
+
+    assert first.vectordb.search() == []
+    assert store.get("author") is second
+    assert second.vectordb.search() == ["second text"]
+
+
+def test_get_never_falls_back_to_another_authors_sandbox():
+    store = SandboxStore()
+    _upload(store, "author-a", [("c1", "private text", {})])
+    assert store.get("") is None
+    assert store.get("author-b") is None
@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from local_embeddings import LocalEmbeddings  # noqa: E402
+
+
+class FakeModel:
+    """Encodes a text as [len(text), 1.0], slowly enough for concurrent callers to pile up."""
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        self.release.wait(0.05)
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_concurrent_sync_queries_share_encode_batches():
+    model = FakeModel()
+    embeddings = LocalEmbeddings(model=model, batch_size=8, batch_wait_ms=20)
+    texts = ["q" * n for n in range(1, 25)]
+
+    # Chroma's async search runs embed_query in executor threads like these
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        vectors = list(pool.map(embeddings.embed_query, texts))
+
+    assert vectors == [[float(len(t)), 1.0] for t in texts]
+    assert len(model.batches) < len(texts)
+    assert max(len(batch) for batch in model.batches) <= 8
+    assert sorted(t for batch in model.batches for t in batch) == sorted(texts)
+
+
+def test_encode_error_reaches_every_query_in_the_batch():
+    class FailingModel:
+        def encode(self, texts, **kwargs):
+            raise RuntimeError("model unavailable")
+
+    embeddings = LocalEmbeddings(model=FailingModel(), batch_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(embeddings.embed_query, f"q{i}") for i in range(4)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+    # The lead is released, so later queries still run
+    with pytest.raises(RuntimeError):
+        embeddings.embed_query("again")
@@ -0,0 +1,231 @@
+"""ModelRouter hedging and circuit breaking, against local fake LLMs with injected latency."""
+import asyncio
+import time
+
+import pytest
+
+from router import ModelRouter, RouterUnavailable
+from singleflight import SingleFlight
+
+
+class FakeLLM:
+    """Answers after `latency` seconds (or raises when `fails`); records how each call ended."""
+    def __init__(self, name: str, latency: float, fails: bool = False):
+        self.name = name
+        self.latency = latency
+        self.fails = fails
+        self.started = []
+        self.finished = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, prompt: str) -> str:
+        self.started.append(time.perf_counter())
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        if self.fails:
+            raise RuntimeError(f"{self.name} failed")
+        return f"{self.name}: {prompt}"
+
+
+def _router(**kwargs) -> ModelRouter:
+    return ModelRouter(fallbacks={"primary": ["fallback"], "fallback": []}, default_hedge_delay=5.0, min_hedge_delay=0.01, **kwargs)
+
+
+def _warm(router: ModelRouter, model_name: str, seconds: float, samples: int = 20) -> None:
+    for _ in range(samples):
+        router.record(model_name, seconds, ok=True)
+
+
+def test_slow_primary_is_hedged_after_its_p95():
+    router = _router()
+    _warm(router, "primary", 0.05)
+    fakes = {"primary": FakeLLM("primary", latency=2.0), "fallback": FakeLLM("fallback", latency=0.01)}
+
+    async def scenario():
+        started = time.perf_counter()
+        answer = await router.run("primary", lambda name: fakes[name].ainvoke("q"))
+        return started, answer
+
+    started, answer = asyncio.run(scenario())
+    assert answer == "fallback: q"
+    assert router.decisions["hedged"] == 1
+    hedge_after = fakes["fallback"].started[0] - started
+    assert 0.05 <= hedge_after < 0.5
+
+
+def test_no_hedge_when_primary_answers_within_p95():
+    router = _router()
+    _warm(router, "primary", 0.5)
+    fakes = {"primary": FakeLLM("primary", latency=0.05), "fallback": FakeLLM("fallback", latency=0.01)}
+
+    assert asyncio.run(router.run("primary", lambda name: fakes[name].ainvoke("q"))) == "primary: q"
+    assert fakes["fallback"].started == []
+    assert router.decisions["hedged"] == 0
+
+
+def test_faster_response_wins_and_loser_is_cancelled():
+    router = _router()
+    _warm(router, "primary", 0.05)
+    fakes = {"primary": FakeLLM("primary", latency=2.0), "fallback": FakeLLM("fallback", latency=0.01)}
+
+    async def scenario():
+        answer = await router.run("primary", lambda name: fakes[name].ainvoke("q"))
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        return answer
+
+    assert asyncio.run(scenario()) == "fallback: q"
+    assert router.wins["fallback"] == 1
+    assert fakes["primary"].cancelled == 1 and fakes["primary"].finished == 0
+    # A cancelled loser is not a failure of its backend
+    assert router.breakers["primary"].state == "closed"
+
+
+def test_loser_behind_singleflight_is_cancelled():
+    """Hedged generations go through SingleFlight.do; cancelling the loser must stop the underlying call."""
+    router = _router()
+    _warm(router, "primary", 0.05)
+    flights = SingleFlight()
+    fakes = {"primary": FakeLLM("primary", latency=2.0), "fallback": FakeLLM("fallback", latency=0.01)}
+
+    async def scenario():
+        answer = await router.run("primary", lambda name: flights.do((name, "q"), lambda: fakes[name].ainvoke("q")))
+        await asyncio.sleep(0.01)
+        return answer
+
+    assert asyncio.run(scenario()) == "fallback: q"
+    assert fakes["primary"].cancelled == 1
+    assert flights.stats()["in_flight_calls"] == 0 and flights.abandoned == 1
+
+
+def test_breaker_opens_after_failures_and_half_opens_after_reset_timeout():
+    router = ModelRouter(fallbacks={"primary": []}, failure_threshold=3, reset_timeout=0.2)
+    fake = FakeLLM("primary", latency=0.0, fails=True)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await router.run("primary", lambda name: fake.ainvoke("q"))
+        assert router.breakers["primary"].state == "open"
+        with pytest.raises(RouterUnavailable):
+            await router.run("primary", lambda name: fake.ainvoke("q"))
+        assert len(fake.started) == 3
+
+        await asyncio.sleep(0.25)
+        assert router.breakers["primary"].state == "half_open"
+        fake.fails = False
+        assert await router.run("primary", lambda name: fake.ainvoke("q")) == "primary: q"
+        assert router.breakers["primary"].state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_half_open_admits_a_single_probe():
+    router = ModelRouter(fallbacks={"primary": []}, failure_threshold=1, reset_timeout=0.1)
+    fake = FakeLLM("primary", latency=0.0, fails=True)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await router.run("primary", lambda name: fake.ainvoke("q"))
+        await asyncio.sleep(0.15)
+        fake.fails, fake.latency = False, 0.05
+        probe = asyncio.ensure_future(router.run("primary", lambda name: fake.ainvoke("q")))
+        await asyncio.sleep(0.01)
+        with pytest.raises(RouterUnavailable):
+            await router.run("primary", lambda name: fake.ainvoke("q"))
+        assert await probe == "primary: q"
+
+    asyncio.run(scenario())
+
+
+def test_router_unavailable_when_every_breaker_is_open():
+    router = ModelRouter(fallbacks={"primary": ["fallback"], "fallback": []}, failure_threshold=1, reset_timeout=30.0,
+                         default_hedge_delay=5.0)
+    fakes = {"primary": FakeLLM("primary", latency=0.0, fails=True), "fallback": FakeLLM("fallback", latency=0.0, fails=True)}
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await router.run("primary", lambda name: fakes[name].ainvoke("q"))
+        assert {name: b.state for name, b in router.breakers.items()} == {"primary": "open", "fallback": "open"}
+        with pytest.raises(RouterUnavailable) as excinfo:
+            await router.run("primary", lambda name: fakes[name].ainvoke("q"))
+        assert excinfo.value.retry_after == 30
+        assert router.decisions["unavailable"] == 1
+
+    asyncio.run(scenario())
+
+
+class Rejected(Exception):
+    pass
+
+
+async def _tokens(count: int, error: BaseException = None):
+    for i in range(count):
+        await asyncio.sleep(0)
+        yield {"content": str(i)}
+    if error is not None:
+        raise error
+
+
+def _half_open_router() -> ModelRouter:
+    router = ModelRouter(fallbacks={"primary": []}, failure_threshold=1, reset_timeout=0.05, neutral_errors=(Rejected,))
+    router.record("primary", 0.0, ok=False)
+    time.sleep(0.06)
+    assert router.breakers["primary"].state == "half_open"
+    return router
+
+
+def test_stream_rejected_by_admission_releases_the_probe():
+    router = _half_open_router()
+
+    async def scenario():
+        with pytest.raises(Rejected):
+            async for _ in router.stream("primary", lambda name: _tokens(2, Rejected())):
+                pass
+
+    asyncio.run(scenario())
+    breaker = router.breakers["primary"]
+    assert not breaker.probe_in_flight and breaker.available()
+    assert router.failures["primary"] == 1  # only the failure that opened it
+
+
+def test_stream_abandoned_by_client_releases_the_probe():
+    router = _half_open_router()
+
+    async def scenario():
+        stream = router.stream("primary", lambda name: _tokens(5))
+        await stream.__anext__()
+        await stream.aclose()  # the client disconnects
+
+    asyncio.run(scenario())
+    assert router.breakers["primary"].available()
+
+
+def test_stream_errors_count_towards_opening_the_breaker():
+    router = ModelRouter(fallbacks={"primary": []}, failure_threshold=2, reset_timeout=30.0)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                async for _ in router.stream("primary", lambda name: _tokens(1, RuntimeError("backend down"))):
+                    pass
+        async for _ in router.stream("primary", lambda name: _tokens(1)):
+            pass
+
+    with pytest.raises(RouterUnavailable):
+        asyncio.run(scenario())
+    assert router.failures["primary"] == 2
+
+
+def test_stream_in_band_error_is_recorded_as_a_failure():
+    router = ModelRouter(fallbacks={"primary": []}, failure_threshold=5)
+
+    async def scenario():
+        async for _ in router.stream("primary", lambda name: _tokens(2), failed=lambda item: item["content"] == "1"):
+            pass
+
+    asyncio.run(scenario())
+    assert router.failures["primary"] == 1
@@ -0,0 +1,29 @@
+"""Seeding a session from a long client history."""
+import asyncio
+
+from sessions import SessionStore
+
+
+def _history(n):
+    return [{"sender": "user" if i % 2 == 0 else "bot", "text": f"turn {i}"} for i in range(n)]
+
+
+def test_seed_summarizes_evicted_turns_once():
+    store = SessionStore(keep_last_turns=4)
+    session = store.get_or_create("s1")
+    evicted = store.seed(session, _history(10))
+
+    assert [t["text"] for t in session.turns] == ["turn 6", "turn 7", "turn 8", "turn 9"]
+    assert [t["text"] for t in evicted] == [f"turn {i}" for i in range(6)]
+    # The seeding request already sees the older turns, before any LLM summary exists
+    assert "turn 0" in session.summary and "turn 5" in session.summary
+
+    calls = []
+
+    async def summarizer(previous, turns):
+        calls.append((previous, [t["text"] for t in turns]))
+        return "llm summary"
+
+    asyncio.run(store.summarize(session, evicted, summarizer, previous_summary=""))
+    assert calls == [("", [f"turn {i}" for i in range(6)])]
+    assert session.summary == "llm summary"
@@ -0,0 +1,69 @@
+"""SingleFlight stream sharing and producer lifetime."""
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def _counting_factory(state, n=50, delay=0.01):
+    async def factory():
+        try:
+            for i in range(n):
+                await asyncio.sleep(delay)
+                state["produced"] += 1
+                yield i
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+    return factory
+
+
+def test_followers_share_one_stream():
+    flights = SingleFlight()
+    state = {"produced": 0, "cancelled": False}
+
+    async def consume():
+        return [item async for item in flights.stream("k", _counting_factory(state, n=5))]
+
+    async def scenario():
+        return await asyncio.gather(consume(), consume())
+
+    first, second = asyncio.run(scenario())
+    assert first == second == [0, 1, 2, 3, 4]
+    assert state["produced"] == 5
+    assert flights.leaders == 1 and flights.followers == 1
+
+
+def test_producer_is_cancelled_when_every_subscriber_leaves():
+    flights = SingleFlight()
+    state = {"produced": 0, "cancelled": False}
+
+    async def scenario():
+        stream = flights.stream("k", _counting_factory(state))
+        assert await stream.__anext__() == 0
+        await stream.aclose()  # the client disconnects
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert state["cancelled"] is True
+    assert state["produced"] < 50
+    assert flights.stats()["in_flight_streams"] == 0 and flights.abandoned == 1
+
+
+def test_producer_keeps_running_while_a_subscriber_remains():
+    flights = SingleFlight()
+    state = {"produced": 0, "cancelled": False}
+
+    async def scenario():
+        leaving = flights.stream("k", _counting_factory(state, n=5))
+        await leaving.__anext__()
+        staying = asyncio.ensure_future(_collect(flights.stream("k", _counting_factory(state, n=5))))
+        await asyncio.sleep(0)
+        await leaving.aclose()
+        return await staying
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+    assert state["cancelled"] is False
+
+
+async def _collect(stream):
+    return [item async for item in stream]
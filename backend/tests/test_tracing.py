@@ -0,0 +1,52 @@
+import asyncio
+
+from tracing import Trace, TracingMiddleware, _current_trace, span, to_otlp
+
+
+def test_spans_after_close_are_not_exported():
+    trace = Trace("GET /test")
+    token = _current_trace.set(trace)
+    try:
+        with span("rag"):
+            pass
+        trace.close()
+        with span("late_background_work"):
+            pass
+    finally:
+        _current_trace.reset(token)
+
+    names = [s["name"] for s in to_otlp([trace])["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    assert names == ["GET /test", "rag"]
+    assert trace.late_spans == 1
+
+
+def test_middleware_closes_trace_before_export():
+    exported = []
+
+    class Exporter:
+        def export(self, trace):
+            exported.append(trace)
+
+    background = []
+
+    async def app(scope, receive, send):
+        async def later():
+            await asyncio.sleep(0.01)
+            with span("after_response"):
+                pass
+
+        background.append(asyncio.ensure_future(later()))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def main():
+        async def send(message):
+            pass
+
+        await TracingMiddleware(app, exporter=Exporter())({"type": "http", "method": "GET", "path": "/x"}, None, send)
+        await asyncio.gather(*background)
+
+    asyncio.run(main())
+    assert exported[0].closed
+    assert exported[0].finished_spans() == []
+    assert exported[0].late_spans == 1
@@ -0,0 +1,30 @@
+import math
+
+try:
+    import tiktoken  # optional, exact BPE counts when installed
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+CHARS_PER_TOKEN = 4  # rough average for English text when tiktoken is unavailable
+
+
+def count_tokens(text: str) -> int:
+    """Approximate prompt tokens for `text` (model-agnostic; good enough for budgeting)."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """Cuts `text` to about `max_tokens`, keeping the beginning ("head") or the end ("tail")."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        tokens = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+        return _encoding.decode(tokens)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text[:max_chars] if keep == "head" else text[-max_chars:]
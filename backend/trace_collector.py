@@ -0,0 +1,87 @@
+"""
+Minimal stand-in for an OpenTelemetry collector: accepts OTLP/HTTP JSON trace
+exports on /v1/traces, appends every span to a JSONL file and prints a
+per-request stage breakdown.
+
+Usage (from backend/):
+    python trace_collector.py --port 4318 --out traces.jsonl
+    OTLP_TRACES_ENDPOINT=http://localhost:4318/v1/traces uvicorn main:app
+"""
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_write_lock = threading.Lock()
+
+
+def _spans(payload):
+    for resource_spans in payload.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            yield from scope_spans.get("spans", [])
+
+
+def _duration_ms(s):
+    return (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+
+
+def summarize(spans):
+    """One line per trace: root span, total time and the time spent per stage."""
+    by_trace = defaultdict(list)
+    for s in spans:
+        by_trace[s["traceId"]].append(s)
+    lines = []
+    for trace_id, trace_spans in by_trace.items():
+        root = next((s for s in trace_spans if not s.get("parentSpanId")), trace_spans[0])
+        stages = defaultdict(float)
+        for s in trace_spans:
+            if s is not root:
+                stages[s["name"]] += _duration_ms(s)
+        breakdown = ", ".join(f"{name}={ms:.0f}ms" for name, ms in sorted(stages.items(), key=lambda kv: -kv[1]))
+        lines.append(f"{trace_id[:8]} {root['name']} {_duration_ms(root):.0f}ms  {breakdown}")
+    return lines
+
+
+def make_handler(out_path):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_error(404)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                spans = list(_spans(json.loads(body)))
+            except (json.JSONDecodeError, AttributeError):
+                self.send_error(400, "Expected an OTLP/HTTP JSON body")
+                return
+            with _write_lock:
+                with open(out_path, "a", encoding="utf-8") as f:
+                    for s in spans:
+                        f.write(json.dumps(s) + "\n")
+            for line in summarize(spans):
+                print(line)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OTLP/HTTP JSON trace sink.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", default="traces.jsonl")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.out))
+    print(f"Collecting traces on http://{args.host}:{args.port}/v1/traces -> {args.out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
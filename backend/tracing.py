@@ -0,0 +1,283 @@
+import asyncio
+import functools
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+# --- Configuration ---
+OTLP_TRACES_ENDPOINT = os.getenv("OTLP_TRACES_ENDPOINT")  # e.g. http://localhost:4318/v1/traces (see trace_collector.py)
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "career-pathfinder-backend")
+# Streams end with a {"type": "timing"} event when this is on or the request sends `X-Timing-Events: 1`
+SSE_TIMING_EVENTS = os.getenv("TRACE_SSE_TIMING", "false").lower() == "true"
+EXPORT_BATCH_SIZE = 64
+EXPORT_QUEUE_SIZE = 2048
+EXPORT_FLUSH_SECONDS = 2.0
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span_id: ContextVar[Optional[str]] = ContextVar("current_span_id", default=None)
+
+
+class Span:
+    """One timed stage of a request."""
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+
+    def finish(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = self.start_ns + (time.perf_counter_ns() - self._started)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else self.start_ns + (time.perf_counter_ns() - self._started)
+        return (end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """All spans recorded while handling one HTTP request."""
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(name, self.trace_id, None, attributes or {})
+        self.spans: List[Span] = []
+        self.sse_timing = SSE_TIMING_EVENTS
+        self.closed = False
+        self.late_spans = 0
+        # Spans can finish in background tasks after the exporter thread has the trace
+        self._lock = threading.Lock()
+
+    def add(self, s: Span) -> None:
+        with self._lock:
+            if self.closed:
+                self.late_spans += 1
+                return
+            self.spans.append(s)
+
+    def close(self) -> None:
+        """Stops recording: spans finishing after the request has been handed off are dropped."""
+        with self._lock:
+            self.closed = True
+
+    def finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self.spans)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: finished spans summed per stage name, plus the total so far."""
+        totals: Dict[str, List[float]] = {}
+        for s in self.finished_spans():
+            entry = totals.setdefault(s.name, [0.0, 0])
+            entry[0] += s.duration_ms
+            entry[1] += 1
+        parts = [
+            f'{name};dur={duration:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+            for name, (duration, count) in totals.items()
+        ]
+        parts.append(f"total;dur={self.root.duration_ms:.1f}")
+        return ", ".join(parts)
+
+    def timings(self) -> List[Dict[str, Any]]:
+        """Finished spans relative to the request start, for the trailing SSE timing event."""
+        return [{
+            "name": s.name,
+            "start_ms": round((s.start_ns - self.root.start_ns) / 1e6, 1),
+            "duration_ms": round(s.duration_ms, 1),
+            **({"error": s.error} if s.error else {}),
+        } for s in sorted(self.finished_spans(), key=lambda s: s.start_ns)]
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Times the enclosed block as a child of the current span; a no-op outside a traced request."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = Span(name, trace.trace_id, _current_span_id.get() or trace.root.span_id, attributes)
+    token = _current_span_id.set(current.span_id)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        try:
+            _current_span_id.reset(token)
+        except ValueError:
+            # Async generators can be finalized in another context; the parent pointer dies with it
+            pass
+        current.finish()
+        trace.add(current)
+
+
+def traced(name: str):
+    """Decorator form of `span` for sync and async functions."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timing_event() -> Optional[Dict[str, Any]]:
+    """Payload for a trailing {"type": "timing"} stream event, if the request asked for one."""
+    trace = _current_trace.get()
+    if trace is None or not trace.sse_timing:
+        return None
+    return {"type": "timing", "trace_id": trace.trace_id, "total_ms": round(trace.root.duration_ms, 1), "spans": trace.timings()}
+
+
+# --- OTLP export ---
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(s: Span, kind: int) -> Dict[str, Any]:
+    data = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": kind,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        data["parentSpanId"] = s.parent_id
+    return data
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for finished traces."""
+    spans = []
+    for trace in traces:
+        spans.append(_otlp_span(trace.root, kind=2))  # SERVER
+        spans.extend(_otlp_span(s, kind=1) for s in trace.finished_spans())  # INTERNAL
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "career-pathfinder.tracing"}, "spans": spans}],
+    }]}
+
+
+class OTLPJsonExporter:
+    """Batches finished traces and posts them to an OTLP/HTTP JSON endpoint from a background thread."""
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _post(self, client: httpx.Client, batch: List[Trace]) -> None:
+        try:
+            client.post(self.endpoint, json=to_otlp(batch)).raise_for_status()
+            self.exported += len(batch)
+        except httpx.HTTPError as e:
+            self.failed += len(batch)
+            print(f"Trace export to {self.endpoint} failed: {e}")
+
+    def _run(self) -> None:
+        with httpx.Client(timeout=5.0) as client:
+            batch: List[Trace] = []
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    item = self._queue.get(timeout=EXPORT_FLUSH_SECONDS)
+                    if item is None:  # shutdown
+                        if batch:
+                            self._post(client, batch)
+                        return
+                    batch.append(item)
+                except queue.Empty:
+                    pass
+                if batch and (len(batch) >= EXPORT_BATCH_SIZE or time.monotonic() - last_flush >= EXPORT_FLUSH_SECONDS):
+                    self._post(client, batch)
+                    batch = []
+                    last_flush = time.monotonic()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"endpoint": self.endpoint, "exported": self.exported, "dropped": self.dropped, "failed": self.failed}
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: opens a trace per HTTP request, returns its stages as a
+    `Server-Timing` header and hands the finished trace to the exporter.
+    Streamed responses send their headers first, so those only carry the
+    time to the first byte; the trailing SSE timing event has the full picture.
+    """
+    def __init__(self, app, exporter: Optional[OTLPJsonExporter] = None):
+        self.app = app
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        trace = Trace(f"{scope['method']} {scope['path']}", {"http.method": scope["method"], "http.route": scope["path"]})
+        trace.sse_timing = trace.sse_timing or headers.get(b"x-timing-events") == b"1"
+        token = _current_trace.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                trace.root.attributes["http.status_code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"server-timing", trace.server_timing().encode("latin-1")),
+                    (b"timing-allow-origin", b"*"),
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            trace.root.finish()
+            trace.close()
+            if self.exporter is not None:
+                self.exporter.export(trace)
+
+
+def create_exporter() -> Optional[OTLPJsonExporter]:
+    return OTLPJsonExporter(OTLP_TRACES_ENDPOINT) if OTLP_TRACES_ENDPOINT else None
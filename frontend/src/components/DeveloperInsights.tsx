@@ -45,6 +45,18 @@ interface KBEntry {
   sections: KBSection[];
 }
 
+// KB generation and test setup run as background jobs on the server; poll until one finishes
+const waitForKbJob = async (jobId: string) => {
+  while (true) {
+    const response = await fetch(`http://localhost:8000/api/kb/jobs/${jobId}`);
+    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+    const job = await response.json();
+    if (job.status === 'succeeded') return job.result;
+    if (job.status === 'failed') throw new Error(job.error || 'KB job failed');
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+};
+
 // --- Main Component ---
 const DeveloperInsights = ({ onBack }: DeveloperInsightsProps) => {
   const [view, setView] = useState('builder'); // builder, generated, testing
@@ -53,6 +65,8 @@ const DeveloperInsights = ({ onBack }: DeveloperInsightsProps) => {
   ]);
   const [isLoading, setIsLoading] = useState(false);
   const [generatedKb, setGeneratedKb] = useState<KBEntry[] | null>(null);
+  // Private test KB on the server; re-uploads reuse it so only edited sections are re-embedded
+  const [sandboxId, setSandboxId] = useState<string | null>(null);
 
   const handleKbGenerated = (kb: KBEntry[]) => {
     setGeneratedKb(kb);
@@ -62,12 +76,16 @@ const DeveloperInsights = ({ onBack }: DeveloperInsightsProps) => {
   const handleStartTesting = async () => {
     setIsLoading(true);
     try {
-      const response = await fetch('http://localhost:8000/api/kb/test-setup', {
+      const query = sandboxId ? `?sandbox_id=${encodeURIComponent(sandboxId)}` : '';
+      const response = await fetch(`http://localhost:8000/api/kb/test-setup${query}`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(generatedKb),
       });
       if (!response.ok) throw new Error('Failed to set up test environment');
+      const data = await response.json();
+      await waitForKbJob(data.job_id);
+      setSandboxId(data.sandbox_id);
       setView('testing');
     } catch (error) {
       console.error("Error setting up test environment:", error);
@@ -86,7 +104,7 @@ const DeveloperInsights = ({ onBack }: DeveloperInsightsProps) => {
       case 'generated':
         return <GeneratedView kb={generatedKb} onStartTesting={handleStartTesting} onReset={handleReset} isLoading={isLoading} />;
       case 'testing':
-        return <TestingView onBack={() => setView('generated')} />;
+        return <TestingView onBack={() => setView('generated')} sandboxId={sandboxId} />;
       default:
         return <BuilderView onBack={onBack} onKbGenerated={handleKbGenerated} topics={topics} setTopics={setTopics} isLoading={isLoading} setIsLoading={setIsLoading} />;
     }
@@ -108,22 +126,48 @@ const BuilderView = ({ onBack, onKbGenerated, topics, setTopics, isLoading, setI
     setTopics(topics.map(t => t.id === id ? { ...t, ...updatedFields } : t));
   };
 
+  const [progress, setProgress] = useState<{ done: number; total: number } | null>(null);
+
   const handleGenerate = async () => {
     setIsLoading(true);
     const payload = { topics: topics.map(({ name, sections, numSections }) => ({ name, sections, num_entries: numSections })) };
+    setProgress({ done: 0, total: payload.topics.reduce((sum, t) => sum + t.num_entries, 0) });
     try {
-      const response = await fetch('http://localhost:8000/api/kb/generate', {
+      // Entries arrive one JSON object per line as soon as each is generated
+      const response = await fetch('http://localhost:8000/api/kb/generate/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload),
       });
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const data = await response.json();
-      onKbGenerated(data);
+      if (!response.ok || !response.body) throw new Error(`HTTP error! status: ${response.status}`);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      const entries: KBEntry[] = [];
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        buffer += decoder.decode(value, { stream: !done });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'entry') {
+            entries.push(event.entry);
+            setProgress(prev => prev && { ...prev, done: prev.done + 1 });
+          } else if (event.type === 'error') {
+            console.error(`Error generating KB for topic ${event.topic}:`, event.error);
+          }
+        }
+        if (done) break;
+      }
+      onKbGenerated(entries);
     } catch (error) {
       console.error("Error generating knowledge base:", error);
     } finally {
       setIsLoading(false);
+      setProgress(null);
     }
   };
 
@@ -178,7 +222,7 @@ const BuilderView = ({ onBack, onKbGenerated, topics, setTopics, isLoading, setI
                 disabled={isLoading || topics.length === 0 || topics.some(t => !t.name.trim())}
                 className="bg-indigo-600 hover:bg-indigo-700 text-white font-semibold text-sm sm:text-base w-full sm:w-auto"
               >
-                {isLoading ? 'Generating...' : 'Generate Database'}
+                {isLoading ? `Generating...${progress ? ` (${progress.done}/${progress.total})` : ''}` : 'Generate Database'}
               </Button>
             </div>
           </div>
@@ -246,7 +290,7 @@ const KBEntryCard = ({ entry }) => {
   );
 };
 
-const TestingView = ({ onBack }) => {
+const TestingView = ({ onBack, sandboxId }) => {
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -267,7 +311,7 @@ const TestingView = ({ onBack }) => {
       const response = await fetch('http://localhost:8000/api/kb/test-chat/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: input }),
+        body: JSON.stringify({ message: input, sandbox_id: sandboxId }),
       });
 
       if (!response.body) {